@@ -0,0 +1,143 @@
+"""
+Demand forecasting and reorder points.
+
+The daily sales of the whole catalog (DailyMedicineSales) are streamed once
+into NumPy accumulators, and every forecast below is computed for all
+medicines at the same time with array operations:
+
+- demand rate: moving average of the last ``window`` days
+- weekly seasonality: each weekday's mean over the history relative to the
+  overall mean, so lead times that cover busy days forecast more
+- safety stock: ``z * sigma * sqrt(lead_time)``, with sigma the standard
+  deviation of daily sales over the window and z the service level quantile
+
+The suggested reorder level is the seasonal demand over the lead time plus
+the safety stock, rounded up. Only the recent window is held as a dense
+medicines x days matrix, so memory stays small for long histories.
+"""
+from datetime import timedelta
+from itertools import islice
+from statistics import NormalDist
+
+import numpy as np
+from django.utils import timezone
+
+from apps.sales.models import DailyMedicineSales
+from .models import InventoryItem
+
+DEFAULT_HISTORY_DAYS = 365
+
+DEFAULT_WINDOW = 28
+
+DEFAULT_LEAD_TIME = 7
+
+DEFAULT_SERVICE_LEVEL = 0.95
+
+LOAD_CHUNK_SIZE = 100000
+
+
+class Demand:
+    """Per-medicine sales accumulators over a history ending at ``end``"""
+
+    def __init__(self, medicine_ids, start, end, window):
+        self.medicine_ids = np.asarray(medicine_ids, dtype=np.int64)
+        self.start = start
+        self.end = end
+        self.days = (end - start).days + 1
+        self.window = min(window, self.days)
+        self.weekday_totals = np.zeros((len(self.medicine_ids), 7))
+        self.recent = np.zeros((len(self.medicine_ids), self.window))
+
+    def add(self, medicine_ids, ordinals, units):
+        """Accumulate arrays of (medicine id, date ordinal, units) rows"""
+        rows = np.searchsorted(self.medicine_ids, medicine_ids)
+        # date.weekday() is (ordinal - 1) % 7; bincount over flattened cells
+        # is the vectorised scatter-add
+        self.weekday_totals += np.bincount(
+            rows * 7 + (ordinals - 1) % 7, weights=units, minlength=self.weekday_totals.size
+        ).reshape(self.weekday_totals.shape)
+        offsets = ordinals - (self.end.toordinal() - self.window + 1)
+        in_window = offsets >= 0
+        self.recent += np.bincount(
+            rows[in_window] * self.window + offsets[in_window], weights=units[in_window],
+            minlength=self.recent.size,
+        ).reshape(self.recent.shape)
+
+    def weekday_counts(self):
+        """How many times each weekday occurs in the history"""
+        weekdays = (self.start.weekday() + np.arange(self.days)) % 7
+        return np.bincount(weekdays, minlength=7)
+
+
+def load_demand(start, end, window=DEFAULT_WINDOW):
+    """Stream the daily sales of ``start``..``end`` into a Demand"""
+    rows = DailyMedicineSales.objects.filter(date__range=(start, end), quantity__gt=0).order_by()
+    medicine_ids = sorted(rows.values_list('medicine_id', flat=True).distinct())
+    demand = Demand(medicine_ids, start, end, window)
+
+    iterator = rows.values_list('medicine_id', 'date', 'quantity').iterator(chunk_size=LOAD_CHUNK_SIZE)
+    while True:
+        chunk = list(islice(iterator, LOAD_CHUNK_SIZE))
+        if not chunk:
+            return demand
+        demand.add(
+            np.fromiter((row[0] for row in chunk), dtype=np.int64, count=len(chunk)),
+            np.fromiter((row[1].toordinal() for row in chunk), dtype=np.int64, count=len(chunk)),
+            np.fromiter((row[2] for row in chunk), dtype=np.float64, count=len(chunk)),
+        )
+
+
+def forecast_reorder_levels(demand, lead_time=DEFAULT_LEAD_TIME, service_level=DEFAULT_SERVICE_LEVEL):
+    """
+    Suggested reorder level of every medicine of a Demand, for a lead time
+    starting the day after its history ends.
+
+    Returns:
+        Integer array aligned with ``demand.medicine_ids``
+    """
+    rate = demand.recent.mean(axis=1)
+    sigma = demand.recent.std(axis=1)
+
+    overall = demand.weekday_totals.sum(axis=1, keepdims=True) / demand.days
+    counts = demand.weekday_counts()
+    by_weekday = np.divide(demand.weekday_totals, counts, out=np.zeros_like(demand.weekday_totals),
+                           where=counts > 0)
+    seasonal = np.divide(by_weekday, overall, out=np.ones_like(by_weekday), where=overall > 0)
+    # Weekdays never seen in a short history count as average days
+    seasonal[:, counts == 0] = 1
+
+    lead_weekdays = (demand.end.weekday() + 1 + np.arange(lead_time)) % 7
+    lead_demand = rate * seasonal[:, lead_weekdays].sum(axis=1)
+    safety_stock = NormalDist().inv_cdf(service_level) * sigma * np.sqrt(lead_time)
+    return np.ceil(lead_demand + safety_stock - 1e-9).astype(np.int64)
+
+
+def recalculate_reorder_levels(history_days=DEFAULT_HISTORY_DAYS, window=DEFAULT_WINDOW,
+                               lead_time=DEFAULT_LEAD_TIME, service_level=DEFAULT_SERVICE_LEVEL,
+                               minimum=1, dry_run=False):
+    """
+    Forecast every medicine with sales in the history (ending yesterday) and
+    write the suggested reorder levels to their inventory rows.
+
+    Returns:
+        List of (inventory item, old level, new level) for the rows changed
+    """
+    end = timezone.localdate() - timedelta(days=1)
+    start = end - timedelta(days=history_days - 1)
+    demand = load_demand(start, end, window)
+    if not len(demand.medicine_ids):
+        return []
+    levels = np.maximum(forecast_reorder_levels(demand, lead_time, service_level), minimum)
+    suggested = dict(zip(demand.medicine_ids.tolist(), levels.tolist()))
+
+    changes = []
+    items = InventoryItem.objects.only('id', 'medicine_id', 'reorder_level').order_by()
+    for item in items.iterator(chunk_size=5000):
+        level = suggested.get(item.medicine_id)
+        if level is not None and item.reorder_level != level:
+            changes.append((item, item.reorder_level, level))
+            item.reorder_level = level
+    if not dry_run:
+        InventoryItem.objects.bulk_update([item for item, _, _ in changes], ['reorder_level'],
+                                          batch_size=1000)
+    return changes
@@ -0,0 +1,406 @@
+"""
+Stock movement ledger.
+
+Every stock change goes through record_movements(): the movements are
+appended to StockMovement and the two maintained balances,
+InventoryItem.current_stock and Medicine.quantity, are moved by the same
+delta in one set-based UPDATE each. Current stock is therefore an O(1) read
+of the balance row, and the ledger is the single source both fields derive
+from (see the reconcile_stock command).
+
+Decrements are conditional: each UPDATE only matches rows whose balance can
+absorb the removal (``quantity >= n``), so concurrent terminals never lose an
+update or drive a balance below zero. When a guard does not match, the whole
+batch is rolled back and InsufficientStock is raised.
+
+Movements are also tracked per lot (StockLot). A removal that names no lot
+is split over the medicine's lots first-expiry-first-out, with one locked
+query for the whole batch of movements; sales never take expired lots and
+raise InsufficientStock once unexpired stock runs out. An addition that
+names no lot goes to the lot of the medicine's current batch_number and
+expiration_date. Stock that predates lot tracking and cannot be matched to
+a lot is moved without one.
+
+Historical stock ("as of date X") is answered from the latest StockSnapshot
+before X plus the movements recorded since, so only the tail of the ledger
+is ever summed.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from apps.medicines.models import Medicine
+from .models import InventoryItem, StockLot, StockMovement, StockSnapshot
+
+DEFAULT_REORDER_LEVEL = 10
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class InsufficientStock(Exception):
+    """Raised when movements would take a stock balance below zero"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        names = ', '.join(shortage['medicine_name'] for shortage in shortages)
+        super().__init__(f"Insufficient stock for {names}" if names else "Insufficient stock")
+
+    def as_response_data(self):
+        return {"error": "Insufficient stock", "items": self.shortages}
+
+
+def shortage(medicine_id, medicine_name, requested, available):
+    return {
+        "medicine": medicine_id,
+        "medicine_name": medicine_name,
+        "requested": requested,
+        "available": available,
+    }
+
+
+def movement_deltas(movements):
+    """Net quantity per medicine id for a list of movements"""
+    deltas = {}
+    for movement in movements:
+        deltas[movement.medicine_id] = deltas.get(movement.medicine_id, 0) + movement.quantity
+    return deltas
+
+
+def apply_deltas(model, field, deltas, key='pk'):
+    """
+    Add ``deltas[row_key]`` to ``field`` for every row in a single
+    UPDATE ... SET field = CASE ... END statement.
+
+    Rows with a negative delta are only matched while ``field`` can absorb
+    it, so the returned row count is smaller than ``len(deltas)`` when a
+    balance would go below zero.
+    """
+    if not deltas:
+        return 0
+    guard = Q()
+    whens = []
+    for row_key, delta in deltas.items():
+        condition = Q(**{key: row_key})
+        if delta < 0:
+            condition &= Q(**{f'{field}__gte': -delta})
+        guard |= condition
+        whens.append(When(**{key: row_key}, then=F(field) + delta))
+    return model.objects.filter(guard).update(
+        **{field: Case(*whens, default=F(field), output_field=IntegerField())}
+    )
+
+
+def stock_shortages(deltas):
+    """Medicines whose current stock cannot absorb the requested removals"""
+    removals = {medicine_id: -delta for medicine_id, delta in deltas.items() if delta < 0}
+    shortages = []
+    rows = Medicine.objects.filter(pk__in=list(removals)).values_list(
+        'pk', 'name', 'quantity', 'inventoryitem__current_stock'
+    )
+    found = set()
+    for medicine_id, name, quantity, current_stock in rows:
+        found.add(medicine_id)
+        available = quantity if current_stock is None else min(quantity, current_stock)
+        if removals[medicine_id] > available:
+            shortages.append(shortage(medicine_id, name, removals[medicine_id], available))
+    for medicine_id in removals.keys() - found:
+        shortages.append(shortage(medicine_id, None, removals[medicine_id], 0))
+    return shortages
+
+
+def expired_lot_stock():
+    """Units in expired lots of the outer medicine, for Medicine annotations"""
+    return Coalesce(Subquery(
+        StockLot.objects
+        .filter(medicine=OuterRef('pk'), expiration_date__lt=timezone.localdate())
+        .order_by()
+        .values('medicine')
+        .annotate(total=Sum('quantity'))
+        .values('total')
+    ), Value(0))
+
+
+def unlotted_stock(medicine_ids):
+    """Medicine id -> (name, units not held in any lot): stock that predates lot tracking"""
+    lotted = (
+        StockLot.objects.filter(medicine=OuterRef('pk'))
+        .order_by()
+        .values('medicine')
+        .annotate(total=Sum('quantity'))
+        .values('total')
+    )
+    rows = (
+        Medicine.objects.filter(pk__in=list(medicine_ids))
+        .annotate(lotted=Coalesce(Subquery(lotted), Value(0)))
+        .values_list('pk', 'name', 'quantity', 'lotted')
+    )
+    return {medicine_id: (name, max(quantity - lotted, 0)) for medicine_id, name, quantity, lotted in rows}
+
+
+def lock_lots(medicine_ids):
+    """Lots with stock of the given medicines, locked, soonest expiry first"""
+    lots = {}
+    if not medicine_ids:
+        return lots
+    rows = (
+        StockLot.objects.select_for_update()
+        .filter(medicine_id__in=list(medicine_ids), quantity__gt=0)
+        .order_by('medicine_id', 'expiration_date', 'id')
+    )
+    for lot in rows:
+        lots.setdefault(lot.medicine_id, []).append(lot)
+    return lots
+
+
+def current_batch_lots(medicine_ids):
+    """The lot of each medicine's current batch_number and expiration_date, created if missing"""
+    if not medicine_ids:
+        return {}
+    batches = {
+        medicine_id: (batch_number or '', expiration_date)
+        for medicine_id, batch_number, expiration_date in
+        Medicine.objects.filter(pk__in=list(medicine_ids)).values_list('pk', 'batch_number', 'expiration_date')
+    }
+    condition = Q()
+    for medicine_id, (lot_number, expiration_date) in batches.items():
+        condition |= Q(medicine_id=medicine_id, lot_number=lot_number, expiration_date=expiration_date)
+    lots = {lot.medicine_id: lot for lot in StockLot.objects.filter(condition)}
+    missing = [
+        StockLot(medicine_id=medicine_id, lot_number=lot_number, expiration_date=expiration_date)
+        for medicine_id, (lot_number, expiration_date) in batches.items() if medicine_id not in lots
+    ]
+    if missing:
+        # Another transaction may create the same lot meanwhile: read them back
+        StockLot.objects.bulk_create(missing, ignore_conflicts=True)
+        lots.update({lot.medicine_id: lot for lot in StockLot.objects.filter(condition)})
+    return lots
+
+
+def split_movement(movement, lot, quantity):
+    """A copy of ``movement`` for ``quantity`` units of ``lot``"""
+    return StockMovement(
+        medicine_id=movement.medicine_id,
+        lot=lot,
+        movement_type=movement.movement_type,
+        quantity=quantity,
+        reference=movement.reference,
+        note=movement.note,
+        user_id=movement.user_id,
+    )
+
+
+def assign_lots(movements):
+    """
+    Give the movements that name no lot one, splitting removals over
+    several lots when one is not enough.
+
+    Sales only take unexpired lots, then stock that predates lot tracking.
+
+    Returns:
+        The movements to record; the first piece of a split movement is the
+        original instance
+
+    Raises:
+        InsufficientStock: if a sale cannot be served without expired lots
+    """
+    pending = [movement for movement in movements if movement.lot_id is None and movement.quantity]
+    lots = lock_lots({movement.medicine_id for movement in pending if movement.quantity < 0})
+    batch_lots = current_batch_lots({movement.medicine_id for movement in pending if movement.quantity > 0})
+    today = timezone.localdate()
+    unlotted = None
+
+    assigned = []
+    for movement in movements:
+        if movement.lot_id is not None or not movement.quantity:
+            assigned.append(movement)
+            continue
+        if movement.quantity > 0:
+            movement.lot = batch_lots[movement.medicine_id]
+            assigned.append(movement)
+            continue
+
+        candidates = lots.get(movement.medicine_id, [])
+        if movement.movement_type == 'sale':
+            candidates = [lot for lot in candidates if lot.expiration_date >= today]
+        remaining = -movement.quantity
+        pieces = []
+        for lot in candidates:
+            taken = min(lot.quantity, remaining)
+            if not taken:
+                continue
+            lot.quantity -= taken
+            remaining -= taken
+            pieces.append((lot, taken))
+            if not remaining:
+                break
+        if remaining and movement.movement_type == 'sale':
+            if unlotted is None:
+                unlotted = unlotted_stock({
+                    movement.medicine_id for movement in pending if movement.movement_type == 'sale'
+                })
+            name, left = unlotted.get(movement.medicine_id, (None, 0))
+            if remaining > left:
+                requested = -movement.quantity
+                raise InsufficientStock([
+                    shortage(movement.medicine_id, name, requested, requested - remaining + left)
+                ])
+            unlotted[movement.medicine_id] = (name, left - remaining)
+        if remaining:
+            pieces.append((None, remaining))
+
+        first_lot, first_quantity = pieces[0]
+        movement.lot = first_lot
+        movement.quantity = -first_quantity
+        assigned.append(movement)
+        assigned.extend(split_movement(movement, lot, -quantity) for lot, quantity in pieces[1:])
+    return assigned
+
+
+def record_movements(movements):
+    """
+    Append movements to the ledger and apply them to the stock balances.
+
+    Args:
+        movements: Unsaved StockMovement instances
+
+    Returns:
+        Dict of medicine id -> net quantity applied
+
+    Raises:
+        InsufficientStock: if a balance would go below zero; nothing is written
+    """
+    movements = list(movements)
+    if not movements:
+        return {}
+    deltas = {
+        medicine_id: delta
+        for medicine_id, delta in movement_deltas(movements).items() if delta
+    }
+
+    with transaction.atomic():
+        movements = assign_lots(movements)
+        lot_deltas = {}
+        for movement in movements:
+            if movement.lot_id is not None:
+                lot_deltas[movement.lot_id] = lot_deltas.get(movement.lot_id, 0) + movement.quantity
+        lot_deltas = {lot_id: delta for lot_id, delta in lot_deltas.items() if delta}
+        stocked = set(
+            InventoryItem.objects.filter(medicine_id__in=list(deltas))
+            .values_list('medicine_id', flat=True)
+        )
+        stocked_deltas = {
+            medicine_id: delta for medicine_id, delta in deltas.items() if medicine_id in stocked
+        }
+        applied = (
+            apply_deltas(Medicine, 'quantity', deltas) == len(deltas)
+            and apply_deltas(InventoryItem, 'current_stock', stocked_deltas,
+                             key='medicine_id') == len(stocked_deltas)
+            and apply_deltas(StockLot, 'quantity', lot_deltas) == len(lot_deltas)
+        )
+        if applied:
+            StockMovement.objects.bulk_create(movements)
+            missing = [medicine_id for medicine_id in deltas if medicine_id not in stocked]
+            if missing:
+                InventoryItem.objects.bulk_create([
+                    InventoryItem(
+                        medicine_id=medicine_id,
+                        current_stock=quantity,
+                        reorder_level=DEFAULT_REORDER_LEVEL,
+                    )
+                    for medicine_id, quantity in
+                    Medicine.objects.filter(pk__in=missing).values_list('pk', 'quantity')
+                ])
+        else:
+            # A stock guard did not match: undo the rows that were updated
+            transaction.set_rollback(True)
+
+    if not applied:
+        raise InsufficientStock(stock_shortages(deltas))
+    return deltas
+
+
+def record_movement(medicine, quantity, movement_type, reference='', note='', user=None, lot=None):
+    """Record a single stock movement for a medicine"""
+    movement = StockMovement(
+        medicine=medicine,
+        lot=lot,
+        movement_type=movement_type,
+        quantity=quantity,
+        reference=reference,
+        note=note,
+        user=user,
+    )
+    record_movements([movement])
+    return movement
+
+
+def ledger_balances(medicine_ids=None):
+    """Sum of the whole ledger per medicine id (used to reconcile balances)"""
+    movements = StockMovement.objects.order_by()
+    if medicine_ids is not None:
+        movements = movements.filter(medicine_id__in=medicine_ids)
+    return dict(
+        movements.values('medicine').annotate(total=Sum('quantity'))
+        .values_list('medicine', 'total')
+    )
+
+
+def lot_ledger_balances():
+    """Sum of the ledger per lot id (used to reconcile lot quantities)"""
+    return dict(
+        StockMovement.objects.filter(lot__isnull=False).order_by()
+        .values('lot').annotate(total=Sum('quantity'))
+        .values_list('lot', 'total')
+    )
+
+
+def stock_as_of_queryset(moment):
+    """
+    Medicines annotated with ``stock_as_of``: their stock at ``moment``.
+
+    Starts from the latest snapshot taken at or before ``moment`` and adds the
+    movements recorded between that snapshot and ``moment``, in one query.
+    """
+    snapshots = StockSnapshot.objects.filter(
+        medicine=OuterRef('pk'), taken_at__lte=moment
+    ).order_by('-taken_at')
+    movements_since = (
+        StockMovement.objects
+        .filter(medicine=OuterRef('pk'), created_at__lte=moment,
+                created_at__gt=OuterRef('snapshot_at'))
+        .order_by()
+        .values('medicine')
+        .annotate(total=Sum('quantity'))
+        .values('total')
+    )
+    return (
+        Medicine.objects
+        .annotate(
+            snapshot_quantity=Coalesce(Subquery(snapshots.values('quantity')[:1]), Value(0)),
+            snapshot_at=Coalesce(Subquery(snapshots.values('taken_at')[:1]), Value(EPOCH)),
+        )
+        .annotate(
+            stock_as_of=F('snapshot_quantity') + Coalesce(
+                Subquery(movements_since, output_field=IntegerField()), Value(0)
+            )
+        )
+    )
+
+
+def take_snapshots(moment):
+    """
+    Snapshot the stock of every medicine at ``moment``.
+
+    Returns:
+        Number of medicines snapshotted (existing snapshots at ``moment`` are kept)
+    """
+    snapshots = [
+        StockSnapshot(medicine_id=medicine_id, taken_at=moment, quantity=quantity)
+        for medicine_id, quantity in
+        stock_as_of_queryset(moment).values_list('pk', 'stock_as_of').iterator(chunk_size=2000)
+    ]
+    created = StockSnapshot.objects.bulk_create(snapshots, batch_size=1000, ignore_conflicts=True)
+    return len(created)
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.inventory import forecasting
+
+
+class Command(BaseCommand):
+    help = (
+        "Forecast demand for the whole catalog from the daily sales rollups and "
+        "set each inventory item's reorder level to lead time demand plus safety stock"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int, default=forecasting.DEFAULT_HISTORY_DAYS,
+                            help="Days of sales history to learn from (ending yesterday)")
+        parser.add_argument('--window', type=int, default=forecasting.DEFAULT_WINDOW,
+                            help="Days in the moving average and demand deviation")
+        parser.add_argument('--lead-time', type=int, default=forecasting.DEFAULT_LEAD_TIME,
+                            help="Days between ordering and receiving stock")
+        parser.add_argument('--service-level', type=float, default=forecasting.DEFAULT_SERVICE_LEVEL,
+                            help="Probability of not running out during the lead time (0-1)")
+        parser.add_argument('--minimum', type=int, default=1, help="Lowest reorder level to set")
+        parser.add_argument('--dry-run', action='store_true', help="Report the changes without saving them")
+
+    def handle(self, *args, **options):
+        if min(options['history_days'], options['window'], options['lead_time']) < 1:
+            raise CommandError("--history-days, --window and --lead-time must be positive")
+        if not 0 < options['service_level'] < 1:
+            raise CommandError("--service-level must be between 0 and 1")
+
+        started = time.perf_counter()
+        changes = forecasting.recalculate_reorder_levels(
+            history_days=options['history_days'],
+            window=options['window'],
+            lead_time=options['lead_time'],
+            service_level=options['service_level'],
+            minimum=options['minimum'],
+            dry_run=options['dry_run'],
+        )
+        if options['verbosity'] > 1:
+            for item, old_level, new_level in changes:
+                self.stdout.write(f"Medicine {item.medicine_id}: {old_level} -> {new_level}")
+
+        verb = "Would update" if options['dry_run'] else "Updated"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {len(changes)} reorder levels in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,94 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.inventory.ledger import ledger_balances, lot_ledger_balances
+from apps.inventory.models import InventoryItem, StockLot
+from apps.medicines.models import Medicine
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare Medicine.quantity, InventoryItem.current_stock and every StockLot.quantity "
+        "with the stock ledger, and check that the lots of a medicine do not hold more than its stock"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help="Rewrite the stock fields and lot quantities from the ledger",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            balances = ledger_balances()
+            medicines = list(
+                Medicine.objects.select_for_update(of=('self',))
+                .select_related('inventoryitem')
+                .order_by('pk')
+            )
+
+            drifted_medicines = []
+            drifted_inventory = []
+            for medicine in medicines:
+                expected = balances.get(medicine.pk, 0)
+                if medicine.quantity != expected:
+                    self.stdout.write(
+                        f"{medicine.name} (#{medicine.pk}): quantity {medicine.quantity}, ledger {expected}"
+                    )
+                    medicine.quantity = expected
+                    drifted_medicines.append(medicine)
+                try:
+                    inventory = medicine.inventoryitem
+                except InventoryItem.DoesNotExist:
+                    continue
+                if inventory.current_stock != expected:
+                    self.stdout.write(
+                        f"{medicine.name} (#{medicine.pk}): current_stock {inventory.current_stock}, ledger {expected}"
+                    )
+                    inventory.current_stock = expected
+                    drifted_inventory.append(inventory)
+
+            lot_balances = lot_ledger_balances()
+            names = {medicine.pk: medicine.name for medicine in medicines}
+            drifted_lots = []
+            lot_totals = {}
+            for lot in StockLot.objects.select_for_update().order_by('pk'):
+                expected = lot.opening_quantity + lot_balances.get(lot.pk, 0)
+                if lot.quantity != expected:
+                    self.stdout.write(
+                        f"{names.get(lot.medicine_id)} (#{lot.medicine_id}) lot "
+                        f"{lot.lot_number or '-'} (#{lot.pk}): quantity {lot.quantity}, ledger {expected}"
+                    )
+                    lot.quantity = expected
+                    drifted_lots.append(lot)
+                lot_totals[lot.medicine_id] = lot_totals.get(lot.medicine_id, 0) + lot.quantity
+
+            # Stock outside any lot predates lot tracking, so lots may hold
+            # less than the stock, never more
+            overcommitted = 0
+            for medicine_id, total in lot_totals.items():
+                stock = balances.get(medicine_id, 0)
+                if total > stock:
+                    self.stdout.write(
+                        f"{names.get(medicine_id)} (#{medicine_id}): lots hold {total}, stock {stock}"
+                    )
+                    overcommitted += 1
+
+            if options['fix']:
+                Medicine.objects.bulk_update(drifted_medicines, ['quantity'], batch_size=500)
+                InventoryItem.objects.bulk_update(drifted_inventory, ['current_stock'], batch_size=500)
+                StockLot.objects.bulk_update(drifted_lots, ['quantity'], batch_size=500)
+
+        drifted = len(drifted_medicines) + len(drifted_inventory) + len(drifted_lots)
+        if overcommitted:
+            self.stdout.write(self.style.ERROR(
+                f"{overcommitted} medicines have lots holding more than their stock; "
+                f"check their lot movements"
+            ))
+        if drifted and options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {drifted} drifted balances"))
+        elif drifted:
+            self.stdout.write(self.style.WARNING(f"{drifted} balances drifted; rerun with --fix to repair"))
+        elif not overcommitted:
+            self.stdout.write(self.style.SUCCESS("Stock balances match the ledger"))
@@ -0,0 +1,33 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.inventory.ledger import take_snapshots
+
+
+class Command(BaseCommand):
+    help = "Snapshot the stock of every medicine so as-of queries only replay recent movements"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--at',
+            help="Snapshot moment (ISO 8601). Defaults to the start of today.",
+        )
+
+    def handle(self, *args, **options):
+        if options['at']:
+            moment = parse_datetime(options['at'])
+            if moment is None:
+                raise CommandError("--at must be an ISO 8601 datetime")
+            if timezone.is_naive(moment):
+                moment = timezone.make_aware(moment)
+        else:
+            moment = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+
+        if moment > timezone.now():
+            raise CommandError("Cannot snapshot stock in the future")
+
+        count = take_snapshots(moment)
+        self.stdout.write(self.style.SUCCESS(f"Snapshotted {count} medicines at {moment.isoformat()}"))
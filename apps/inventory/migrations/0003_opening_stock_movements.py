@@ -0,0 +1,57 @@
+from django.db import migrations
+
+
+def create_opening_movements(apps, schema_editor):
+    """
+    Seed the ledger with one opening adjustment per medicine.
+
+    InventoryItem.current_stock is taken as the opening balance (it is what
+    low stock alerts were based on) and Medicine.quantity is aligned with it.
+    """
+    Medicine = apps.get_model("medicines", "Medicine")
+    InventoryItem = apps.get_model("inventory", "InventoryItem")
+    StockMovement = apps.get_model("inventory", "StockMovement")
+
+    stocks = dict(InventoryItem.objects.values_list("medicine_id", "current_stock"))
+    missing = []
+    movements = []
+    drifted = []
+    for medicine in Medicine.objects.only("pk", "quantity").iterator():
+        if medicine.pk not in stocks:
+            stocks[medicine.pk] = medicine.quantity
+            missing.append(
+                InventoryItem(
+                    medicine_id=medicine.pk,
+                    current_stock=medicine.quantity,
+                    reorder_level=10,
+                )
+            )
+        opening = stocks[medicine.pk]
+        if medicine.quantity != opening:
+            medicine.quantity = opening
+            drifted.append(medicine)
+        if opening:
+            movements.append(
+                StockMovement(
+                    medicine_id=medicine.pk,
+                    movement_type="adjustment",
+                    quantity=opening,
+                    note="Opening balance",
+                )
+            )
+
+    InventoryItem.objects.bulk_create(missing, batch_size=500)
+    Medicine.objects.bulk_update(drifted, ["quantity"], batch_size=500)
+    StockMovement.objects.bulk_create(movements, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0002_stockmovement_stocksnapshot"),
+        ("medicines", "0002_medicine_batch_number"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_opening_movements, migrations.RunPython.noop),
+    ]
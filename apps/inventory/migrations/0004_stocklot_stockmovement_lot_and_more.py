@@ -0,0 +1,75 @@
+# Generated by Django 5.2 on 2026-10-18 11:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0003_opening_stock_movements"),
+        ("medicines", "0003_medicine_medicine_name_upper_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockLot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("lot_number", models.CharField(blank=True, default="", max_length=50)),
+                ("expiration_date", models.DateField()),
+                ("quantity", models.PositiveIntegerField(default=0)),
+                ("received_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "medicine",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lots",
+                        to="medicines.medicine",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["expiration_date", "id"],
+            },
+        ),
+        migrations.AddField(
+            model_name="stockmovement",
+            name="lot",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="movements",
+                to="inventory.stocklot",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stocklot",
+            index=models.Index(
+                fields=["medicine", "expiration_date"],
+                name="inventory_s_medicin_aaa727_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stocklot",
+            index=models.Index(
+                fields=["expiration_date"], name="inventory_s_expirat_d81059_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="stocklot",
+            constraint=models.UniqueConstraint(
+                fields=("medicine", "lot_number", "expiration_date"),
+                name="unique_stock_lot",
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def create_opening_lots(apps, schema_editor):
+    """
+    Put the current stock of every medicine in one lot, numbered and dated
+    from the medicine's own batch_number and expiration_date.
+    """
+    Medicine = apps.get_model("medicines", "Medicine")
+    StockLot = apps.get_model("inventory", "StockLot")
+
+    lots = (
+        StockLot(
+            medicine_id=medicine_id,
+            lot_number=batch_number or "",
+            expiration_date=expiration_date,
+            quantity=quantity,
+        )
+        for medicine_id, batch_number, expiration_date, quantity in Medicine.objects.filter(
+            quantity__gt=0
+        ).values_list("pk", "batch_number", "expiration_date", "quantity").iterator()
+    )
+    StockLot.objects.bulk_create(lots, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0004_stocklot_stockmovement_lot_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_opening_lots, migrations.RunPython.noop),
+    ]
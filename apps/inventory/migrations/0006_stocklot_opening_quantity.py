@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 11:43
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def set_opening_quantities(apps, schema_editor):
+    """The part of each lot's quantity that its movements do not account for"""
+    StockLot = apps.get_model("inventory", "StockLot")
+    StockMovement = apps.get_model("inventory", "StockMovement")
+    moved = (
+        StockMovement.objects.filter(lot=OuterRef("pk"))
+        .order_by()
+        .values("lot")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    StockLot.objects.update(opening_quantity=models.F("quantity") - Coalesce(Subquery(moved), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("inventory", "0005_opening_stock_lots"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="stocklot",
+            name="opening_quantity",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(set_opening_quantities, migrations.RunPython.noop),
+    ]
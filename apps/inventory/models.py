@@ -1,10 +1,97 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from apps.medicines.models import Medicine
 
 class InventoryItem(models.Model):
+    """Current stock balance of a medicine, maintained from the StockMovement ledger"""
     medicine = models.OneToOneField(Medicine, on_delete=models.CASCADE)
     current_stock = models.PositiveIntegerField(default=0)
     reorder_level = models.PositiveIntegerField(default=10)
 
     def __str__(self):
         return f"Inventory for {self.medicine.name}"
+
+
+class StockLot(models.Model):
+    """Units of a medicine from one batch, with that batch's expiry date"""
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name='lots')
+    lot_number = models.CharField(max_length=50, blank=True, default='')
+    expiration_date = models.DateField()
+    quantity = models.PositiveIntegerField(default=0)
+    # Units the lot held when lot tracking started, which no movement
+    # records; quantity == opening_quantity + the lot's movements
+    opening_quantity = models.IntegerField(default=0)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['expiration_date', 'id']
+        indexes = [
+            models.Index(fields=['medicine', 'expiration_date']),
+            models.Index(fields=['expiration_date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['medicine', 'lot_number', 'expiration_date'],
+                                    name='unique_stock_lot'),
+        ]
+
+    def __str__(self):
+        return f"{self.medicine.name} lot {self.lot_number or '-'} ({self.expiration_date}): {self.quantity}"
+
+    @property
+    def is_expired(self):
+        return self.expiration_date < timezone.localdate()
+
+
+class StockMovement(models.Model):
+    """Append-only record of every stock change (positive in, negative out)"""
+    MOVEMENT_TYPES = [
+        ('receipt', 'Receipt'),
+        ('sale', 'Sale'),
+        ('adjustment', 'Adjustment'),
+        ('write_off', 'Write-off'),
+    ]
+
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name='stock_movements')
+    lot = models.ForeignKey(StockLot, on_delete=models.SET_NULL, null=True, blank=True,
+                            related_name='movements')
+    movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPES)
+    quantity = models.IntegerField()
+    reference = models.CharField(max_length=100, blank=True, default='')
+    note = models.TextField(blank=True, default='')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='stock_movements'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['medicine', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_movement_type_display()} {self.quantity:+d} {self.medicine.name}"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Stock movements are append-only and cannot be modified.")
+        super().save(*args, **kwargs)
+
+
+class StockSnapshot(models.Model):
+    """Stock of a medicine at a point in time (sum of all movements up to taken_at)"""
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name='stock_snapshots')
+    taken_at = models.DateTimeField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        ordering = ['-taken_at']
+        constraints = [
+            models.UniqueConstraint(fields=['medicine', 'taken_at'], name='unique_stock_snapshot'),
+        ]
+
+    def __str__(self):
+        return f"{self.medicine.name} @ {self.taken_at}: {self.quantity}"
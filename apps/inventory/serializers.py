@@ -1,5 +1,7 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import InventoryItem
+from .models import InventoryItem, StockLot, StockMovement
+from .ledger import record_movement
 from apps.medicines.serializers import MedicineSerializer
 
 class InventoryItemSerializer(serializers.ModelSerializer):
@@ -9,3 +11,94 @@ class InventoryItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = InventoryItem
         fields = '__all__'
+
+    def update(self, instance, validated_data):
+        current_stock = validated_data.pop('current_stock', None)
+
+        with transaction.atomic():
+            # Stock edits are posted to the ledger as adjustments
+            current = (
+                InventoryItem.objects.select_for_update()
+                .values_list('current_stock', flat=True)
+                .get(pk=instance.pk)
+            )
+            instance.current_stock = current
+            instance = super().update(instance, validated_data)
+
+            if current_stock is not None and current_stock != current:
+                request = self.context.get('request')
+                record_movement(
+                    instance.medicine, current_stock - current, 'adjustment',
+                    note='Manual edit', user=getattr(request, 'user', None)
+                )
+                instance.current_stock = current_stock
+
+        return instance
+
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    medicine_name = serializers.CharField(source='medicine.name', read_only=True)
+    movement_type_display = serializers.CharField(source='get_movement_type_display', read_only=True)
+    user_name = serializers.CharField(source='user.username', read_only=True, default=None)
+    # Receipts may name the lot they bring in; other movements are matched to lots FEFO
+    lot_number = serializers.CharField(max_length=50, required=False, allow_blank=True, write_only=True)
+    expiration_date = serializers.DateField(required=False, write_only=True)
+
+    class Meta:
+        model = StockMovement
+        fields = ['id', 'medicine', 'medicine_name', 'lot', 'lot_number', 'expiration_date',
+                  'movement_type', 'movement_type_display', 'quantity', 'reference', 'note',
+                  'user_name', 'created_at']
+        read_only_fields = ['lot', 'reference', 'created_at']
+
+    def validate(self, attrs):
+        movement_type = attrs['movement_type']
+        quantity = attrs['quantity']
+        if movement_type == 'sale':
+            raise serializers.ValidationError(
+                {'movement_type': 'Sales are recorded through checkout.'}
+            )
+        if quantity == 0:
+            raise serializers.ValidationError({'quantity': 'Quantity cannot be zero.'})
+        if movement_type == 'receipt' and quantity < 0:
+            raise serializers.ValidationError({'quantity': 'Receipts must be positive.'})
+        if 'expiration_date' in attrs and movement_type != 'receipt':
+            raise serializers.ValidationError(
+                {'expiration_date': 'Only receipts can name a lot.'}
+            )
+        if 'lot_number' in attrs and 'expiration_date' not in attrs:
+            raise serializers.ValidationError(
+                {'expiration_date': 'A lot needs its expiration date.'}
+            )
+        if movement_type == 'write_off':
+            # Write-offs are entered as a number of units removed
+            attrs['quantity'] = -abs(quantity)
+        return attrs
+
+    def create(self, validated_data):
+        request = self.context.get('request')
+        lot = None
+        if 'expiration_date' in validated_data:
+            lot, _ = StockLot.objects.get_or_create(
+                medicine=validated_data['medicine'],
+                lot_number=validated_data.get('lot_number', ''),
+                expiration_date=validated_data['expiration_date'],
+            )
+        return record_movement(
+            validated_data['medicine'],
+            validated_data['quantity'],
+            validated_data['movement_type'],
+            note=validated_data.get('note', ''),
+            user=getattr(request, 'user', None),
+            lot=lot,
+        )
+
+
+class StockLotSerializer(serializers.ModelSerializer):
+    medicine_name = serializers.CharField(source='medicine.name', read_only=True)
+    is_expired = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = StockLot
+        fields = ['id', 'medicine', 'medicine_name', 'lot_number', 'expiration_date',
+                  'quantity', 'is_expired', 'received_at']
@@ -1,3 +1,252 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+import numpy as np
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.medicines.models import Medicine
+from apps.sales.models import DailyMedicineSales
+from apps.users.models import CustomUser
+from .forecasting import Demand, forecast_reorder_levels, recalculate_reorder_levels
+from .ledger import InsufficientStock, record_movement, stock_as_of_queryset, take_snapshots
+from .models import InventoryItem, StockLot, StockMovement
+
+
+class StockLedgerTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='pharmacist', password='secret-pass', role='pharmacist'
+        )
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/medicines/', {
+            'name': 'Aspirin',
+            'category': 'Analgesic',
+            'price': '2.50',
+            'quantity': 40,
+            'expiration_date': (date.today() + timedelta(days=365)).isoformat(),
+        }, format='json')
+        self.medicine = Medicine.objects.get(pk=response.data['id'])
+
+    def test_initial_stock_is_a_receipt(self):
+        movement = StockMovement.objects.get(medicine=self.medicine)
+        self.assertEqual(movement.movement_type, 'receipt')
+        self.assertEqual(movement.quantity, 40)
+        self.assertEqual(self.medicine.quantity, 40)
+        self.assertEqual(self.medicine.inventoryitem.current_stock, 40)
+
+    def test_movements_update_both_balances(self):
+        record_movement(self.medicine, -15, 'write_off')
+
+        self.medicine.refresh_from_db()
+        inventory = InventoryItem.objects.get(medicine=self.medicine)
+        self.assertEqual(self.medicine.quantity, 25)
+        self.assertEqual(inventory.current_stock, 25)
+
+    def test_decrement_below_zero_is_refused_atomically(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            record_movement(self.medicine, -41, 'write_off')
+
+        self.assertEqual(raised.exception.shortages[0]['available'], 40)
+        self.medicine.refresh_from_db()
+        self.assertEqual(self.medicine.quantity, 40)
+        self.assertEqual(self.medicine.inventoryitem.current_stock, 40)
+        self.assertFalse(StockMovement.objects.filter(movement_type='write_off').exists())
+
+    def test_manual_edit_posts_adjustment(self):
+        inventory = InventoryItem.objects.get(medicine=self.medicine)
+        response = self.client.put(
+            f'/api/inventory/{inventory.pk}/', {'current_stock': 32}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        adjustment = StockMovement.objects.get(movement_type='adjustment')
+        self.assertEqual(adjustment.quantity, -8)
+        self.assertEqual(adjustment.user, self.user)
+        self.medicine.refresh_from_db()
+        self.assertEqual(self.medicine.quantity, 32)
+
+    def test_write_off_endpoint_removes_stock(self):
+        response = self.client.post('/api/inventory/movements/', {
+            'medicine': self.medicine.pk,
+            'movement_type': 'write_off',
+            'quantity': 5,
+            'note': 'Damaged',
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['quantity'], -5)
+        self.medicine.refresh_from_db()
+        self.assertEqual(self.medicine.quantity, 35)
+
+    def test_movement_list_validates_filters(self):
+        for query in ('limit=abc', 'limit=-1', 'limit=0', 'medicine=abc'):
+            response = self.client.get(f'/api/inventory/movements/?{query}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+
+        response = self.client.get(f'/api/inventory/movements/?medicine={self.medicine.pk}&limit=100000')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+    def test_stock_as_of_uses_snapshot_and_tail(self):
+        first = StockMovement.objects.get(medicine=self.medicine)
+        snapshot_at = timezone.now()
+        take_snapshots(snapshot_at)
+        record_movement(self.medicine, -10, 'write_off')
+        later = timezone.now()
+        record_movement(self.medicine, 3, 'receipt')
+
+        def stock_at(moment):
+            return stock_as_of_queryset(moment).get(pk=self.medicine.pk).stock_as_of
+
+        self.assertEqual(stock_at(first.created_at - timedelta(seconds=1)), 0)
+        self.assertEqual(stock_at(snapshot_at), 40)
+        self.assertEqual(stock_at(later), 30)
+        self.assertEqual(stock_at(timezone.now()), 33)
+
+
+class ReorderForecastTests(APITestCase):
+    def test_steady_demand_sets_lead_time_demand(self):
+        medicine = Medicine.objects.create(
+            name='Aspirin', category='Analgesic', price=Decimal('2.50'), quantity=500,
+            expiration_date=date.today() + timedelta(days=365),
+        )
+        InventoryItem.objects.create(medicine=medicine, current_stock=500, reorder_level=10)
+        today = timezone.localdate()
+        DailyMedicineSales.objects.bulk_create([
+            DailyMedicineSales(date=today - timedelta(days=day), medicine=medicine,
+                               quantity=12, revenue=Decimal('30.00'))
+            for day in range(1, 61)
+        ])
+
+        changes = recalculate_reorder_levels(history_days=60, lead_time=7)
+
+        self.assertEqual([(old, new) for item, old, new in changes], [(10, 84)])
+        self.assertEqual(InventoryItem.objects.get(medicine=medicine).reorder_level, 84)
+
+    def test_weekly_seasonality(self):
+        # 28 days starting on a Monday; the medicine only sells on Saturdays
+        start = date(2026, 3, 2)
+        demand = Demand([1], start, start + timedelta(days=27), window=28)
+        saturdays = np.array([(start + timedelta(days=day)).toordinal() for day in range(5, 28, 7)])
+        demand.add(np.ones(4, dtype=np.int64), saturdays, np.full(4, 70.0))
+
+        self.assertEqual(demand.recent.sum(), 280)
+        # The day after the history is a Monday: nothing is expected to sell
+        self.assertEqual(forecast_reorder_levels(demand, lead_time=1, service_level=0.5)[0], 0)
+        # A week of lead time covers one Saturday
+        self.assertEqual(forecast_reorder_levels(demand, lead_time=7, service_level=0.5)[0], 70)
+
+
+class StockLotTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='pharmacist', password='secret-pass', role='pharmacist'
+        )
+        self.client.force_authenticate(self.user)
+        self.today = timezone.localdate()
+        response = self.client.post('/api/medicines/', {
+            'name': 'Aspirin',
+            'category': 'Analgesic',
+            'price': '2.50',
+            'quantity': 10,
+            'batch_number': 'A-LATE',
+            'expiration_date': (self.today + timedelta(days=300)).isoformat(),
+        }, format='json')
+        self.medicine = Medicine.objects.get(pk=response.data['id'])
+        for lot_number, days, quantity in (('A-SOON', 30, 5), ('A-OLD', -10, 4)):
+            response = self.client.post('/api/inventory/movements/', {
+                'medicine': self.medicine.pk,
+                'movement_type': 'receipt',
+                'quantity': quantity,
+                'lot_number': lot_number,
+                'expiration_date': (self.today + timedelta(days=days)).isoformat(),
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def lot_stock(self):
+        return dict(StockLot.objects.values_list('lot_number', 'quantity'))
+
+    def test_initial_and_received_stock_is_tracked_per_lot(self):
+        self.assertEqual(self.lot_stock(), {'A-LATE': 10, 'A-SOON': 5, 'A-OLD': 4})
+        self.medicine.refresh_from_db()
+        self.assertEqual(self.medicine.quantity, 19)
+
+    def test_sales_take_unexpired_lots_first_expiry_first(self):
+        response = self.client.post('/api/sales/', {
+            'customer_name': 'Jane Doe',
+            'total_amount': '17.50',
+            'payment_method': 'cash',
+            'items_data': [{'medicine_id': self.medicine.pk, 'quantity': 7, 'price': '2.50'}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.lot_stock(), {'A-LATE': 8, 'A-SOON': 0, 'A-OLD': 4})
+        self.assertEqual(
+            sorted(StockMovement.objects.filter(movement_type='sale').values_list('lot__lot_number', 'quantity')),
+            [('A-LATE', -2), ('A-SOON', -5)],
+        )
+
+        lot = StockLot.objects.get(lot_number='A-SOON')
+        response = self.client.get(f'/api/inventory/lots/{lot.pk}/sales/')
+        self.assertEqual(response.data['units_sold'], 5)
+        self.assertEqual(response.data['sales'][0]['customer_name'], 'Jane Doe')
+
+    def test_expired_lots_are_never_sold(self):
+        for lot in StockLot.objects.exclude(lot_number='A-OLD'):
+            record_movement(self.medicine, -lot.quantity, 'write_off', lot=lot)
+        self.assertEqual(self.lot_stock(), {'A-LATE': 0, 'A-SOON': 0, 'A-OLD': 4})
+
+        response = self.client.post('/api/sales/', {
+            'customer_name': 'Jane Doe',
+            'total_amount': '2.50',
+            'payment_method': 'cash',
+            'items_data': [{'medicine_id': self.medicine.pk, 'quantity': 1, 'price': '2.50'}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['items'][0]['available'], 0)
+        self.assertEqual(self.lot_stock()['A-OLD'], 4)
+        self.assertFalse(StockMovement.objects.filter(movement_type='sale').exists())
+
+        with self.assertRaises(InsufficientStock):
+            record_movement(self.medicine, -1, 'sale')
+
+    def test_reconcile_checks_lot_quantities(self):
+        StockLot.objects.filter(lot_number='A-SOON').update(quantity=1)
+
+        out = StringIO()
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn('lot A-SOON', out.getvalue())
+        self.assertIn('1 balances drifted', out.getvalue())
+
+        call_command('reconcile_stock', '--fix', stdout=StringIO())
+        self.assertEqual(self.lot_stock()['A-SOON'], 5)
+
+        StockLot.objects.filter(lot_number='A-OLD').update(quantity=40, opening_quantity=36)
+        out = StringIO()
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn('lots hold 55, stock 19', out.getvalue())
+
+    def test_write_offs_take_the_oldest_lot(self):
+        record_movement(self.medicine, -6, 'write_off')
+
+        self.assertEqual(self.lot_stock(), {'A-LATE': 10, 'A-SOON': 3, 'A-OLD': 0})
+
+    def test_expiry_report_is_per_lot(self):
+        response = self.client.get('/api/sales/reports/expired-medicines/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(row['batch_number'], row['quantity']) for row in response.data['expired_medicines']],
+                         [('A-OLD', 4)])
+
+        response = self.client.get('/api/inventory/lots/', {
+            'expiring_before': (self.today + timedelta(days=60)).isoformat()
+        })
+        self.assertEqual([lot['lot_number'] for lot in response.data], ['A-OLD', 'A-SOON'])
+
+        response = self.client.get('/api/inventory/lots/', {'medicine': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
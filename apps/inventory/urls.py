@@ -9,5 +9,11 @@ urlpatterns = [
     # Alerts & Stats
     path('alerts/low-stock/', views.LowStockAlertAPIView.as_view(), name='low_stock_alert'),
     path('stats/', views.InventoryStatsAPIView.as_view(), name='inventory_stats'),
+
+    # Stock ledger
+    path('movements/', views.StockMovementListCreateAPIView.as_view(), name='stock_movement_list_create'),
+    path('lots/', views.StockLotListAPIView.as_view(), name='stock_lot_list'),
+    path('lots/<int:pk>/sales/', views.StockLotSalesAPIView.as_view(), name='stock_lot_sales'),
+    path('stock-as-of/', views.StockAsOfAPIView.as_view(), name='stock_as_of'),
 ]
 
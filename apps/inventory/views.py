@@ -4,9 +4,14 @@ from rest_framework import status
 from django.shortcuts import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from apps.users.permissions import IsAdminOrPharmacist
-from .models import InventoryItem
-from .serializers import InventoryItemSerializer
+from .models import InventoryItem, StockLot, StockMovement
+from .serializers import InventoryItemSerializer, StockLotSerializer, StockMovementSerializer
+from .ledger import InsufficientStock, stock_as_of_queryset
 from apps.medicines.models import Medicine
+from pharmacy_system.pagination import list_response
+
+DEFAULT_MOVEMENTS_LIMIT = 50
+MAX_MOVEMENTS_LIMIT = 500
 
 
 class InventoryListCreateAPIView(APIView):
@@ -14,9 +19,8 @@ class InventoryListCreateAPIView(APIView):
     permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
 
     def get(self, request):
-        inventory_items = InventoryItem.objects.all()
-        serializer = InventoryItemSerializer(inventory_items, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        inventory_items = InventoryItem.objects.select_related('medicine')
+        return list_response(request, inventory_items, InventoryItemSerializer, ('id',), view=self)
 
     def post(self, request):
         serializer = InventoryItemSerializer(data=request.data)
@@ -31,15 +35,18 @@ class InventoryDetailAPIView(APIView):
     permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
 
     def get(self, request, pk):
-        inventory_item = get_object_or_404(InventoryItem, pk=pk)
+        inventory_item = get_object_or_404(InventoryItem.objects.select_related('medicine'), pk=pk)
         serializer = InventoryItemSerializer(inventory_item)
         return Response(serializer.data)
 
     def put(self, request, pk):
         inventory_item = get_object_or_404(InventoryItem, pk=pk)
-        serializer = InventoryItemSerializer(inventory_item, data=request.data, partial=True)
+        serializer = InventoryItemSerializer(inventory_item, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
-            serializer.save()
+            try:
+                serializer.save()
+            except InsufficientStock as exc:
+                return Response(exc.as_response_data(), status=status.HTTP_409_CONFLICT)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -57,10 +64,10 @@ class LowStockAlertAPIView(APIView):
         from django.db.models import F
         low_stock_items = InventoryItem.objects.filter(
             current_stock__lte=F('reorder_level')
-        )
+        ).select_related('medicine')
         serializer = InventoryItemSerializer(low_stock_items, many=True)
         return Response({
-            "count": low_stock_items.count(),
+            "count": len(serializer.data),
             "items": serializer.data
         }, status=status.HTTP_200_OK)
 
@@ -95,3 +102,147 @@ class InventoryStatsAPIView(APIView):
             "low_stock_items": low_stock_list
         }, status=status.HTTP_200_OK)
 
+
+class StockMovementListCreateAPIView(APIView):
+    """GET stock movement ledger | POST receipt, adjustment or write-off"""
+    permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
+
+    def get(self, request):
+        movements = StockMovement.objects.select_related('medicine', 'user')
+
+        medicine_filter = request.query_params.get('medicine')
+        type_filter = request.query_params.get('type')
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_MOVEMENTS_LIMIT))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response({"error": "Invalid limit, expected a positive integer"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, MAX_MOVEMENTS_LIMIT)
+
+        if medicine_filter:
+            try:
+                movements = movements.filter(medicine_id=int(medicine_filter))
+            except ValueError:
+                return Response({"error": "Invalid medicine, expected a medicine id"},
+                                status=status.HTTP_400_BAD_REQUEST)
+        if type_filter:
+            movements = movements.filter(movement_type=type_filter)
+
+        serializer = StockMovementSerializer(movements[:limit], many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def post(self, request):
+        serializer = StockMovementSerializer(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            try:
+                serializer.save()
+            except InsufficientStock as exc:
+                return Response(exc.as_response_data(), status=status.HTTP_409_CONFLICT)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class StockAsOfAPIView(APIView):
+    """GET stock of every medicine at the end of a given date"""
+    permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
+
+    def get(self, request):
+        from datetime import datetime, time, timedelta
+        from django.utils import timezone
+
+        date_str = request.query_params.get('date', timezone.localdate().isoformat())
+        try:
+            as_of_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        except ValueError:
+            return Response({"error": "Invalid date, expected YYYY-MM-DD"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # End of the requested day, i.e. just before the next midnight
+        moment = timezone.make_aware(
+            datetime.combine(as_of_date + timedelta(days=1), time.min)
+        ) - timedelta(microseconds=1)
+
+        medicines = stock_as_of_queryset(moment).order_by('name').values(
+            'id', 'name', 'category', 'stock_as_of'
+        )
+        return Response({
+            "date": as_of_date.isoformat(),
+            "items": [
+                {
+                    "medicine": medicine['id'],
+                    "medicine_name": medicine['name'],
+                    "category": medicine['category'],
+                    "stock": medicine['stock_as_of'],
+                }
+                for medicine in medicines
+            ]
+        }, status=status.HTTP_200_OK)
+
+
+class StockLotListAPIView(APIView):
+    """
+    GET stock lots, soonest expiry first. Filters: ?medicine=,
+    ?expiring_before=YYYY-MM-DD and ?include_empty=true (lots sold out).
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
+
+    def get(self, request):
+        from datetime import datetime
+
+        lots = StockLot.objects.select_related('medicine')
+        if request.query_params.get('include_empty', '').lower() not in ('1', 'true', 'yes'):
+            lots = lots.filter(quantity__gt=0)
+        medicine_filter = request.query_params.get('medicine')
+        if medicine_filter:
+            try:
+                lots = lots.filter(medicine_id=int(medicine_filter))
+            except ValueError:
+                return Response({"error": "Invalid medicine, expected a medicine id"},
+                                status=status.HTTP_400_BAD_REQUEST)
+        expiring_before = request.query_params.get('expiring_before')
+        if expiring_before:
+            try:
+                lots = lots.filter(
+                    expiration_date__lt=datetime.strptime(expiring_before, '%Y-%m-%d').date()
+                )
+            except ValueError:
+                return Response({"error": "Invalid expiring_before, expected YYYY-MM-DD"},
+                                status=status.HTTP_400_BAD_REQUEST)
+        return list_response(request, lots, StockLotSerializer, ('expiration_date', 'id'), view=self)
+
+
+class StockLotSalesAPIView(APIView):
+    """GET the sales a lot went into (recalls)"""
+    permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
+
+    def get(self, request, pk):
+        from django.db.models import Sum
+        from apps.sales.models import Sale
+
+        lot = get_object_or_404(StockLot.objects.select_related('medicine'), pk=pk)
+        units = {}
+        rows = (
+            StockMovement.objects.filter(lot=lot, movement_type='sale')
+            .order_by().values('reference').annotate(units=Sum('quantity'))
+        )
+        for row in rows:
+            # Sale movements are referenced as "sale:<id>"
+            units[int(row['reference'].split(':')[1])] = -row['units']
+        sales = Sale.objects.filter(pk__in=list(units)).order_by('date', 'id').values(
+            'id', 'date', 'customer_name'
+        )
+        return Response({
+            "lot": StockLotSerializer(lot).data,
+            "units_sold": sum(units.values()),
+            "sales": [
+                {
+                    "sale": sale['id'],
+                    "date": sale['date'],
+                    "customer_name": sale['customer_name'],
+                    "quantity": units[sale['id']],
+                }
+                for sale in sales
+            ],
+        }, status=status.HTTP_200_OK)
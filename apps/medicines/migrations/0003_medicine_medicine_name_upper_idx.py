@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 11:01
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("medicines", "0002_medicine_batch_number"),
+        ("suppliers", "0004_purchaseorder_suppliers_p_order_d_13948b_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="medicine",
+            index=models.Index(
+                django.db.models.functions.text.Upper("name"),
+                name="medicine_name_upper_idx",
+            ),
+        ),
+    ]
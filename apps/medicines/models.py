@@ -1,8 +1,30 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 from apps.suppliers.models import Supplier
 
 
+class MedicineQuerySet(models.QuerySet):
+    def with_stock_flags(self, today=None):
+        """Annotate expired/low stock flags so listings need no per-row queries"""
+        today = today or timezone.now().date()
+        return self.annotate(
+            expired_flag=models.Case(
+                models.When(expiration_date__lt=today, then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            ),
+            low_stock_flag=models.Case(
+                models.When(
+                    inventoryitem__current_stock__lte=models.F('inventoryitem__reorder_level'),
+                    then=models.Value(True),
+                ),
+                default=models.Value(False),
+                output_field=models.BooleanField(),
+            ),
+        )
+
+
 class Medicine(models.Model):
     name = models.CharField(max_length=100)
     category = models.CharField(max_length=50)
@@ -12,20 +34,33 @@ class Medicine(models.Model):
     expiration_date = models.DateField()
     supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, blank=True)
 
+    objects = MedicineQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Case-insensitive name lookups (purchase order lines, imports)
+            models.Index(Upper('name'), name='medicine_name_upper_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.category})"
     
     @property
     def is_expired(self):
         """Vérifie si le médicament est périmé"""
+        if hasattr(self, 'expired_flag'):
+            return self.expired_flag
         return self.expiration_date < timezone.now().date()
     
     @property
     def is_low_stock(self):
         """Vérifie si le stock est bas (basé sur l'inventaire)"""
         from apps.inventory.models import InventoryItem
+        if hasattr(self, 'low_stock_flag'):
+            return self.low_stock_flag
+        # Uses the cached inventory row when loaded with select_related
         try:
-            inventory_item = InventoryItem.objects.get(medicine=self)
+            inventory_item = self.inventoryitem
             return inventory_item.current_stock <= inventory_item.reorder_level
         except InventoryItem.DoesNotExist:
             return False
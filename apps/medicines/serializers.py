@@ -1,9 +1,13 @@
+from django.db import transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
 from rest_framework import serializers
 from .models import Medicine
 from apps.inventory.models import InventoryItem
+from apps.inventory.ledger import record_movement
 
 class MedicineSerializer(serializers.ModelSerializer):
-    is_expired = serializers.BooleanField(read_only=True)
+    is_expired = serializers.SerializerMethodField()
     is_low_stock = serializers.BooleanField(read_only=True)
     
     class Meta:
@@ -21,16 +25,60 @@ class MedicineSerializer(serializers.ModelSerializer):
             "is_low_stock",
         ]
     
-      
+    @cached_property
+    def today(self):
+        # One clock read per listing rather than per row
+        return timezone.now().date()
+
+    def get_is_expired(self, obj):
+        if hasattr(obj, "expired_flag"):
+            return obj.expired_flag
+        return obj.expiration_date < self.today
+
+    def _request_user(self):
+        request = self.context.get("request")
+        return getattr(request, "user", None)
+
     def create(self, validated_data):
-        quantity = validated_data.get("quantity", 0)
+        quantity = validated_data.pop("quantity", 0)
+
+        with transaction.atomic():
+            # Stock starts at zero and is brought in through the ledger
+            medicine = Medicine.objects.create(quantity=0, **validated_data)
+
+            InventoryItem.objects.create(
+              medicine=medicine,
+              current_stock=0,
+              reorder_level=10
+            )
+            if quantity:
+                record_movement(
+                    medicine, quantity, "receipt",
+                    note="Initial stock", user=self._request_user()
+                )
+            medicine.quantity = quantity
+
+        return medicine
+
+    def update(self, instance, validated_data):
+        quantity = validated_data.pop("quantity", None)
 
-        medicine = Medicine.objects.create(**validated_data)
+        with transaction.atomic():
+            # Never write back a stale quantity: re-read it under lock and
+            # post the difference to the ledger as an adjustment
+            current = (
+                Medicine.objects.select_for_update()
+                .values_list("quantity", flat=True)
+                .get(pk=instance.pk)
+            )
+            instance.quantity = current
+            instance = super().update(instance, validated_data)
 
-        InventoryItem.objects.create(
-          medicine=medicine,
-          current_stock=quantity,
-          reorder_level=10
-       )
+            if quantity is not None and quantity != current:
+                record_movement(
+                    instance, quantity - current, "adjustment",
+                    note="Manual edit", user=self._request_user()
+                )
+                instance.quantity = quantity
 
-        return medicine
\ No newline at end of file
+        return instance
@@ -1,3 +1,54 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from apps.inventory.models import InventoryItem
+from apps.users.models import CustomUser
+from .models import Medicine
+
+
+class MedicineListingTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='admin', password='secret-pass', role='admin'
+        )
+        self.client.force_authenticate(self.user)
+
+    def add_medicines(self, count, start=0):
+        for i in range(start, start + count):
+            medicine = Medicine.objects.create(
+                name=f'Medicine {i}',
+                category='General',
+                price=Decimal('1.00'),
+                quantity=i,
+                expiration_date=date.today() + timedelta(days=i - 2),
+            )
+            InventoryItem.objects.create(medicine=medicine, current_stock=i, reorder_level=5)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_flags_are_annotated(self):
+        self.add_medicines(8)
+
+        response = self.client.get('/api/medicines/')
+
+        flags = {row['name']: (row['is_expired'], row['is_low_stock']) for row in response.data}
+        self.assertEqual(flags['Medicine 0'], (True, True))
+        self.assertEqual(flags['Medicine 3'], (False, True))
+        self.assertEqual(flags['Medicine 7'], (False, False))
+
+    def test_listings_use_constant_queries(self):
+        urls = ['/api/medicines/', '/api/inventory/', '/api/inventory/alerts/low-stock/']
+        self.add_medicines(3)
+        small = [self.count_queries(url) for url in urls]
+        self.add_medicines(30, start=3)
+        large = [self.count_queries(url) for url in urls]
+
+        self.assertEqual(small, large)
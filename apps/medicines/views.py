@@ -7,18 +7,19 @@ from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from rest_framework.permissions import IsAuthenticated
 from apps.users.permissions import IsAdminOrPharmacist
+from apps.inventory.ledger import InsufficientStock
+from pharmacy_system.pagination import list_response
 
 class MedicineListCreateAPIView(APIView):
     """GET all medicines | POST new medicine"""
     permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
 
     def get(self, request):
-        medicines = Medicine.objects.all()
-        serializer = MedicineSerializer(medicines, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        medicines = Medicine.objects.with_stock_flags()
+        return list_response(request, medicines, MedicineSerializer, ('id',), view=self)
 
     def post(self, request):
-        serializer = MedicineSerializer(data=request.data)
+        serializer = MedicineSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -30,15 +31,18 @@ class MedicineDetailAPIView(APIView):
     permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
 
     def get(self, request, pk):
-        medicine = get_object_or_404(Medicine, pk=pk)
+        medicine = get_object_or_404(Medicine.objects.with_stock_flags(), pk=pk)
         serializer = MedicineSerializer(medicine)
         return Response(serializer.data)
 
     def put(self, request, pk):
         medicine = get_object_or_404(Medicine, pk=pk)
-        serializer = MedicineSerializer(medicine, data=request.data, partial=True)
+        serializer = MedicineSerializer(medicine, data=request.data, partial=True, context={'request': request})
         if serializer.is_valid():
-            serializer.save()
+            try:
+                serializer.save()
+            except InsufficientStock as exc:
+                return Response(exc.as_response_data(), status=status.HTTP_409_CONFLICT)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -53,6 +57,6 @@ class ExpiredMedicinesAPIView(APIView):
     permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
 
     def get(self, request):
-        expired_medicines = Medicine.objects.filter(expiration_date__lt=timezone.now().date())
+        expired_medicines = Medicine.objects.with_stock_flags().filter(expiration_date__lt=timezone.now().date())
         serializer = MedicineSerializer(expired_medicines, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
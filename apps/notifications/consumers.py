@@ -0,0 +1,70 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .models import Notification
+from .counters import unread_count
+from .push import CATCH_UP_LIMIT, user_group
+from .serializers import NotificationSerializer
+
+
+class NotificationConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live notifications of the connected user.
+
+    Connect to ``ws/notifications/?token=<access token>&since=<id>``; the
+    notifications newer than ``since`` are sent first, then new ones as they
+    are created. ``{"type": "catch_up", "since": <id>}`` asks for the backlog
+    again on an open socket.
+    """
+
+    async def connect(self):
+        self.user = self.scope.get('user')
+        if self.user is None or not self.user.is_authenticated:
+            await self.close(code=4401)
+            return
+        self.group = user_group(self.user.pk)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+        await self.catch_up(self.scope.get('since'))
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group'):
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') == 'catch_up':
+            await self.catch_up(content.get('since'))
+
+    async def catch_up(self, since):
+        try:
+            since = int(since) if since not in (None, '') else None
+        except (TypeError, ValueError):
+            since = None
+        notifications, unread_count = await self.backlog(since)
+        await self.send_json({
+            'type': 'catch_up',
+            'notifications': notifications,
+            'unread_count': unread_count,
+        })
+
+    @database_sync_to_async
+    def backlog(self, since):
+        """Notifications after ``since`` (the latest ones without it), newest first"""
+        notifications = Notification.objects.filter(user=self.user)
+        if since is not None:
+            notifications = notifications.filter(pk__gt=since)
+        notifications = notifications.order_by('-id')[:CATCH_UP_LIMIT if since is not None else 10]
+        return (
+            NotificationSerializer(notifications, many=True).data,
+            unread_count(self.user.pk),
+        )
+
+    async def notification_created(self, event):
+        await self.send_json({
+            'type': 'notification',
+            'notification': event['notification'],
+            'unread_count': event['unread_count'],
+        })
+
+    async def unread_count(self, event):
+        await self.send_json({'type': 'unread_count', 'unread_count': event['unread_count']})
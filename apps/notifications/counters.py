@@ -0,0 +1,116 @@
+"""
+Per-user unread notification counters.
+
+NotificationCounter.unread is moved by adjust() in the same transaction as
+the notifications it counts: +1 per unread notification created, -n when
+notifications are marked read. Reads go through unread_count(), a primary
+key lookup. When settings.NOTIFICATION_COUNT_CACHE names a cache shared by
+every worker (e.g. Redis), counts are also cached there for
+NOTIFICATION_COUNT_CACHE_TIMEOUT seconds and dropped when the counter
+changes; a per-process cache would serve other workers stale badges, so
+there is no caching by default. The recount_notifications command rebuilds
+the counters from the notifications table if they ever drift.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, When
+
+DEFAULT_CACHE_TIMEOUT = 60
+
+
+def cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def get_cache():
+    """The cache holding unread counts, or None when they are not cached"""
+    alias = getattr(settings, 'NOTIFICATION_COUNT_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def forget(user_ids):
+    """Drop cached counts of ``user_ids``"""
+    cache = get_cache()
+    if cache is not None:
+        cache.delete_many([cache_key(user_id) for user_id in user_ids])
+
+
+def adjust(deltas):
+    """Add ``deltas[user_id]`` to each user's unread counter (two statements)"""
+    from .models import NotificationCounter
+
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id) for user_id in deltas], ignore_conflicts=True
+        )
+        NotificationCounter.objects.filter(pk__in=list(deltas)).update(unread=Case(
+            *(When(pk=user_id, then=F('unread') + delta) for user_id, delta in deltas.items()),
+            default=F('unread'),
+            output_field=IntegerField(),
+        ))
+    # Dropped now and again after commit, in case a reader cached the old
+    # value in between
+    user_ids = list(deltas)
+    forget(user_ids)
+    transaction.on_commit(lambda: forget(user_ids))
+
+
+def unread_counts(user_ids):
+    """Unread count per user id, from the cache or the counters"""
+    from .models import NotificationCounter
+
+    user_ids = list(user_ids)
+    cache = get_cache()
+    counts = {}
+    if cache is not None:
+        cached = cache.get_many([cache_key(user_id) for user_id in user_ids])
+        counts = {user_id: cached[cache_key(user_id)] for user_id in user_ids if cache_key(user_id) in cached}
+    missing = [user_id for user_id in user_ids if user_id not in counts]
+    if missing:
+        found = dict.fromkeys(missing, 0)
+        found.update(NotificationCounter.objects.filter(pk__in=missing).values_list('pk', 'unread'))
+        if cache is not None:
+            cache.set_many(
+                {cache_key(user_id): unread for user_id, unread in found.items()},
+                getattr(settings, 'NOTIFICATION_COUNT_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT),
+            )
+        counts.update(found)
+    return counts
+
+
+def unread_count(user_id):
+    return unread_counts([user_id])[user_id]
+
+
+def recount(user_ids=None):
+    """
+    Rebuild counters from the notifications table.
+
+    Returns:
+        Number of counters written
+    """
+    from django.contrib.auth import get_user_model
+    from .models import Notification, NotificationCounter
+
+    users = get_user_model().objects.all()
+    notifications = Notification.objects.filter(is_read=False)
+    if user_ids is not None:
+        users = users.filter(pk__in=list(user_ids))
+        notifications = notifications.filter(user_id__in=list(user_ids))
+    user_ids = list(users.values_list('pk', flat=True))
+    unread = dict.fromkeys(user_ids, 0)
+    unread.update(
+        notifications.order_by().values('user_id').annotate(unread=Count('id'))
+        .values_list('user_id', 'unread')
+    )
+    with transaction.atomic():
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id, unread=count) for user_id, count in unread.items()],
+            update_conflicts=True, unique_fields=['user'], update_fields=['unread'], batch_size=1000,
+        )
+    forget(user_ids)
+    return len(unread)
@@ -0,0 +1,115 @@
+"""
+Low stock digests.
+
+With ``settings.LOW_STOCK_ALERT_MODE = 'digest'``, checkout does not alert
+every admin about every medicine that runs low. It upserts one LowStockEvent
+per medicine (a single statement per basket), and the
+send_low_stock_digests command, run periodically, turns the buffer into one
+summary notification per admin listing the medicines still low, most severe
+first.
+
+The per-medicine alerts stay available on demand from low_stock_alerts(),
+computed from the live inventory.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.inventory.models import InventoryItem
+from . import counters
+from .models import LowStockEvent, Notification
+from .push import publish_created
+
+SEVERITY = {'critical': 0, 'high': 1, 'medium': 2}
+
+MAX_DIGEST_LINES = 50
+
+
+def buffer_low_stock(low_stock):
+    """Record (inventory item, new stock) pairs for the next digest"""
+    LowStockEvent.objects.bulk_create(
+        [
+            LowStockEvent(medicine_id=inventory_item.medicine_id, stock=new_stock,
+                          reorder_level=inventory_item.reorder_level)
+            for inventory_item, new_stock in low_stock
+        ],
+        update_conflicts=True,
+        unique_fields=['medicine'],
+        update_fields=['stock', 'reorder_level', 'updated_at'],
+    )
+
+
+def alert_entry(medicine_id, medicine_name, stock, reorder_level):
+    return {
+        "medicine": medicine_id,
+        "medicine_name": medicine_name,
+        "stock": stock,
+        "reorder_level": reorder_level,
+        "priority": Notification.low_stock_priority(stock, reorder_level),
+    }
+
+
+def by_severity(entries):
+    return sorted(entries, key=lambda entry: (SEVERITY[entry['priority']], entry['stock'],
+                                              entry['medicine_name']))
+
+
+def low_stock_alerts(medicine_ids=None):
+    """One alert per medicine currently at or below its reorder level, most severe first"""
+    items = InventoryItem.objects.filter(current_stock__lte=F('reorder_level'))
+    if medicine_ids is not None:
+        items = items.filter(medicine_id__in=list(medicine_ids))
+    return by_severity(
+        alert_entry(*row) for row in
+        items.values_list('medicine_id', 'medicine__name', 'current_stock', 'reorder_level')
+    )
+
+
+def digest_message(entries):
+    lines = [
+        f"- {entry['medicine_name']}: {entry['stock']} units (reorder level: "
+        f"{entry['reorder_level']}, {entry['priority']})"
+        for entry in entries[:MAX_DIGEST_LINES]
+    ]
+    if len(entries) > MAX_DIGEST_LINES:
+        lines.append(f"... and {len(entries) - MAX_DIGEST_LINES} more")
+    return "\n".join(lines)
+
+
+def send_low_stock_digests():
+    """
+    Send one digest per admin for the buffered events and clear them.
+    Medicines restocked since their event are left out.
+
+    Returns:
+        The created notifications
+    """
+    started = timezone.now()
+    with transaction.atomic():
+        events = list(LowStockEvent.objects.select_for_update().values_list('id', 'medicine_id'))
+        if not events:
+            return []
+        entries = low_stock_alerts(medicine_id for _, medicine_id in events)
+        # Events upserted after we started belong to the next digest
+        LowStockEvent.objects.filter(
+            id__in=[event_id for event_id, _ in events], updated_at__lte=started
+        ).delete()
+        if not entries:
+            return []
+
+        admin_ids = list(get_user_model().objects.filter(role='admin').values_list('pk', flat=True))
+        count = len(entries)
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                user_id=admin_id,
+                notification_type='low_stock_digest',
+                title=f"⚠️ Low stock: {count} medicine{'s' if count > 1 else ''}",
+                message=digest_message(entries),
+                priority=entries[0]['priority'],
+            )
+            for admin_id in admin_ids
+        ])
+        counters.adjust({admin_id: 1 for admin_id in admin_ids})
+        publish_created(notifications)
+    return notifications
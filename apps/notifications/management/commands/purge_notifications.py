@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.notifications import retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove notifications older than settings.NOTIFICATION_RETENTION allows, in "
+        "bounded batches, archiving them to compressed JSON lines files first"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=retention.DEFAULT_BATCH_SIZE,
+                            help="Notifications removed per transaction")
+        parser.add_argument('--archive-dir', default=None,
+                            help="Archive directory (default: settings.NOTIFICATION_ARCHIVE_DIR)")
+        parser.add_argument('--no-archive', action='store_true', help="Delete without archiving")
+        parser.add_argument('--dry-run', action='store_true', help="Count what would be removed")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+        archive_dir = None
+        if not options['no_archive']:
+            archive_dir = options['archive_dir'] or getattr(settings, 'NOTIFICATION_ARCHIVE_DIR', None)
+            if not archive_dir:
+                raise CommandError("Set NOTIFICATION_ARCHIVE_DIR, pass --archive-dir or use --no-archive")
+
+        removed = retention.purge(
+            batch_size=options['batch_size'],
+            archive_dir=str(archive_dir) if archive_dir else None,
+            dry_run=options['dry_run'],
+        )
+        for (notification_type, priority), count in sorted(removed.items()):
+            self.stdout.write(f"{notification_type}/{priority}: {count}")
+
+        verb = "Would remove" if options['dry_run'] else "Removed"
+        where = f", archived to {archive_dir}" if archive_dir and not options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(f"{verb} {sum(removed.values())} notifications{where}"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from apps.notifications import counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-user unread notification counters from the notifications table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help="Only recount this user id (repeatable)")
+
+    def handle(self, *args, **options):
+        written = counters.recount(options['users'])
+        self.stdout.write(self.style.SUCCESS(f"Recounted unread notifications of {written} users"))
@@ -0,0 +1,43 @@
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.notifications import retention
+
+
+def parse_date(value):
+    try:
+        return timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+    except ValueError:
+        raise CommandError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Print archived notifications (see purge_notifications) as JSON lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archive-dir', default=None,
+                            help="Archive directory (default: settings.NOTIFICATION_ARCHIVE_DIR)")
+        parser.add_argument('--user', type=int, help="User id")
+        parser.add_argument('--type', dest='notification_type', help="Notification type")
+        parser.add_argument('--related', type=int, help="Related object id (e.g. medicine id)")
+        parser.add_argument('--since', help="Created on or after this date (YYYY-MM-DD)")
+        parser.add_argument('--until', help="Created before this date (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        archive_dir = options['archive_dir'] or getattr(settings, 'NOTIFICATION_ARCHIVE_DIR', None)
+        if not archive_dir:
+            raise CommandError("Set NOTIFICATION_ARCHIVE_DIR or pass --archive-dir")
+        rows = retention.search_archive(
+            str(archive_dir),
+            user_id=options['user'],
+            notification_type=options['notification_type'],
+            related_object_id=options['related'],
+            since=parse_date(options['since']) if options['since'] else None,
+            until=parse_date(options['until']) if options['until'] else None,
+        )
+        for row in rows:
+            self.stdout.write(json.dumps(row, ensure_ascii=False))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.notifications import digests
+
+
+class Command(BaseCommand):
+    help = (
+        "Send each admin one summary of the medicines that ran low since the last "
+        "digest (settings.LOW_STOCK_ALERT_MODE = 'digest'); run it periodically"
+    )
+
+    def handle(self, *args, **options):
+        notifications = digests.send_low_stock_digests()
+        self.stdout.write(self.style.SUCCESS(f"Sent {len(notifications)} low stock digests"))
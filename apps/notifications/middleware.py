@@ -0,0 +1,32 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+
+@database_sync_to_async
+def user_from_token(raw_token):
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticate WebSocket connections with the API's JWT access token.
+    Browsers cannot set headers on a WebSocket, so the token is read from
+    the ``token`` query parameter; ``since`` is passed on in the scope.
+    """
+
+    async def __call__(self, scope, receive, send):
+        params = parse_qs(scope.get('query_string', b'').decode())
+        token = params.get('token', [None])[0]
+        scope = dict(scope)
+        scope['user'] = await user_from_token(token) if token else AnonymousUser()
+        scope['since'] = params.get('since', [None])[0]
+        return await super().__call__(scope, receive, send)
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-18 10:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["user", "-created_at"], name="notificatio_user_id_05b4bc_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-18 11:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_duplicate_alerts_read(apps, schema_editor):
+    """Keep only the newest unread low stock alert per user and medicine"""
+    Notification = apps.get_model("notifications", "Notification")
+    unread = Notification.objects.filter(notification_type="low_stock", is_read=False)
+    duplicates = []
+    seen = set()
+    for pk, user_id, related_object_id in unread.order_by("-created_at", "-id").values_list(
+        "pk", "user_id", "related_object_id"
+    ):
+        if related_object_id is None:
+            continue
+        if (user_id, related_object_id) in seen:
+            duplicates.append(pk)
+        seen.add((user_id, related_object_id))
+    Notification.objects.filter(pk__in=duplicates).update(is_read=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0002_notification_notificatio_user_id_05b4bc_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_duplicate_alerts_read, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="notification",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(
+                    ("is_read", False), ("notification_type", "low_stock")
+                ),
+                fields=("user", "related_object_id"),
+                name="unique_unread_low_stock",
+            ),
+        ),
+    ]
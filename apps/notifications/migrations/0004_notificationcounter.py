@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-18 11:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_unread(apps, schema_editor):
+    Notification = apps.get_model("notifications", "Notification")
+    NotificationCounter = apps.get_model("notifications", "NotificationCounter")
+    rows = (
+        Notification.objects.filter(is_read=False)
+        .order_by()
+        .values("user_id")
+        .annotate(unread=Count("id"))
+        .values_list("user_id", "unread")
+    )
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id, unread=unread) for user_id, unread in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0003_unique_unread_low_stock"),
+        ("users", "0004_activitylog"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationCounter",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="notification_counter",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("unread", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 11:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0004_notificationcounter"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["notification_type", "priority", "created_at"],
+                name="notificatio_notific_af44e1_idx",
+            ),
+        ),
+    ]
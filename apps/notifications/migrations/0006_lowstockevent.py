@@ -0,0 +1,55 @@
+# Generated by Django 5.2 on 2026-10-18 11:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("medicines", "0003_medicine_medicine_name_upper_idx"),
+        ("notifications", "0005_notification_notificatio_notific_af44e1_idx"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notification",
+            name="notification_type",
+            field=models.CharField(
+                choices=[
+                    ("low_stock", "Low Stock"),
+                    ("low_stock_digest", "Low Stock Digest"),
+                    ("sale", "New Sale"),
+                    ("system", "System"),
+                ],
+                default="system",
+                max_length=20,
+            ),
+        ),
+        migrations.CreateModel(
+            name="LowStockEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("stock", models.IntegerField()),
+                ("reorder_level", models.PositiveIntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "medicine",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="low_stock_event",
+                        to="medicines.medicine",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -1,12 +1,17 @@
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
+from django.conf import settings
 from django.contrib.auth import get_user_model
 
+from . import counters
+from .push import publish_created
+
 User = get_user_model()
 
 
 class Notification(models.Model):
     NOTIFICATION_TYPES = [
         ('low_stock', 'Low Stock'),
+        ('low_stock_digest', 'Low Stock Digest'),
         ('sale', 'New Sale'),
         ('system', 'System'),
     ]
@@ -32,42 +37,186 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['user', 'is_read']),
             models.Index(fields=['-created_at']),
+            models.Index(fields=['user', '-created_at']),
+            # Retention purges (retention.py) scan by type, priority and age
+            models.Index(fields=['notification_type', 'priority', 'created_at']),
+        ]
+        constraints = [
+            # At most one unread low stock alert per admin and medicine, even
+            # when concurrent sales cross the reorder level together
+            models.UniqueConstraint(
+                fields=['user', 'related_object_id'],
+                condition=models.Q(notification_type='low_stock', is_read=False),
+                name='unique_unread_low_stock',
+            ),
         ]
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
 
+    def save(self, *args, **kwargs):
+        # New unread notifications count towards their user's unread counter
+        if self._state.adding and not self.is_read:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                counters.adjust({self.user_id: 1})
+        else:
+            super().save(*args, **kwargs)
+
+    @staticmethod
+    def low_stock_priority(new_stock, reorder_level):
+        """Priority of a low stock alert, by how low the stock is"""
+        if new_stock == 0:
+            return 'critical'
+        if new_stock <= reorder_level / 2:
+            return 'high'
+        return 'medium'
+
     @classmethod
     def create_low_stock_notification(cls, inventory_item, new_stock):
         """Create a low stock notification for admin users"""
-        admins = User.objects.filter(role='admin')
-        medicine_name = inventory_item.medicine.name
-        reorder_level = inventory_item.reorder_level
-
-        for admin_user in admins:
-            # Check if there's already an unread notification for this medicine
-            existing = cls.objects.filter(
-                user=admin_user,
-                notification_type='low_stock',
-                related_object_id=inventory_item.medicine.id,
-                is_read=False
-            ).first()
-
-            if not existing:
-                # Calculate priority based on how low the stock is
-                if new_stock == 0:
-                    priority = 'critical'
-                elif new_stock <= reorder_level / 2:
-                    priority = 'high'
-                else:
-                    priority = 'medium'
-
-                cls.objects.create(
-                    user=admin_user,
+        return cls.create_low_stock_notifications([(inventory_item, new_stock)])
+
+    @classmethod
+    def create_low_stock_notifications(cls, low_stock):
+        """
+        Alert every admin about each (inventory item, new stock) pair, unless
+        they already have an unread alert for that medicine. In digest mode
+        (settings.LOW_STOCK_ALERT_MODE) the pairs are only buffered.
+
+        A constant number of queries whatever the number of admins and
+        medicines: the admins, their unread alerts for these medicines and
+        one bulk insert. The insert skips rows that hit
+        unique_unread_low_stock, so a concurrent sale that alerted first
+        wins, and only the rows it actually wrote are counted and pushed.
+        """
+        low_stock = {inventory_item.medicine_id: (inventory_item, new_stock)
+                     for inventory_item, new_stock in low_stock}
+        if not low_stock:
+            return []
+        if getattr(settings, 'LOW_STOCK_ALERT_MODE', 'immediate') == 'digest':
+            # Buffered; send_low_stock_digests sends one summary per admin
+            from .digests import buffer_low_stock
+            buffer_low_stock(low_stock.values())
+            return []
+        admin_ids = list(User.objects.filter(role='admin').values_list('pk', flat=True))
+        if not admin_ids:
+            return []
+        unread = cls.objects.filter(
+            user_id__in=admin_ids,
+            notification_type='low_stock',
+            related_object_id__in=list(low_stock),
+            is_read=False,
+        )
+        existing = set(unread.values_list('user_id', 'related_object_id'))
+
+        notifications = []
+        for medicine_id, (inventory_item, new_stock) in low_stock.items():
+            medicine_name = inventory_item.medicine.name
+            reorder_level = inventory_item.reorder_level
+            for admin_id in admin_ids:
+                if (admin_id, medicine_id) in existing:
+                    continue
+                notifications.append(cls(
+                    user_id=admin_id,
                     notification_type='low_stock',
                     title=f'⚠️ Low Stock Alert: {medicine_name}',
                     message=f'The stock for {medicine_name} has fallen to {new_stock} units (reorder level: {reorder_level}). Please reorder soon.',
-                    priority=priority,
-                    related_object_id=inventory_item.medicine.id
+                    priority=cls.low_stock_priority(new_stock, reorder_level),
+                    related_object_id=medicine_id,
+                ))
+        if not notifications:
+            return []
+        created = cls.insert_unread_low_stock(notifications)
+        if created:
+            added = {}
+            for notification in created:
+                added[notification.user_id] = added.get(notification.user_id, 0) + 1
+            counters.adjust(added)
+        publish_created(created)
+        return created
+
+
+    @classmethod
+    def insert_unread_low_stock(cls, notifications, batch_size=500):
+        """
+        Insert unread low stock alerts, skipping those that hit
+        unique_unread_low_stock.
+
+        Returns:
+            The alerts this call inserted, with their ids; alerts committed
+            meanwhile by a concurrent sale are left out
+        """
+        returning = (connection.vendor in ('postgresql', 'sqlite')
+                     and connection.features.can_return_rows_from_bulk_insert)
+        if not returning:
+            # No INSERT ... ON CONFLICT DO NOTHING RETURNING: one savepoint per alert
+            created = []
+            for notification in notifications:
+                try:
+                    with transaction.atomic():
+                        super(Notification, notification).save()
+                except IntegrityError:
+                    continue
+                created.append(notification)
+            return created
+
+        fields = [field for field in cls._meta.concrete_fields if not field.primary_key]
+        quote = connection.ops.quote_name
+        returned = ', '.join(quote(cls._meta.get_field(name).column)
+                             for name in ('id', 'user', 'related_object_id'))
+        by_key = {
+            (notification.user_id, notification.related_object_id): notification
+            for notification in notifications
+        }
+        created = []
+        with connection.cursor() as cursor:
+            for start in range(0, len(notifications), batch_size):
+                batch = notifications[start:start + batch_size]
+                params = [
+                    field.get_db_prep_save(field.pre_save(notification, True), connection)
+                    for notification in batch for field in fields
+                ]
+                row = '(%s)' % ', '.join(['%s'] * len(fields))
+                cursor.execute(
+                    f"INSERT INTO {quote(cls._meta.db_table)} "
+                    f"({', '.join(quote(field.column) for field in fields)}) "
+                    f"VALUES {', '.join([row] * len(batch))} "
+                    f"ON CONFLICT DO NOTHING RETURNING {returned}",
+                    params,
                 )
+                for pk, user_id, related_object_id in cursor.fetchall():
+                    notification = by_key[(user_id, related_object_id)]
+                    notification.pk = pk
+                    notification._state.adding = False
+                    created.append(notification)
+        return sorted(created, key=lambda notification: notification.pk)
+
+
+class NotificationCounter(models.Model):
+    """
+    Unread notifications of a user, kept up to date as notifications are
+    created and read (see counters.py) so the badge is a primary key lookup.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='notification_counter')
+    unread = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
 
+class LowStockEvent(models.Model):
+    """
+    A medicine that fell to or below its reorder level since the last low
+    stock digest (one row per medicine, holding the latest stock seen).
+    """
+    medicine = models.OneToOneField('medicines.Medicine', on_delete=models.CASCADE,
+                                    related_name='low_stock_event')
+    stock = models.IntegerField()
+    reorder_level = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.medicine_id}: {self.stock}/{self.reorder_level}"
@@ -0,0 +1,64 @@
+"""
+Real-time delivery of notifications over WebSocket.
+
+Every connected tab of a user joins the user's group (see
+consumers.NotificationConsumer). When notifications are created or read,
+the events below are sent to the groups once the transaction commits, so
+clients never hear about rows that were rolled back:
+
+- ``notification``: a new notification, with the user's unread count
+- ``unread_count``: the unread count changed (read, cleared)
+
+Events are best effort (a failed delivery is logged, never raised into the
+request that committed): a client that was disconnected catches up by
+reconnecting with the id of the last notification it saw.
+
+The channel layer is configured in settings.CHANNEL_LAYERS. The in-memory
+layer only reaches sockets served by the same process; use a shared layer
+(e.g. channels_redis) when running several server processes.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .counters import unread_count, unread_counts
+
+CATCH_UP_LIMIT = 100
+
+
+def user_group(user_id):
+    return f'notifications.user.{user_id}'
+
+
+def send(user_id, event):
+    channel_layer = get_channel_layer()
+    if channel_layer is not None:
+        async_to_sync(channel_layer.group_send)(user_group(user_id), event)
+
+
+def publish_created(notifications):
+    """Push new notifications to their users after the transaction commits"""
+    from .serializers import NotificationSerializer
+
+    notifications = list(notifications)
+    if not notifications:
+        return
+
+    def deliver():
+        counts = unread_counts({notification.user_id for notification in notifications})
+        for notification in notifications:
+            send(notification.user_id, {
+                'type': 'notification.created',
+                'notification': NotificationSerializer(notification).data,
+                'unread_count': counts[notification.user_id],
+            })
+
+    transaction.on_commit(deliver, robust=True)
+
+
+def publish_unread_count(user_id):
+    """Push a user's unread count after the transaction commits"""
+    transaction.on_commit(lambda: send(user_id, {
+        'type': 'unread.count',
+        'unread_count': unread_count(user_id),
+    }), robust=True)
@@ -0,0 +1,168 @@
+"""
+Notification retention.
+
+settings.NOTIFICATION_RETENTION maps (notification_type, priority) to the
+number of days a notification is kept; None in either position matches any
+value, and the most specific rule wins. Types without a rule, or with a rule
+of None days, are kept forever.
+
+purge() removes expired notifications in batches of ``batch_size`` rows, one
+short transaction per batch, so the table is never locked for long. Each
+batch is appended to a gzip-compressed JSON lines file before it is deleted
+(unless archiving is turned off), and unread counters are moved down in the
+same transaction as the delete. search_archive() reads archived rows back.
+"""
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters
+from .models import Notification
+
+DEFAULT_RETENTION = {
+    (None, None): None,
+}
+
+DEFAULT_BATCH_SIZE = 1000
+
+ARCHIVE_FIELDS = (
+    'id', 'user_id', 'notification_type', 'title', 'message', 'priority', 'is_read',
+    'related_object_id', 'created_at',
+)
+
+
+def retention_policy():
+    return getattr(settings, 'NOTIFICATION_RETENTION', DEFAULT_RETENTION)
+
+
+def retention_days(notification_type, priority, policy=None):
+    """Days a notification of this type and priority is kept (None: forever)"""
+    policy = retention_policy() if policy is None else policy
+    for key in ((notification_type, priority), (notification_type, None), (None, priority), (None, None)):
+        if key in policy:
+            return policy[key]
+    return None
+
+
+def cutoffs(now=None, policy=None):
+    """Creation time before which each (type, priority) pair expires"""
+    now = now or timezone.now()
+    result = {}
+    for notification_type, _ in Notification.NOTIFICATION_TYPES:
+        for priority, _ in Notification.PRIORITY_CHOICES:
+            days = retention_days(notification_type, priority, policy)
+            if days is not None:
+                result[(notification_type, priority)] = now - timedelta(days=days)
+    return result
+
+
+def expired(now=None, policy=None):
+    """
+    Per (type, priority), the queryset of expired notifications, oldest
+    first: the (type, priority, created_at) index serves that order, so each
+    purge batch reads its rows off the index instead of sorting the whole
+    expired set.
+    """
+    return {
+        key: Notification.objects.filter(
+            notification_type=key[0], priority=key[1], created_at__lt=cutoff
+        ).order_by('created_at', 'id')
+        for key, cutoff in cutoffs(now, policy).items()
+    }
+
+
+def archive_path(archive_dir, now=None):
+    now = now or timezone.now()
+    return os.path.join(archive_dir, f"notifications-{now.strftime('%Y%m%dT%H%M%S')}.jsonl.gz")
+
+
+def write_archive(path, rows):
+    """Append rows to a gzip JSON lines file and flush it to disk"""
+    with open(path, 'ab') as raw, gzip.GzipFile(fileobj=raw, mode='ab') as archive:
+        for row in rows:
+            row = dict(row, created_at=row['created_at'].isoformat())
+            archive.write(json.dumps(row, ensure_ascii=False).encode() + b'\n')
+        archive.flush()
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def purge(batch_size=DEFAULT_BATCH_SIZE, archive_dir=None, dry_run=False, now=None, policy=None):
+    """
+    Delete (and archive to ``archive_dir``, if given) expired notifications.
+
+    Returns:
+        Dict of (type, priority) -> number of notifications removed (or that
+        would be, with ``dry_run``)
+    """
+    now = now or timezone.now()
+    removed = {}
+    path = None
+    if archive_dir and not dry_run:
+        os.makedirs(archive_dir, exist_ok=True)
+        path = archive_path(archive_dir, now)
+
+    for key, queryset in expired(now, policy).items():
+        if dry_run:
+            count = queryset.count()
+            if count:
+                removed[key] = count
+            continue
+        while True:
+            with transaction.atomic():
+                rows = list(queryset.values(*ARCHIVE_FIELDS)[:batch_size])
+                if not rows:
+                    break
+                if path:
+                    # Written before the delete commits: a crash can only
+                    # archive a batch twice, never lose it
+                    write_archive(path, rows)
+                unread = {}
+                for row in rows:
+                    if not row['is_read']:
+                        unread[row['user_id']] = unread.get(row['user_id'], 0) - 1
+                Notification.objects.filter(id__in=[row['id'] for row in rows]).delete()
+                counters.adjust(unread)
+            removed[key] = removed.get(key, 0) + len(rows)
+    return removed
+
+
+def archive_files(archive_dir):
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(
+        os.path.join(archive_dir, name) for name in os.listdir(archive_dir)
+        if name.startswith('notifications-') and name.endswith('.jsonl.gz')
+    )
+
+
+def search_archive(archive_dir, user_id=None, notification_type=None, related_object_id=None,
+                   since=None, until=None):
+    """
+    Yield archived notifications matching the filters, oldest archive first.
+    A row archived twice (interrupted purge) is yielded once.
+    """
+    seen = set()
+    for path in archive_files(archive_dir):
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            for line in archive:
+                row = json.loads(line)
+                if row['id'] in seen:
+                    continue
+                if user_id is not None and row['user_id'] != user_id:
+                    continue
+                if notification_type and row['notification_type'] != notification_type:
+                    continue
+                if related_object_id is not None and row['related_object_id'] != related_object_id:
+                    continue
+                created_at = parse_datetime(row['created_at'])
+                if (since and created_at < since) or (until and created_at >= until):
+                    continue
+                seen.add(row['id'])
+                yield row
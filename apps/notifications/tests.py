@@ -0,0 +1,239 @@
+from datetime import date, timedelta
+import shutil
+import tempfile
+from io import StringIO
+from decimal import Decimal
+
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.inventory.models import InventoryItem
+from apps.medicines.models import Medicine
+from apps.users.models import CustomUser
+from pharmacy_system.asgi import application
+from . import retention
+from .digests import send_low_stock_digests
+from .models import LowStockEvent, Notification, NotificationCounter
+
+
+class NotificationPushTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_user(username='admin', password='secret-pass', role='admin')
+        self.old = Notification.objects.create(user=self.admin, title='Old', message='')
+        self.medicine = Medicine.objects.create(
+            name='Aspirin', category='Analgesic', price=Decimal('2.50'), quantity=3,
+            expiration_date=date.today() + timedelta(days=365),
+        )
+        self.inventory = InventoryItem.objects.create(medicine=self.medicine, current_stock=3, reorder_level=10)
+
+    def connect(self, query):
+        return WebsocketCommunicator(application, f'/ws/notifications/?{query}')
+
+    async def test_catch_up_then_live_alerts(self):
+        newer = await database_sync_to_async(Notification.objects.create)(
+            user=self.admin, title='Newer', message=''
+        )
+        communicator = self.connect(f'token={AccessToken.for_user(self.admin)}&since={self.old.pk}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        catch_up = await communicator.receive_json_from()
+        self.assertEqual([row['id'] for row in catch_up['notifications']], [newer.pk])
+        self.assertEqual(catch_up['unread_count'], 2)
+
+        await database_sync_to_async(Notification.create_low_stock_notification)(self.inventory, 3)
+        event = await communicator.receive_json_from()
+        self.assertEqual(event['type'], 'notification')
+        self.assertEqual(event['notification']['related_object_id'], self.medicine.pk)
+        self.assertEqual(event['unread_count'], 3)
+
+        await communicator.send_json_to({'type': 'catch_up', 'since': newer.pk})
+        catch_up = await communicator.receive_json_from()
+        self.assertEqual(len(catch_up['notifications']), 1)
+        await communicator.disconnect()
+
+    async def test_rejects_missing_or_invalid_token(self):
+        for query in ('', 'token=not-a-token'):
+            communicator = self.connect(query)
+            connected, code = await communicator.connect()
+            self.assertFalse(connected)
+            self.assertEqual(code, 4401)
+
+
+class UnreadCounterTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_user(username='admin', password='secret-pass', role='admin')
+        self.client.force_authenticate(self.admin)
+        self.notifications = [
+            Notification.objects.create(user=self.admin, title=f'Notice {index}', message='')
+            for index in range(3)
+        ]
+
+    def unread(self):
+        return self.client.get('/api/notifications/unread/').data['unread_count']
+
+    def test_counter_follows_create_and_read(self):
+        self.assertEqual(self.unread(), 3)
+
+        self.client.post(f'/api/notifications/{self.notifications[0].pk}/mark_read/')
+        self.client.post(f'/api/notifications/{self.notifications[0].pk}/mark_read/')
+        self.assertEqual(self.unread(), 2)
+
+        self.client.post('/api/notifications/mark_all_read/')
+        self.client.delete('/api/notifications/clear_read/')
+        Notification.objects.create(user=self.admin, title='New', message='')
+        self.assertEqual(self.unread(), 1)
+
+    def test_unread_is_a_primary_key_lookup(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.unread(), 3)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.unread(), 3)
+
+    @override_settings(NOTIFICATION_COUNT_CACHE='default')
+    def test_unread_is_cached_in_a_shared_cache(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.unread(), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread(), 3)
+
+        self.client.post(f'/api/notifications/{self.notifications[0].pk}/mark_read/')
+        self.assertEqual(self.unread(), 2)
+
+    def test_only_inserted_alerts_are_returned(self):
+        other = CustomUser.objects.create_user(username='other', password='secret-pass', role='admin')
+
+        def alert(user):
+            return Notification(user=user, notification_type='low_stock', title='Low', message='',
+                                related_object_id=7)
+
+        # A concurrent sale committed the first admin's alert in between
+        Notification.insert_unread_low_stock([alert(self.admin)])
+        created = Notification.insert_unread_low_stock([alert(self.admin), alert(other)])
+
+        self.assertEqual([notification.user for notification in created], [other])
+        self.assertEqual(created[0], Notification.objects.get(user=other))
+        self.assertEqual(Notification.objects.filter(notification_type='low_stock').count(), 2)
+
+    def test_recount_repairs_drift(self):
+        NotificationCounter.objects.filter(pk=self.admin.pk).update(unread=42)
+
+        call_command('recount_notifications', stdout=StringIO())
+
+        self.assertEqual(NotificationCounter.objects.get(pk=self.admin.pk).unread, 3)
+        self.assertEqual(self.unread(), 3)
+
+
+@override_settings(NOTIFICATION_RETENTION={
+    ('low_stock', None): 30,
+    ('low_stock', 'critical'): 90,
+    (None, None): None,
+})
+class RetentionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_user(username='admin', password='secret-pass', role='admin')
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        now = timezone.now()
+        for index, (notification_type, priority, age, is_read) in enumerate([
+            ('low_stock', 'medium', 40, False),
+            ('low_stock', 'high', 35, True),
+            ('low_stock', 'critical', 40, False),
+            ('low_stock', 'medium', 5, False),
+            ('system', 'low', 400, True),
+        ]):
+            notification = Notification.objects.create(
+                user=self.admin, notification_type=notification_type, priority=priority,
+                title=f'Notice {index}', message='', is_read=is_read, related_object_id=index,
+            )
+            Notification.objects.filter(pk=notification.pk).update(created_at=now - timedelta(days=age))
+
+    def test_most_specific_rule_wins(self):
+        self.assertEqual(retention.retention_days('low_stock', 'critical'), 90)
+        self.assertEqual(retention.retention_days('low_stock', 'low'), 30)
+        self.assertIsNone(retention.retention_days('system', 'low'))
+
+    def test_purge_archives_in_batches_and_moves_counters(self):
+        removed = retention.purge(batch_size=1, archive_dir=self.archive_dir)
+
+        self.assertEqual(removed, {('low_stock', 'medium'): 1, ('low_stock', 'high'): 1})
+        self.assertEqual(sorted(Notification.objects.values_list('title', flat=True)),
+                         ['Notice 2', 'Notice 3', 'Notice 4'])
+        self.assertEqual(NotificationCounter.objects.get(pk=self.admin.pk).unread, 2)
+
+        archived = list(retention.search_archive(self.archive_dir, user_id=self.admin.pk))
+        self.assertEqual([row['title'] for row in archived], ['Notice 0', 'Notice 1'])
+        self.assertEqual(
+            [row['title'] for row in retention.search_archive(self.archive_dir, related_object_id=1)],
+            ['Notice 1'],
+        )
+
+    def test_dry_run_removes_nothing(self):
+        out = StringIO()
+        call_command('purge_notifications', '--dry-run', '--archive-dir', self.archive_dir, stdout=out)
+
+        self.assertIn('Would remove 2 notifications', out.getvalue())
+        self.assertEqual(Notification.objects.count(), 5)
+        self.assertEqual(retention.archive_files(self.archive_dir), [])
+
+
+@override_settings(LOW_STOCK_ALERT_MODE='digest')
+class LowStockDigestTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admins = [
+            CustomUser.objects.create_user(username=f'admin{index}', password='secret-pass', role='admin')
+            for index in range(2)
+        ]
+        self.client.force_authenticate(self.admins[0])
+        self.inventory = {}
+        for name, stock in (('Aspirin', 8), ('Insulin', 0), ('Ibuprofen', 4), ('Paracetamol', 50)):
+            medicine = Medicine.objects.create(
+                name=name, category='General', price=Decimal('2.50'), quantity=stock,
+                expiration_date=date.today() + timedelta(days=365),
+            )
+            self.inventory[name] = InventoryItem.objects.create(
+                medicine=medicine, current_stock=stock, reorder_level=10
+            )
+
+    def test_checkout_buffers_instead_of_alerting(self):
+        with self.assertNumQueries(1):
+            Notification.create_low_stock_notifications(
+                [(self.inventory[name], self.inventory[name].current_stock)
+                 for name in ('Aspirin', 'Insulin', 'Ibuprofen')]
+            )
+
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(LowStockEvent.objects.count(), 3)
+
+    def test_one_digest_per_admin_ordered_by_severity(self):
+        Notification.create_low_stock_notifications(
+            [(item, item.current_stock) for item in self.inventory.values()]
+        )
+        # Restocked before the digest went out
+        InventoryItem.objects.filter(pk=self.inventory['Aspirin'].pk).update(current_stock=30)
+
+        notifications = send_low_stock_digests()
+
+        self.assertEqual(len(notifications), 2)
+        digest = Notification.objects.get(user=self.admins[0])
+        self.assertEqual(digest.notification_type, 'low_stock_digest')
+        self.assertEqual(digest.priority, 'critical')
+        self.assertEqual(digest.title, '⚠️ Low stock: 2 medicines')
+        self.assertLess(digest.message.index('Insulin'), digest.message.index('Ibuprofen'))
+        self.assertFalse(LowStockEvent.objects.exists())
+        self.assertEqual(NotificationCounter.objects.get(pk=self.admins[1].pk).unread, 1)
+        self.assertEqual(send_low_stock_digests(), [])
+
+        response = self.client.get('/api/notifications/low_stock/')
+        self.assertEqual([alert['medicine_name'] for alert in response.data['alerts']],
+                         ['Insulin', 'Ibuprofen'])
@@ -1,14 +1,24 @@
+from django.db import transaction
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import Notification
+from . import counters
+from .digests import low_stock_alerts
+from .push import publish_unread_count
 from .serializers import NotificationSerializer
+from pharmacy_system.pagination import KeysetPagination
+
+
+class NotificationPagination(KeysetPagination):
+    ordering = ('-created_at', 'id')
 
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
@@ -16,11 +26,15 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def unread(self, request):
         """Get count of unread notifications"""
-        count = Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).count()
-        return Response({'unread_count': count})
+        return Response({'unread_count': counters.unread_count(request.user.pk)})
+
+    @action(detail=False, methods=['get'])
+    def low_stock(self, request):
+        """Individual low stock alerts (one per medicine), most severe first"""
+        if not request.user.is_admin:
+            return Response({'error': 'Admins only.'}, status=status.HTTP_403_FORBIDDEN)
+        alerts = low_stock_alerts()
+        return Response({'count': len(alerts), 'alerts': alerts})
 
     @action(detail=False, methods=['get'])
     def recent(self, request):
@@ -35,22 +49,29 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     def mark_read(self, request, pk=None):
         """Mark a notification as read"""
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        with transaction.atomic():
+            # Conditional update: marking twice only counts once
+            if Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True):
+                counters.adjust({request.user.pk: -1})
+                publish_unread_count(request.user.pk)
         return Response({'status': 'marked as read'})
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Mark all notifications as read"""
-        Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).update(is_read=True)
+        with transaction.atomic():
+            marked = Notification.objects.filter(
+                user=request.user,
+                is_read=False
+            ).update(is_read=True)
+            if marked:
+                counters.adjust({request.user.pk: -marked})
+                publish_unread_count(request.user.pk)
         return Response({'status': 'all marked as read'})
 
     @action(detail=False, methods=['delete'])
     def clear_read(self, request):
-        """Delete all read notifications"""
+        """Delete all read notifications (unread counter unchanged)"""
         Notification.objects.filter(
             user=request.user,
             is_read=True
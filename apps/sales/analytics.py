@@ -0,0 +1,138 @@
+"""
+Top sellers and sales velocity.
+
+Both are answered from DailyMedicineSales, the per-day GROUP BY of SaleItem
+by medicine that checkout keeps up to date, so a query costs O(days x
+medicines sold) instead of O(line items).
+
+Totals of closed days (before today) are cached. The cache keys carry a
+version counter, kept in the database (AnalyticsVersion) so that every
+worker shares it, that rollups bump in the same transaction whenever a past
+day changes (a sale edited or deleted, a rebuild); cached periods therefore
+never go stale, whatever the cache backend. Today, the only day still
+moving, is always read live and merged in.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from apps.medicines.models import Medicine
+from .models import AnalyticsVersion, DailyMedicineSales
+
+DEFAULT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def data_version():
+    return AnalyticsVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def invalidate_closed_periods():
+    """
+    Drop every cached period. Call in the transaction that changes a past
+    day's rollups, so the new version commits with them.
+    """
+    if not AnalyticsVersion.objects.filter(pk=1).update(version=F('version') + 1):
+        AnalyticsVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+
+
+def medicine_totals(start, end, category=None, supplier=None):
+    """[units, revenue] per medicine id over ``start``..``end`` (one GROUP BY)"""
+    rows = DailyMedicineSales.objects.filter(date__range=(start, end))
+    if category:
+        rows = rows.filter(medicine__category__iexact=category)
+    if supplier:
+        rows = rows.filter(medicine__supplier_id=supplier)
+    return {
+        row['medicine']: [row['units'], row['amount']]
+        for row in rows.order_by().values('medicine')
+        .annotate(units=Sum('quantity'), amount=Sum('revenue'))
+        if row['units']
+    }
+
+
+def sales_by_medicine(start, end, category=None, supplier=None):
+    """
+    [units, revenue] per medicine id over ``start``..``end`` (inclusive
+    dates), closed days from the cache and today live.
+    """
+    today = timezone.localdate()
+    totals = {}
+    closed_end = min(end, today - timedelta(days=1))
+    if start <= closed_end:
+        filters = hashlib.md5(f"{category}|{supplier}".encode()).hexdigest()
+        key = f"sales_analytics:{data_version()}:{start}:{closed_end}:{filters}"
+        closed = cache.get(key)
+        if closed is None:
+            closed = medicine_totals(start, closed_end, category, supplier)
+            cache.set(key, closed, getattr(settings, 'SALES_ANALYTICS_CACHE_TIMEOUT',
+                                           DEFAULT_CACHE_TIMEOUT))
+        totals = {medicine_id: list(amounts) for medicine_id, amounts in closed.items()}
+    if start <= today <= end:
+        for medicine_id, (units, revenue) in medicine_totals(today, today, category, supplier).items():
+            amounts = totals.setdefault(medicine_id, [0, 0])
+            amounts[0] += units
+            amounts[1] += revenue
+    return totals
+
+
+def describe(medicine_ids):
+    """Name, category, supplier and stock of medicines, in one query"""
+    return {
+        row['id']: row for row in
+        Medicine.objects.filter(pk__in=list(medicine_ids))
+        .values('id', 'name', 'category', 'supplier', 'supplier__name', 'quantity')
+    }
+
+
+def top_sellers(start, end, by='units', limit=50, category=None, supplier=None):
+    """Best selling medicines over a period, by units or revenue"""
+    totals = sales_by_medicine(start, end, category, supplier)
+    rank = 0 if by == 'units' else 1
+    ranked = sorted(totals.items(), key=lambda entry: (-entry[1][rank], entry[0]))[:limit]
+    medicines = describe(medicine_id for medicine_id, _ in ranked)
+    return [
+        {
+            "medicine": medicine_id,
+            "medicine_name": medicines[medicine_id]['name'],
+            "category": medicines[medicine_id]['category'],
+            "supplier_name": medicines[medicine_id]['supplier__name'],
+            "units": units,
+            "revenue": revenue,
+        }
+        for medicine_id, (units, revenue) in ranked if medicine_id in medicines
+    ]
+
+
+def velocity(start, end, limit=None, category=None, supplier=None, medicine_ids=None):
+    """
+    Units sold per day per medicine over a period, with the current stock
+    and how many days it lasts at that pace.
+    """
+    days = (end - start).days + 1
+    totals = sales_by_medicine(start, end, category, supplier)
+    if medicine_ids is not None:
+        totals = {medicine_id: totals[medicine_id] for medicine_id in medicine_ids if medicine_id in totals}
+    ranked = sorted(totals.items(), key=lambda entry: (-entry[1][0], entry[0]))
+    if limit:
+        ranked = ranked[:limit]
+    medicines = describe(medicine_id for medicine_id, _ in ranked)
+    results = []
+    for medicine_id, (units, revenue) in ranked:
+        if medicine_id not in medicines:
+            continue
+        units_per_day = units / days
+        stock = medicines[medicine_id]['quantity']
+        results.append({
+            "medicine": medicine_id,
+            "medicine_name": medicines[medicine_id]['name'],
+            "units": units,
+            "revenue": revenue,
+            "units_per_day": round(units_per_day, 3),
+            "current_stock": stock,
+            "days_of_cover": round(stock / units_per_day, 1) if units_per_day else None,
+        })
+    return results
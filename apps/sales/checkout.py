@@ -0,0 +1,258 @@
+"""
+Checkout engine for the point of sale.
+
+A basket is processed in a single transaction: every medicine of the basket
+(and its inventory row) is loaded and locked with one query, stock is checked
+for the whole basket before anything is written, line items are inserted with
+one bulk insert and stock is decremented through the stock movement ledger
+(one set-based UPDATE per balance table).
+
+The sale is added to the daily rollups in the same transaction.
+
+Batches of sales (offline terminals syncing their queue) go through the same
+steps once per chunk: the medicines of the chunk are locked together, each
+sale is checked against the stock left by the sales before it, and the
+accepted sales, their items, rollups and ledger movements are written with
+one set of bulk statements. A sale that cannot be served is rejected on its
+own without failing the rest of the chunk.
+
+The row lock only serialises baskets on backends that support it; oversell
+protection itself comes from the ledger's conditional decrements, which
+raise InsufficientStock instead of letting a balance go below zero.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import prefetch_related_objects
+from rest_framework import serializers
+
+from apps.medicines.models import Medicine
+from apps.inventory.ledger import InsufficientStock, expired_lot_stock, record_movements, shortage
+from apps.inventory.models import InventoryItem, StockMovement
+from apps.notifications.models import Notification
+from .models import Sale, SaleItem
+from . import rollups
+
+
+def get_inventory(medicine):
+    """Return the (select_related) inventory row of a medicine, or None"""
+    try:
+        return medicine.inventoryitem
+    except InventoryItem.DoesNotExist:
+        return None
+
+
+def available_stock(medicine):
+    """
+    Units that can be sold: the lower of the two maintained balances, less
+    the units in expired lots (``expired_stock``, see lock_medicines)
+    """
+    inventory = get_inventory(medicine)
+    in_stock = medicine.quantity if inventory is None else min(medicine.quantity, inventory.current_stock)
+    return max(in_stock - getattr(medicine, 'expired_stock', 0), 0)
+
+
+def basket_quantities(items_data):
+    """Sum the requested quantity per medicine id, keeping basket order"""
+    quantities = {}
+    for item_data in items_data:
+        medicine_id = item_data['medicine_id']
+        quantities[medicine_id] = quantities.get(medicine_id, 0) + item_data['quantity']
+    return quantities
+
+
+def lock_medicines(medicine_ids):
+    """Load and lock the medicines of a basket with their inventory rows and expired units"""
+    return (
+        Medicine.objects
+        .select_for_update(of=('self',))
+        .select_related('inventoryitem')
+        .annotate(expired_stock=expired_lot_stock())
+        .in_bulk(list(medicine_ids))
+    )
+
+
+def check_stock(medicines, quantities, available=None):
+    """
+    Check a whole basket against the locked stock before writing anything.
+
+    Args:
+        medicines: Locked medicines by id
+        quantities: Requested quantity per medicine id
+        available: Optional running stock per medicine id, for baskets that
+            follow others in the same batch
+
+    Raises:
+        ValidationError: for medicines that do not exist
+        InsufficientStock: listing every line the basket cannot serve
+    """
+    missing = [medicine_id for medicine_id in quantities if medicine_id not in medicines]
+    if missing:
+        raise serializers.ValidationError({
+            'items_data': [f"Medicine {medicine_id} does not exist." for medicine_id in missing]
+        })
+
+    shortages = []
+    for medicine_id, quantity in quantities.items():
+        medicine = medicines[medicine_id]
+        in_stock = available_stock(medicine) if available is None else available[medicine_id]
+        if quantity > in_stock:
+            shortages.append(shortage(medicine_id, medicine.name, quantity, in_stock))
+    if shortages:
+        raise InsufficientStock(shortages)
+
+
+def place_sales(baskets, medicines):
+    """
+    Write baskets whose stock has been checked: sales, line items, rollups,
+    ledger movements and low stock alerts, with one set of statements for
+    the whole list.
+
+    Args:
+        baskets: List of (validated_data, items_data) pairs
+        medicines: Locked medicines by id, covering every basket
+
+    Returns:
+        The created sales, in basket order
+    """
+    sales, backdated = [], []
+    for validated_data, items_data in baskets:
+        fields = dict(validated_data)
+        sold_at = fields.pop('date', None)
+        sales.append(Sale(**fields))
+        if sold_at is not None:
+            backdated.append((sales[-1], sold_at))
+    if connection.features.can_return_rows_from_bulk_insert:
+        Sale.objects.bulk_create(sales)
+    else:
+        for sale in sales:
+            sale.save()
+    # date is auto_now_add: sales made offline get their own time afterwards
+    for sale, sold_at in backdated:
+        sale.date = sold_at
+    if backdated:
+        Sale.objects.bulk_update([sale for sale, sold_at in backdated], ['date'])
+
+    items_by_sale = [
+        [
+            SaleItem(
+                sale=sale,
+                medicine=medicines[item_data['medicine_id']],
+                quantity=item_data['quantity'],
+                price=item_data['price'],
+            )
+            for item_data in items_data
+        ]
+        for sale, (validated_data, items_data) in zip(sales, baskets)
+    ]
+    SaleItem.objects.bulk_create([item for items in items_by_sale for item in items])
+    rollups.add_sales(list(zip(sales, items_by_sale)))
+
+    movements = []
+    sold = {}
+    for sale, (validated_data, items_data) in zip(sales, baskets):
+        for medicine_id, quantity in basket_quantities(items_data).items():
+            sold[medicine_id] = sold.get(medicine_id, 0) + quantity
+            movements.append(StockMovement(
+                medicine_id=medicine_id,
+                movement_type='sale',
+                quantity=-quantity,
+                reference=f'sale:{sale.id}',
+            ))
+    record_movements(movements)
+
+    low_stock = []
+    for medicine_id, quantity in sold.items():
+        inventory = get_inventory(medicines[medicine_id])
+        if inventory is None:
+            continue
+        inventory.current_stock -= quantity
+        if inventory.current_stock <= inventory.reorder_level:
+            low_stock.append((inventory, inventory.current_stock))
+    Notification.create_low_stock_notifications(low_stock)
+    return sales
+
+
+def checkout(validated_data, items_data):
+    """
+    Create a sale and its line items and decrement stock, atomically.
+
+    Args:
+        validated_data: Validated Sale fields (customer_name, total_amount...)
+        items_data: List of dicts with medicine_id, quantity and price
+
+    Returns:
+        The created Sale
+    """
+    quantities = basket_quantities(items_data)
+
+    with transaction.atomic():
+        medicines = lock_medicines(quantities)
+        check_stock(medicines, quantities)
+        sale, = place_sales([(validated_data, items_data)], medicines)
+        # Line items are read back by the response serializer; read here so
+        # that an error after the commit never hides a committed sale
+        prefetch_related_objects([sale], 'items__medicine')
+    return sale
+
+
+def checkout_chunk(baskets):
+    """
+    Check out a chunk of baskets in one transaction.
+
+    Returns:
+        List with, per basket, the created Sale or the exception that
+        rejected it (ValidationError or InsufficientStock)
+    """
+    quantities = [basket_quantities(items_data) for validated_data, items_data in baskets]
+    results = [None] * len(baskets)
+
+    with transaction.atomic():
+        medicine_ids = {medicine_id for basket in quantities for medicine_id in basket}
+        medicines = lock_medicines(medicine_ids)
+        available = {medicine_id: available_stock(medicine) for medicine_id, medicine in medicines.items()}
+
+        accepted = []
+        for index, basket in enumerate(quantities):
+            try:
+                check_stock(medicines, basket, available)
+            except (serializers.ValidationError, InsufficientStock) as exc:
+                results[index] = exc
+                continue
+            for medicine_id, quantity in basket.items():
+                available[medicine_id] -= quantity
+            accepted.append(index)
+
+        if accepted:
+            sales = place_sales([baskets[index] for index in accepted], medicines)
+            for index, sale in zip(accepted, sales):
+                results[index] = sale
+    return results
+
+
+def checkout_batch(baskets, chunk_size):
+    """
+    Check out a list of baskets, committing every ``chunk_size`` of them in
+    their own transaction.
+
+    A chunk whose ledger update is refused (stock taken concurrently by
+    another terminal) or one of whose client_ids was just stored by a
+    concurrent sync is retried one basket at a time.
+
+    Returns:
+        List with, per basket, the created Sale or the rejecting exception
+        (IntegrityError for a client_id that is already taken)
+    """
+    results = []
+    for start in range(0, len(baskets), chunk_size):
+        chunk = baskets[start:start + chunk_size]
+        try:
+            results.extend(checkout_chunk(chunk))
+        except (InsufficientStock, IntegrityError):
+            for basket in chunk:
+                try:
+                    results.append(checkout(*basket))
+                except (serializers.ValidationError, InsufficientStock, IntegrityError) as exc:
+                    results.append(exc)
+
+    sales = [result for result in results if isinstance(result, Sale)]
+    prefetch_related_objects(sales, 'items__medicine')
+    return results
@@ -0,0 +1,176 @@
+"""
+Bulk sales and invoice exports.
+
+iter_invoice_zip() renders the invoices of a set of sales and yields a ZIP
+archive piece by piece. Sales and their items are fetched in prefetched
+batches, each batch is rendered by a thread pool, and every rendered invoice
+is compressed and handed out before the next batch is loaded, so memory is
+bounded by the batch size however many invoices the range holds.
+
+iter_sales_csv() and write_sales_xlsx() export one row per line item, read
+from the database in chunks with .iterator().
+"""
+import csv
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import Sale, SaleItem
+from .rollups import day_start
+from .utils import COMPANY_INFO, generate_invoice_html
+
+EXPORT_BATCH_SIZE = 200
+
+EXPORT_WORKERS = 4
+
+EXPORT_CHUNK_SIZE = 2000
+
+SALES_EXPORT_HEADER = [
+    'Sale', 'Date', 'Customer', 'Payment method', 'Sale total', 'Discount', 'Final amount',
+    'Medicine', 'Quantity', 'Unit price', 'Line total',
+]
+
+
+class ZipStream:
+    """
+    Write-only sink for zipfile. It has no tell()/seek(), so ZipFile writes
+    data descriptors instead of seeking back, and pop() hands out what has
+    been written so far.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def sales_between(start, end):
+    """Sales of ``start``..``end`` (inclusive local dates) with their items"""
+    return (
+        Sale.objects
+        .filter(date__gte=day_start(start), date__lt=day_start(end + timedelta(days=1)))
+        .order_by('date', 'id')
+        .prefetch_related(
+            Prefetch('items', queryset=SaleItem.objects.select_related('medicine').order_by('id'))
+        )
+    )
+
+
+def invoice_filename(sale):
+    return f"invoice_{sale.id}_{sale.date.strftime('%Y%m%d')}.html"
+
+
+def sale_batches(sales, batch_size):
+    """Lists of up to ``batch_size`` sales, one prefetch query set per batch"""
+    batch = []
+    for sale in sales.iterator(chunk_size=batch_size):
+        batch.append(sale)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_invoice_zip(sales, company_info=None, batch_size=EXPORT_BATCH_SIZE, workers=EXPORT_WORKERS):
+    """
+    Yield a ZIP archive with one rendered invoice per sale.
+
+    Args:
+        sales: Sale queryset, with items prefetched (see sales_between)
+        company_info: Company details printed on the invoices
+        batch_size: Sales loaded and rendered per batch
+        workers: Rendering threads
+
+    Yields:
+        Successive byte chunks of the archive
+    """
+    company_info = company_info or COMPANY_INFO
+
+    def render(sale):
+        # Items are prefetched, so rendering never touches the database
+        return invoice_filename(sale), generate_invoice_html(sale, sale.items.all(), company_info)
+
+    stream = ZipStream()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for batch in sale_batches(sales, batch_size):
+                for filename, html_string in pool.map(render, batch):
+                    archive.writestr(filename, html_string)
+                    yield stream.pop()
+        # Central directory, written when the archive is closed
+        yield stream.pop()
+
+
+class Echo:
+    """Pseudo-buffer for csv.writer: write() returns the line instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def sales_export_rows(start, end, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    One row per line item sold between ``start`` and ``end`` (inclusive
+    local dates), in sale order, without building the result in memory.
+    """
+    payment_methods = dict(Sale.PAYMENT_METHODS)
+    items = (
+        SaleItem.objects
+        .filter(sale__date__gte=day_start(start), sale__date__lt=day_start(end + timedelta(days=1)))
+        .select_related('sale', 'medicine')
+        .order_by('sale__date', 'sale_id', 'id')
+        .only('quantity', 'price', 'medicine__name', 'sale__date', 'sale__customer_name',
+              'sale__payment_method', 'sale__total_amount', 'sale__discount')
+    )
+    for item in items.iterator(chunk_size=chunk_size):
+        sale = item.sale
+        yield [
+            sale.id,
+            timezone.localtime(sale.date).replace(tzinfo=None),
+            sale.customer_name,
+            payment_methods.get(sale.payment_method, sale.payment_method),
+            sale.total_amount,
+            sale.discount,
+            sale.final_amount,
+            item.medicine.name,
+            item.quantity,
+            item.price,
+            item.total,
+        ]
+
+
+def iter_sales_csv(rows):
+    """Yield CSV lines for export rows, header first"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(SALES_EXPORT_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_sales_xlsx(rows, file):
+    """
+    Write export rows to ``file`` as an XLSX workbook. openpyxl's write-only
+    mode streams rows to disk, so memory does not grow with the row count.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sales')
+    sheet.append(SALES_EXPORT_HEADER)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(file)
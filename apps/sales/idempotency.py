@@ -0,0 +1,91 @@
+"""
+Idempotent sale submission.
+
+A client sends an ``Idempotency-Key`` header with a sale. The successful
+response is stored under (user, key) in the same transaction as the sale, so
+a retry with the same key replays it instead of checking out again. Keys
+expire after ``settings.IDEMPOTENCY_KEY_TTL`` seconds (see the
+purge_idempotency_keys command). Failed submissions are not stored and can
+be retried as they are.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+DEFAULT_TTL = 60 * 60 * 24
+
+MAX_KEY_LENGTH = 255
+
+
+class KeyReused(Exception):
+    """The key was already used for a different request"""
+
+
+def request_fingerprint(data):
+    """Stable hash of a request body"""
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def lookup(user, key, fingerprint):
+    """
+    Stored, unexpired record for ``key``, or None.
+
+    Raises:
+        KeyReused: if the stored request body differs from this one
+    """
+    now = timezone.now()
+    IdempotencyKey.objects.filter(user=user, key=key, expires_at__lte=now).delete()
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is not None and record.request_hash != fingerprint:
+        raise KeyReused(key)
+    return record
+
+
+def store(user, key, fingerprint, response_status, response_body, headers=None):
+    """
+    Store a response, and the headers to send again with it, under ``key``.
+    Call inside the transaction that
+    produced it; a concurrent request that stored the key first makes this
+    raise IntegrityError and the caller's work is rolled back.
+    """
+    ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', DEFAULT_TTL)
+    return IdempotencyKey.objects.create(
+        user=user,
+        key=key,
+        request_hash=fingerprint,
+        response_status=response_status,
+        response_body=json.loads(json.dumps(response_body, default=str)),
+        response_headers=dict(headers or {}),
+        expires_at=timezone.now() + timedelta(seconds=ttl),
+    )
+
+
+def replay(record):
+    """Response of a stored record, flagged as replayed"""
+    return Response(
+        record.response_body,
+        status=record.response_status,
+        headers={**record.response_headers, 'Idempotent-Replayed': 'true'},
+    )
+
+
+def purge_expired(batch_size=1000):
+    """Delete expired keys in bounded batches; returns the number deleted"""
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,125 @@
+import statistics
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.inventory.ledger import InsufficientStock, record_movement
+from apps.inventory.models import InventoryItem
+from apps.medicines.models import Medicine
+from apps.sales.checkout import checkout
+from apps.sales import rollups
+from apps.sales.models import Sale
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress checkout: N concurrent terminals sell the same medicine until it "
+        "runs out, then report throughput and whether the final stock is correct"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent checkout threads")
+        parser.add_argument('--sales', type=int, default=50, help="Checkouts attempted per thread")
+        parser.add_argument('--stock', type=int, default=200, help="Initial stock of the benchmark medicine")
+        parser.add_argument('--quantity', type=int, default=1, help="Units sold per checkout")
+        parser.add_argument('--retries', type=int, default=20, help="Retries when the database is busy")
+        parser.add_argument('--keep', action='store_true', help="Keep the benchmark medicine and sales")
+
+    def handle(self, *args, **options):
+        quantity = options['quantity']
+        medicine = Medicine.objects.create(
+            name=f"Checkout benchmark {timezone.now():%Y%m%d%H%M%S}",
+            category='Benchmark',
+            price=Decimal('1.00'),
+            quantity=0,
+            expiration_date=timezone.localdate() + timedelta(days=365),
+        )
+        InventoryItem.objects.create(medicine=medicine, current_stock=0, reorder_level=0)
+        record_movement(medicine, options['stock'], 'receipt', note='Checkout benchmark')
+
+        results = {'sold': 0, 'rejected': 0, 'busy': 0, 'retries': 0}
+        latencies = []
+        sale_ids = []
+        lock = threading.Lock()
+
+        def terminal():
+            try:
+                for _ in range(options['sales']):
+                    for attempt in range(options['retries'] + 1):
+                        started = time.perf_counter()
+                        try:
+                            sale = checkout(
+                                {'customer_name': 'Benchmark', 'total_amount': Decimal(quantity)},
+                                [{'medicine_id': medicine.pk, 'quantity': quantity, 'price': Decimal('1.00')}],
+                            )
+                            outcome = 'sold'
+                        except InsufficientStock:
+                            outcome = 'rejected'
+                        except OperationalError:
+                            # SQLite: another terminal holds the write lock
+                            with lock:
+                                results['retries'] += 1
+                            time.sleep(0.001 * (attempt + 1))
+                            continue
+                        elapsed = time.perf_counter() - started
+                        with lock:
+                            results[outcome] += 1
+                            latencies.append(elapsed)
+                            if outcome == 'sold':
+                                sale_ids.append(sale.pk)
+                        break
+                    else:
+                        with lock:
+                            results['busy'] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=terminal) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - started
+
+        medicine.refresh_from_db()
+        inventory = InventoryItem.objects.get(medicine=medicine)
+        ledger = medicine.stock_movements.aggregate(total=Sum('quantity'))['total']
+        expected = options['stock'] - results['sold'] * quantity
+        correct = (
+            medicine.quantity == inventory.current_stock == ledger == expected
+            and expected >= 0
+        )
+
+        attempts = results['sold'] + results['rejected']
+        self.stdout.write(f"Threads:          {options['threads']}")
+        self.stdout.write(f"Checkouts:        {attempts} in {duration:.2f}s "
+                          f"({attempts / duration:.1f}/s)")
+        self.stdout.write(f"Sold / rejected:  {results['sold']} / {results['rejected']}")
+        self.stdout.write(f"Busy retries:     {results['retries']} (gave up: {results['busy']})")
+        if latencies:
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(f"Latency p50/p99:  {statistics.median(latencies) * 1000:.1f}ms / "
+                              f"{p99 * 1000:.1f}ms")
+        self.stdout.write(f"Final stock:      quantity={medicine.quantity} "
+                          f"current_stock={inventory.current_stock} ledger={ledger} "
+                          f"expected={expected}")
+        if correct:
+            self.stdout.write(self.style.SUCCESS("Stock is consistent: no lost updates, no oversell"))
+        else:
+            self.stdout.write(self.style.ERROR("Stock is INCONSISTENT"))
+
+        if not options['keep']:
+            sales = Sale.objects.filter(pk__in=sale_ids).prefetch_related('items')
+            with transaction.atomic():
+                # Taken out of the daily rollups like any deleted sale
+                rollups.apply_sales([(sale, list(sale.items.all())) for sale in sales], -1)
+                sales.delete()
+                medicine.delete()
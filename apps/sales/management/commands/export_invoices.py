@@ -0,0 +1,47 @@
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.sales.exports import EXPORT_BATCH_SIZE, EXPORT_WORKERS, iter_invoice_zip, sales_between
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Write the invoices of a date range to a ZIP archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, help="First day to export (YYYY-MM-DD)")
+        parser.add_argument('--end', required=True, help="Last day to export (YYYY-MM-DD)")
+        parser.add_argument('--output', required=True, help="Archive path, or - for stdout")
+        parser.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE,
+                            help="Sales loaded and rendered per batch")
+        parser.add_argument('--workers', type=int, default=EXPORT_WORKERS,
+                            help="Rendering threads")
+
+    def handle(self, *args, **options):
+        start = parse_date(options['start'])
+        end = parse_date(options['end'])
+        if start > end:
+            raise CommandError("--start must not be after --end")
+
+        sales = sales_between(start, end)
+        chunks = iter_invoice_zip(sales, batch_size=options['batch_size'], workers=options['workers'])
+        if options['output'] == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        with open(options['output'], 'wb') as archive:
+            for chunk in chunks:
+                archive.write(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {sales.count()} invoices to {options['output']}"
+        ))
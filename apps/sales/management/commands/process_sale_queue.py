@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from apps.sales import queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Check out sales queued with 'Prefer: respond-async' on a pool of worker "
+        "threads, one sale at a time per medicine"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Worker threads")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds between queue polls when idle")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once the queue is empty instead of waiting for new sales")
+
+    def handle(self, *args, **options):
+        recovered = queue.recover()
+        if recovered:
+            self.stdout.write(f"Re-queued {recovered} interrupted sales")
+        processed = queue.run_pool(
+            workers=options['workers'],
+            once=options['once'],
+            poll_interval=options['poll_interval'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} queued sales"))
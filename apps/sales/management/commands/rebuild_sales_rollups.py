@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.sales import rollups
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollups of a date range from Sale and SaleItem"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help="First day to rebuild (YYYY-MM-DD). Defaults to the first sale.")
+        parser.add_argument('--end', help="Last day to rebuild (YYYY-MM-DD). Defaults to the last sale.")
+
+    def handle(self, *args, **options):
+        start = parse_date(options['start']) if options['start'] else None
+        end = parse_date(options['end']) if options['end'] else None
+        if start and end and start > end:
+            raise CommandError("--start must not be after --end")
+
+        days = rollups.rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales rollups for {days} days"))
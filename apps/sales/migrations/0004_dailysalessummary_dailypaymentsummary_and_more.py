@@ -0,0 +1,130 @@
+# Generated by Django 5.2 on 2026-10-18 10:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("medicines", "0002_medicine_batch_number"),
+        ("sales", "0003_alter_sale_payment_method"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailySalesSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(unique=True)),
+                ("sale_count", models.IntegerField(default=0)),
+                (
+                    "total_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "total_discount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+            ],
+            options={
+                "ordering": ["date"],
+            },
+        ),
+        migrations.CreateModel(
+            name="DailyPaymentSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "payment_method",
+                    models.CharField(
+                        choices=[
+                            ("cash", "Espèces"),
+                            ("card", "Carte Bancaire"),
+                            ("insurance", "Assurance"),
+                            ("transfer", "Virement"),
+                            ("lumicash", "Lumicash"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("sale_count", models.IntegerField(default=0)),
+                (
+                    "total_amount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "total_discount",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+            ],
+            options={
+                "ordering": ["date", "payment_method"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "payment_method"),
+                        name="unique_daily_payment_summary",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="DailyMedicineSales",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("quantity", models.IntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                (
+                    "medicine",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_sales",
+                        to="medicines.medicine",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["date"],
+                "indexes": [
+                    models.Index(
+                        fields=["medicine", "date"],
+                        name="sales_daily_medicin_c4313c_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "medicine"), name="unique_daily_medicine_sales"
+                    )
+                ],
+            },
+        ),
+    ]
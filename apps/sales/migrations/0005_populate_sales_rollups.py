@@ -0,0 +1,63 @@
+from django.db import migrations
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_rollups(apps, schema_editor):
+    Sale = apps.get_model("sales", "Sale")
+    SaleItem = apps.get_model("sales", "SaleItem")
+    DailySalesSummary = apps.get_model("sales", "DailySalesSummary")
+    DailyPaymentSummary = apps.get_model("sales", "DailyPaymentSummary")
+    DailyMedicineSales = apps.get_model("sales", "DailyMedicineSales")
+
+    sales = Sale.objects.order_by().annotate(day=TruncDate("date"))
+    totals = {
+        "sale_count": Count("id"),
+        "total_amount": Sum("total_amount"),
+        "total_discount": Sum("discount"),
+    }
+    DailySalesSummary.objects.bulk_create(
+        [
+            DailySalesSummary(date=row.pop("day"), **row)
+            for row in sales.values("day").annotate(**totals)
+        ],
+        batch_size=1000,
+    )
+    DailyPaymentSummary.objects.bulk_create(
+        [
+            DailyPaymentSummary(date=row.pop("day"), **row)
+            for row in sales.values("day", "payment_method").annotate(**totals)
+        ],
+        batch_size=1000,
+    )
+    DailyMedicineSales.objects.bulk_create(
+        [
+            DailyMedicineSales(
+                date=row["day"],
+                medicine_id=row["medicine_id"],
+                quantity=row["units"],
+                revenue=row["amount"],
+            )
+            for row in SaleItem.objects.order_by()
+            .annotate(day=TruncDate("sale__date"))
+            .values("day", "medicine_id")
+            .annotate(units=Sum("quantity"), amount=Sum(F("quantity") * F("price")))
+        ],
+        batch_size=1000,
+    )
+
+
+def clear_rollups(apps, schema_editor):
+    for name in ("DailySalesSummary", "DailyPaymentSummary", "DailyMedicineSales"):
+        apps.get_model("sales", name).objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0004_dailysalessummary_dailypaymentsummary_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_rollups, clear_rollups),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0005_populate_sales_rollups"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="sale",
+            index=models.Index(
+                fields=["-date", "id"], name="sales_sale_date_af1102_idx"
+            ),
+        ),
+    ]
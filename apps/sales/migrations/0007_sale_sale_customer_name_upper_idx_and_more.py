@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 10:46
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0006_sale_sales_sale_date_af1102_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="sale",
+            index=models.Index(
+                django.db.models.functions.text.Upper("customer_name"),
+                name="sale_customer_name_upper_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sale",
+            index=models.Index(
+                fields=["payment_method", "-date"], name="sales_sale_payment_5d927c_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sale",
+            index=models.Index(
+                fields=["total_amount"], name="sales_sale_total_a_904b9f_idx"
+            ),
+        ),
+    ]
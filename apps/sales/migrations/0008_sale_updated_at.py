@@ -0,0 +1,26 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    Sale = apps.get_model("sales", "Sale")
+    Sale.objects.update(updated_at=models.F("date"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0007_sale_sale_customer_name_upper_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sale",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    AnalyticsVersion = apps.get_model("sales", "AnalyticsVersion")
+    AnalyticsVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0010_queuedsale"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalyticsVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0011_analyticsversion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sale",
+            name="client_id",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name="sale",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("client_id__isnull", False)),
+                fields=("client_id",),
+                name="unique_sale_client_id",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0012_sale_client_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="idempotencykey",
+            name="response_headers",
+            field=models.JSONField(default=dict),
+        ),
+    ]
@@ -1,4 +1,7 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Upper
 from apps.medicines.models import Medicine
 
 class Sale(models.Model):
@@ -15,6 +18,25 @@ class Sale(models.Model):
     discount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHODS, default='cash')
     date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Id an offline terminal gives the sale, so a batch sync retried after a
+    # timeout does not record it twice (see SaleBatchAPIView)
+    client_id = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date', 'id']),
+            models.Index(Upper('customer_name'), name='sale_customer_name_upper_idx'),
+            models.Index(fields=['payment_method', '-date']),
+            models.Index(fields=['total_amount']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['client_id'],
+                condition=models.Q(client_id__isnull=False),
+                name='unique_sale_client_id',
+            ),
+        ]
 
     def __str__(self):
         return f"Sale to {self.customer_name} on {self.date}"
@@ -36,3 +58,123 @@ class SaleItem(models.Model):
     @property
     def total(self):
         return self.quantity * self.price
+
+
+class DailySalesSummary(models.Model):
+    """Sales of one day, maintained in the same transaction as each sale"""
+    date = models.DateField(unique=True)
+    sale_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_discount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"Sales of {self.date}: {self.sale_count}"
+
+    @property
+    def final_amount(self):
+        return self.total_amount - self.total_discount
+
+
+class DailyPaymentSummary(models.Model):
+    """Sales of one day for one payment method"""
+    date = models.DateField()
+    payment_method = models.CharField(max_length=20, choices=Sale.PAYMENT_METHODS)
+    sale_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_discount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['date', 'payment_method']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'payment_method'], name='unique_daily_payment_summary'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_payment_method_display()} sales of {self.date}: {self.sale_count}"
+
+
+class DailyMedicineSales(models.Model):
+    """Units and revenue of one medicine on one day"""
+    date = models.DateField()
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name='daily_sales')
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'medicine'], name='unique_daily_medicine_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['medicine', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.medicine.name} on {self.date}: {self.quantity}"
+
+
+class AnalyticsVersion(models.Model):
+    """
+    Single row counting changes to closed days' rollups; the analytics cache
+    keys carry it, so every worker sees the same invalidation
+    """
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Analytics version {self.version}"
+
+
+class IdempotencyKey(models.Model):
+    """Response of a sale submission, replayed when the client retries with the same key"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                             related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField()
+    response_body = models.JSONField()
+    # Sent again with the body, e.g. the Location of a queued (202) sale
+    response_headers = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
+
+
+class QueuedSale(models.Model):
+    """A validated sale waiting for an asynchronous checkout (see sales.queue)"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True,
+                             related_name='queued_sales')
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    medicine_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    sale = models.ForeignKey(Sale, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='+')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    error = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"Queued sale #{self.id} ({self.status})"
@@ -0,0 +1,164 @@
+"""
+Asynchronous checkout queue.
+
+With ``settings.SALES_ASYNC_CHECKOUT`` enabled, a sale posted with
+``Prefer: respond-async`` is validated, stored as a pending QueuedSale and
+answered with 202 straight away. The process_sale_queue command then runs
+the checkout (stock, ledger, rollups, low stock alerts) on a pool of worker
+threads. The queue is a database table, so no broker is needed.
+
+Jobs that share a medicine run one at a time, in the order they were
+queued; jobs on disjoint medicines run in parallel. A job's checkout and its
+completion are committed together, so a job left in ``processing`` by a
+crashed worker has written nothing and is safely queued again on restart.
+Run a single dispatcher per database to keep the per-medicine order.
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from apps.inventory.ledger import InsufficientStock
+from .checkout import checkout
+from .models import QueuedSale
+
+PREFER_HEADER = 'Prefer'
+
+RESPOND_ASYNC = 'respond-async'
+
+DISPATCH_WINDOW = 200
+
+BUSY_RETRIES = 8
+
+
+def wants_async(request):
+    """Whether the client asked for an asynchronous checkout"""
+    preferences = request.headers.get(PREFER_HEADER, '')
+    return RESPOND_ASYNC in [preference.strip().lower() for preference in preferences.split(',')]
+
+
+def enqueue(validated_data, user=None):
+    """Queue a validated sale (SaleSerializer.validated_data) for checkout"""
+    items_data = validated_data.get('items_data', [])
+    return QueuedSale.objects.create(
+        user=user,
+        payload=validated_data,
+        medicine_ids=sorted({item_data['medicine_id'] for item_data in items_data}),
+    )
+
+
+def recover():
+    """Queue again the jobs a stopped worker left in processing"""
+    return QueuedSale.objects.filter(status='processing').update(status='pending')
+
+
+def runnable_jobs(busy_medicines, limit, window=DISPATCH_WINDOW):
+    """
+    Pending jobs that can start now, oldest first.
+
+    A job is held back while one of its medicines is used by a running job
+    or by an older pending job, so each medicine sees its sales in order.
+    """
+    if limit <= 0:
+        return []
+    blocked = set(busy_medicines)
+    jobs = []
+    for job in QueuedSale.objects.filter(status='pending').order_by('id')[:window]:
+        medicines = set(job.medicine_ids)
+        if not medicines & blocked:
+            jobs.append(job)
+            if len(jobs) == limit:
+                break
+        blocked |= medicines
+    return jobs
+
+
+def claim(job):
+    """Mark a pending job as processing; False if another dispatcher took it"""
+    return QueuedSale.objects.filter(pk=job.pk, status='pending').update(status='processing') == 1
+
+
+def finish(job, status_code, sale=None, error=None):
+    job.status = 'done' if sale is not None else 'failed'
+    job.sale = sale
+    job.response_status = status_code
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'sale', 'response_status', 'error', 'finished_at'])
+
+
+def process(job):
+    """Run the checkout of a claimed job and record its outcome"""
+    from .serializers import SaleSerializer
+
+    serializer = SaleSerializer(data=job.payload)
+    if not serializer.is_valid():
+        finish(job, 400, error=serializer.errors)
+        return job
+    validated_data = dict(serializer.validated_data)
+    items_data = validated_data.pop('items_data', [])
+    try:
+        with transaction.atomic():
+            sale = checkout(validated_data, items_data)
+            finish(job, 201, sale=sale)
+    except InsufficientStock as exc:
+        finish(job, 409, error=exc.as_response_data())
+    except serializers.ValidationError as exc:
+        finish(job, 400, error=exc.detail)
+    return job
+
+
+def run_job(job):
+    """
+    Worker thread entry point: process a job on the thread's own connection,
+    retrying while the database is busy (SQLite allows a single writer).
+    """
+    close_old_connections()
+    try:
+        for attempt in range(BUSY_RETRIES):
+            try:
+                return process(job)
+            except OperationalError:
+                if attempt == BUSY_RETRIES - 1:
+                    raise
+                time.sleep(0.05 * 2 ** attempt)
+    except Exception as exc:
+        # Record the failure instead of leaving the job in processing
+        finish(job, 500, error={"error": str(exc)})
+        return job
+    finally:
+        connection.close()
+
+
+def run_pool(workers=4, once=False, poll_interval=1.0, log=None):
+    """
+    Dispatch queued jobs to ``workers`` threads until stopped, or until the
+    queue is empty with ``once``.
+
+    Returns:
+        Number of jobs processed
+    """
+    processed = 0
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            busy = {medicine_id for job in running.values() for medicine_id in job.medicine_ids}
+            for job in runnable_jobs(busy, workers - len(running)):
+                if claim(job):
+                    running[pool.submit(run_job, job)] = job
+
+            if not running:
+                if once:
+                    return processed
+                time.sleep(poll_interval)
+                continue
+
+            done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                future.result()
+                processed += 1
+                if log:
+                    log(f"Queued sale #{job.pk}: {job.status}")
@@ -0,0 +1,175 @@
+"""
+Incrementally maintained sales rollups.
+
+DailySalesSummary, DailyPaymentSummary and DailyMedicineSales hold
+pre-aggregated sales per day. They are moved by every sale in the same
+transaction (add_sale/remove_sale), so reports cost O(days) instead of
+O(sales). rebuild() recomputes any date range from Sale/SaleItem.
+"""
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import analytics
+from .models import DailyMedicineSales, DailyPaymentSummary, DailySalesSummary, Sale, SaleItem
+
+
+def sale_day(sale):
+    """Business day a sale belongs to (in the configured time zone)"""
+    return timezone.localdate(sale.date)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def bump(model, day, increments, key_field=None):
+    """
+    Add ``increments[key][field]`` to the rollup rows of ``day``.
+
+    ``increments`` maps a key (a payment method, a medicine id, or None for
+    the per-day table) to the amounts to add. Existing rows are moved with
+    one CASE-based UPDATE and missing rows are bulk inserted.
+    """
+    rows = model.objects.filter(date=day)
+    if key_field:
+        rows = rows.filter(**{f'{key_field}__in': list(increments)})
+        existing = set(rows.values_list(key_field, flat=True))
+    else:
+        existing = {None} if rows.exists() else set()
+
+    fields = {field for amounts in increments.values() for field in amounts}
+    if existing:
+        if key_field:
+            updates = {
+                field: Case(
+                    *[When(**{key_field: key}, then=F(field) + increments[key].get(field, 0))
+                      for key in existing],
+                    default=F(field),
+                    output_field=model._meta.get_field(field),
+                )
+                for field in fields
+            }
+        else:
+            updates = {field: F(field) + amount for field, amount in increments[None].items()}
+        rows.update(**updates)
+
+    missing = [key for key in increments if key not in existing]
+    if missing:
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create([
+                    model(date=day, **({key_field: key} if key_field else {}), **increments[key])
+                    for key in missing
+                ])
+        except IntegrityError:
+            # A concurrent sale created some of these rows first
+            bump(model, day, {key: increments[key] for key in missing}, key_field)
+
+
+def apply_sales(sales_items, sign):
+    """
+    Move the rollups by ``sign`` times a list of (sale, items) pairs, with
+    one set of statements per business day rather than per sale.
+    """
+    days = {}
+    for sale, items in sales_items:
+        day = days.setdefault(sale_day(sale), {'totals': {}, 'payments': {}, 'medicines': {}})
+        for totals in (day['totals'].setdefault(None, {}),
+                       day['payments'].setdefault(sale.payment_method, {})):
+            totals['sale_count'] = totals.get('sale_count', 0) + sign
+            totals['total_amount'] = totals.get('total_amount', 0) + sign * sale.total_amount
+            totals['total_discount'] = totals.get('total_discount', 0) + sign * sale.discount
+        for item in items:
+            amounts = day['medicines'].setdefault(item.medicine_id, {'quantity': 0, 'revenue': 0})
+            amounts['quantity'] += sign * item.quantity
+            amounts['revenue'] += sign * item.quantity * item.price
+
+    with transaction.atomic():
+        for day, increments in days.items():
+            bump(DailySalesSummary, day, increments['totals'])
+            bump(DailyPaymentSummary, day, increments['payments'], key_field='payment_method')
+            if increments['medicines']:
+                bump(DailyMedicineSales, day, increments['medicines'], key_field='medicine_id')
+        if any(day < timezone.localdate() for day in days):
+            # A closed day changed: cached analytics periods are stale
+            analytics.invalidate_closed_periods()
+
+
+def add_sale(sale, items):
+    """Add a sale and its line items to the rollups"""
+    apply_sales([(sale, items)], 1)
+
+
+def add_sales(sales_items):
+    """Add a list of (sale, items) pairs to the rollups"""
+    apply_sales(sales_items, 1)
+
+
+def remove_sale(sale, items):
+    """Take a sale (about to be deleted or changed) out of the rollups"""
+    apply_sales([(sale, items)], -1)
+
+
+def rebuild(start=None, end=None):
+    """
+    Recompute the rollups of ``start``..``end`` (inclusive dates, open-ended
+    when None) from Sale and SaleItem.
+
+    Returns:
+        Number of DailySalesSummary rows written
+    """
+    summaries = DailySalesSummary.objects.all()
+    payments = DailyPaymentSummary.objects.all()
+    medicines = DailyMedicineSales.objects.all()
+    sales = Sale.objects.order_by()
+    items = SaleItem.objects.order_by()
+    if start:
+        summaries = summaries.filter(date__gte=start)
+        payments = payments.filter(date__gte=start)
+        medicines = medicines.filter(date__gte=start)
+        sales = sales.filter(date__gte=day_start(start))
+        items = items.filter(sale__date__gte=day_start(start))
+    if end:
+        summaries = summaries.filter(date__lte=end)
+        payments = payments.filter(date__lte=end)
+        medicines = medicines.filter(date__lte=end)
+        sales = sales.filter(date__lt=day_start(end + timedelta(days=1)))
+        items = items.filter(sale__date__lt=day_start(end + timedelta(days=1)))
+
+    sales = sales.annotate(day=TruncDate('date'))
+    sale_totals = {
+        'sale_count': Count('id'),
+        'total_amount': Sum('total_amount'),
+        'total_discount': Sum('discount'),
+    }
+
+    with transaction.atomic():
+        summaries.delete()
+        payments.delete()
+        medicines.delete()
+
+        created = DailySalesSummary.objects.bulk_create(
+            (DailySalesSummary(date=row.pop('day'), **row)
+             for row in sales.values('day').annotate(**sale_totals).iterator()),
+            batch_size=1000,
+        )
+        DailyPaymentSummary.objects.bulk_create(
+            (DailyPaymentSummary(date=row.pop('day'), **row)
+             for row in sales.values('day', 'payment_method').annotate(**sale_totals).iterator()),
+            batch_size=1000,
+        )
+        DailyMedicineSales.objects.bulk_create(
+            (DailyMedicineSales(date=row['day'], medicine_id=row['medicine_id'],
+                                quantity=row['units'], revenue=row['amount'])
+             for row in items.annotate(day=TruncDate('sale__date'))
+             .values('day', 'medicine_id')
+             .annotate(units=Sum('quantity'), amount=Sum(F('quantity') * F('price')))
+             .iterator()),
+            batch_size=1000,
+        )
+        analytics.invalidate_closed_periods()
+    return len(created)
@@ -1,8 +1,10 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Sale, SaleItem
-from apps.medicines.models import Medicine
-from apps.inventory.models import InventoryItem
-from apps.notifications.models import Notification
+from django.urls import reverse
+from .models import QueuedSale, Sale, SaleItem
+from .checkout import checkout
+from . import rollups
 
 
 class SaleItemSerializer(serializers.ModelSerializer):
@@ -12,9 +14,16 @@ class SaleItemSerializer(serializers.ModelSerializer):
         model = SaleItem
         fields = ['id', 'medicine', 'medicine_name', 'quantity', 'price']
 
+class SaleLineSerializer(serializers.Serializer):
+    """One basket line posted with a sale"""
+    medicine_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
 class SaleSerializer(serializers.ModelSerializer):
     items = SaleItemSerializer(many=True, read_only=True)
-    items_data = serializers.ListField(write_only=True, required=False)
+    items_data = SaleLineSerializer(many=True, write_only=True, required=False)
     final_amount = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     payment_method_display = serializers.CharField(source='get_payment_method_display', read_only=True)
     
@@ -25,38 +34,46 @@ class SaleSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         items_data = validated_data.pop('items_data', [])
-        sale = Sale.objects.create(**validated_data)
-        
-        for item_data in items_data:
-            medicine = Medicine.objects.get(id=item_data['medicine_id'])
-            SaleItem.objects.create(
-                sale=sale,
-                medicine=medicine,
-                quantity=item_data['quantity'],
-                price=item_data['price']
-            )
-            
-            # Update medicine quantity
-            medicine.quantity -= item_data['quantity']
-            medicine.save()
-            
-            # Check inventory and create notification if low stock
-            try:
-                inventory = InventoryItem.objects.get(medicine=medicine)
-                new_stock = inventory.current_stock - item_data['quantity']
-                inventory.current_stock = new_stock
-                inventory.save()
-                
-                # Create low stock notification if below reorder level
-                if new_stock <= inventory.reorder_level:
-                    Notification.create_low_stock_notification(inventory, new_stock)
-            except InventoryItem.DoesNotExist:
-                # Create inventory record if it doesn't exist
-                InventoryItem.objects.create(
-                    medicine=medicine,
-                    current_stock=medicine.quantity,
-                    reorder_level=10
-                )
-        
-        return sale
+        return checkout(validated_data, items_data)
+
+    def update(self, instance, validated_data):
+        # Basket lines are only accepted at checkout
+        validated_data.pop('items_data', None)
+        with transaction.atomic():
+            items = list(instance.items.all())
+            rollups.remove_sale(instance, items)
+            instance = super().update(instance, validated_data)
+            rollups.add_sale(instance, items)
+        return instance
+
+
+class OfflineSaleSerializer(SaleSerializer):
+    """A sale uploaded in a batch by an offline terminal, with the time it was made"""
+    sold_at = serializers.DateTimeField(source='date', required=False, write_only=True)
+    # Declared rather than generated: a known client_id is replayed by the
+    # view, not rejected by a uniqueness validator
+    client_id = serializers.CharField(max_length=64, required=False)
+
+    class Meta(SaleSerializer.Meta):
+        fields = SaleSerializer.Meta.fields + ['sold_at', 'client_id']
+
+    def validate_sold_at(self, value):
+        if value > timezone.now():
+            raise serializers.ValidationError("Sales cannot be dated in the future.")
+        return value
+
+
+class QueuedSaleSerializer(serializers.ModelSerializer):
+    """Status of an asynchronous checkout"""
+    sale = SaleSerializer(read_only=True)
+    status_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = QueuedSale
+        fields = ['id', 'status', 'status_url', 'response_status', 'sale', 'error',
+                  'created_at', 'finished_at']
 
+    def get_status_url(self, obj):
+        url = reverse('queued_sale_detail', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -1,3 +1,687 @@
-from django.test import TestCase
+import csv
+import io
+import zipfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.inventory.models import InventoryItem
+from apps.medicines.models import Medicine
+from apps.notifications.models import Notification
+from apps.users.models import CustomUser
+from .models import DailyMedicineSales, DailySalesSummary, IdempotencyKey, QueuedSale, Sale, SaleItem
+from . import idempotency
+from . import views
+from . import queue
+from . import rollups
+from .exports import iter_invoice_zip, sales_between
+
+
+class SaleTestMixin:
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='pharmacist', password='secret-pass', role='pharmacist'
+        )
+        self.client.force_authenticate(self.user)
+
+    def make_medicine(self, name, quantity=50, reorder_level=10, price='2.50'):
+        medicine = Medicine.objects.create(
+            name=name,
+            category='General',
+            price=Decimal(price),
+            quantity=quantity,
+            expiration_date=date.today() + timedelta(days=365),
+        )
+        InventoryItem.objects.create(
+            medicine=medicine, current_stock=quantity, reorder_level=reorder_level
+        )
+        return medicine
+
+    def sale_payload(self, lines, **extra):
+        payload = {
+            'customer_name': 'Jane Doe',
+            'total_amount': '10.00',
+            'payment_method': 'cash',
+            'items_data': [
+                {'medicine_id': medicine.id, 'quantity': quantity, 'price': str(medicine.price)}
+                for medicine, quantity in lines
+            ],
+        }
+        payload.update(extra)
+        return payload
+
+
+class CheckoutTests(SaleTestMixin, APITestCase):
+    def test_checkout_decrements_stock(self):
+        aspirin = self.make_medicine('Aspirin', quantity=20)
+        ibuprofen = self.make_medicine('Ibuprofen', quantity=5)
+
+        response = self.client.post(
+            '/api/sales/',
+            self.sale_payload([(aspirin, 3), (ibuprofen, 2), (aspirin, 1)]),
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(SaleItem.objects.count(), 3)
+        aspirin.refresh_from_db()
+        ibuprofen.refresh_from_db()
+        self.assertEqual(aspirin.quantity, 16)
+        self.assertEqual(aspirin.inventoryitem.current_stock, 16)
+        self.assertEqual(ibuprofen.quantity, 3)
+        self.assertEqual(ibuprofen.inventoryitem.current_stock, 3)
+
+    def test_insufficient_stock_rolls_back_whole_basket(self):
+        aspirin = self.make_medicine('Aspirin', quantity=20)
+        ibuprofen = self.make_medicine('Ibuprofen', quantity=1)
+
+        response = self.client.post(
+            '/api/sales/',
+            self.sale_payload([(aspirin, 3), (ibuprofen, 2)]),
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['error'], 'Insufficient stock')
+        self.assertEqual(response.data['items'][0]['medicine'], ibuprofen.id)
+        self.assertEqual(response.data['items'][0]['available'], 1)
+        self.assertFalse(Sale.objects.exists())
+        aspirin.refresh_from_db()
+        self.assertEqual(aspirin.quantity, 20)
+
+    def test_query_count_does_not_grow_with_basket(self):
+        small = [(self.make_medicine(f'Small {i}'), 1) for i in range(2)]
+        large = [(self.make_medicine(f'Large {i}'), 1) for i in range(20)]
+        # The first sale of the day also creates the daily rollup rows
+        warm_up = [(self.make_medicine('Warm-up'), 1)]
+        self.client.post('/api/sales/', self.sale_payload(warm_up), format='json')
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.post('/api/sales/', self.sale_payload(small), format='json')
+        with CaptureQueriesContext(connection) as large_queries:
+            self.client.post('/api/sales/', self.sale_payload(large), format='json')
+
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_low_stock_alerts_fan_out_in_constant_queries(self):
+        for index in range(5):
+            CustomUser.objects.create_user(username=f'admin{index}', password='secret-pass', role='admin')
+        medicines = [self.make_medicine(f'Medicine {i}', quantity=12) for i in range(4)]
+        warm_up = [(self.make_medicine('Warm-up'), 1)]
+        self.client.post('/api/sales/', self.sale_payload(warm_up), format='json')
+
+        with CaptureQueriesContext(connection) as one_alert:
+            self.client.post('/api/sales/', self.sale_payload([(medicines[0], 3)]), format='json')
+        with CaptureQueriesContext(connection) as many_alerts:
+            self.client.post('/api/sales/', self.sale_payload([(m, 3) for m in medicines[1:]]),
+                             format='json')
+
+        self.assertEqual(len(one_alert), len(many_alerts))
+        self.assertEqual(Notification.objects.filter(notification_type='low_stock').count(), 20)
+
+        # Already alerted: a second sale adds nothing, even racing past the check
+        self.client.post('/api/sales/', self.sale_payload([(medicines[0], 1)]), format='json')
+        Notification.objects.bulk_create(
+            [Notification(user=admin, notification_type='low_stock', title='Duplicate', message='',
+                          related_object_id=medicines[0].pk)
+             for admin in CustomUser.objects.filter(role='admin')],
+            ignore_conflicts=True,
+        )
+        self.assertEqual(Notification.objects.filter(related_object_id=medicines[0].pk).count(), 5)
+
+
+class SalesReportTests(SaleTestMixin, APITestCase):
+    def make_sale(self, when, total, discount='0', payment_method='cash'):
+        sale = Sale.objects.create(
+            customer_name='Walk-in',
+            total_amount=Decimal(total),
+            discount=Decimal(discount),
+            payment_method=payment_method,
+        )
+        Sale.objects.filter(pk=sale.pk).update(date=when)
+        return sale
+
+    def setUp(self):
+        super().setUp()
+        self.aspirin = self.make_medicine('Aspirin', quantity=100)
+
+    def checkout_at(self, when, lines, **extra):
+        response = self.client.post('/api/sales/', self.sale_payload(lines, **extra), format='json')
+        Sale.objects.filter(pk=response.data['id']).update(date=when)
+        return response.data['id']
+
+    def test_daily_report(self):
+        day = timezone.make_aware(datetime(2026, 3, 14, 10, 0))
+        self.make_sale(day, '10.00', '1.00')
+        self.make_sale(day + timedelta(hours=2), '5.50')
+        self.make_sale(day, '20.00', payment_method='card')
+        self.make_sale(day + timedelta(days=1), '99.00')
+        rollups.rebuild()
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/sales/reports/daily/?date=2026-03-14')
+
+        self.assertEqual(response.data['total_sales'], 3)
+        self.assertEqual(response.data['total_amount'], Decimal('34.50'))
+        self.assertEqual(response.data['total_discount'], Decimal('1.00'))
+        self.assertEqual(response.data['payment_methods']['Espèces'],
+                         {'count': 2, 'amount': Decimal('14.50')})
+        self.assertEqual(response.data['payment_methods']['Carte Bancaire']['count'], 1)
+
+    def test_monthly_report(self):
+        self.make_sale(timezone.make_aware(datetime(2026, 3, 1, 9, 0)), '10.00', '2.00')
+        self.make_sale(timezone.make_aware(datetime(2026, 3, 1, 18, 0)), '4.00')
+        self.make_sale(timezone.make_aware(datetime(2026, 3, 31, 23, 0)), '6.00')
+        self.make_sale(timezone.make_aware(datetime(2026, 4, 1, 0, 0)), '50.00')
+        rollups.rebuild()
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/sales/reports/monthly/?year=2026&month=3')
+
+        self.assertEqual(response.data['total_sales'], 3)
+        self.assertEqual(response.data['total_amount'], Decimal('18.00'))
+        self.assertEqual(response.data['daily_breakdown'], {
+            '2026-03-01': {'count': 2, 'amount': Decimal('12.00')},
+            '2026-03-31': {'count': 1, 'amount': Decimal('6.00')},
+        })
+
+    def test_rollups_follow_checkout_edit_and_delete(self):
+        today = timezone.localdate()
+        ibuprofen = self.make_medicine('Ibuprofen', quantity=100)
+        first = self.client.post('/api/sales/', self.sale_payload(
+            [(self.aspirin, 2), (ibuprofen, 1)], total_amount='7.50', discount='0.50'
+        ), format='json').data['id']
+        self.client.post('/api/sales/', self.sale_payload(
+            [(self.aspirin, 1)], total_amount='2.50', payment_method='card'
+        ), format='json')
+
+        summary = DailySalesSummary.objects.get(date=today)
+        self.assertEqual(summary.sale_count, 2)
+        self.assertEqual(summary.final_amount, Decimal('9.50'))
+        aspirin_day = DailyMedicineSales.objects.get(date=today, medicine=self.aspirin)
+        self.assertEqual((aspirin_day.quantity, aspirin_day.revenue), (3, Decimal('7.50')))
+
+        self.client.put(f'/api/sales/{first}/', {'payment_method': 'insurance'}, format='json')
+        response = self.client.get(f'/api/sales/reports/daily/?date={today.isoformat()}')
+        self.assertEqual(set(response.data['payment_methods']), {'Assurance', 'Carte Bancaire'})
+
+        self.client.delete(f'/api/sales/{first}/')
+        summary.refresh_from_db()
+        self.assertEqual(summary.sale_count, 1)
+        self.assertEqual(summary.final_amount, Decimal('2.50'))
+
+        rebuilt = {
+            (row.date, row.medicine_id): (row.quantity, row.revenue)
+            for row in DailyMedicineSales.objects.filter(quantity__gt=0)
+        }
+        rollups.rebuild(today, today)
+        self.assertEqual(rebuilt, {
+            (row.date, row.medicine_id): (row.quantity, row.revenue)
+            for row in DailyMedicineSales.objects.all()
+        })
+
+    def test_trend_report(self):
+        self.checkout_at(timezone.make_aware(datetime(2026, 3, 1, 9, 0)), [(self.aspirin, 4)])
+        self.checkout_at(timezone.make_aware(datetime(2026, 3, 3, 9, 0)), [(self.aspirin, 1)])
+        rollups.rebuild()
+
+        response = self.client.get('/api/sales/reports/trend/?start=2026-03-01&end=2026-03-31')
+
+        self.assertEqual([day['date'] for day in response.data['days']], ['2026-03-01', '2026-03-03'])
+        self.assertEqual(response.data['top_medicines'][0]['quantity'], 5)
+
+        for limit in ('abc', '-1', '0'):
+            response = self.client.get(f'/api/sales/reports/trend/?limit={limit}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, limit)
+
+
+class SaleListPaginationTests(SaleTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        start = timezone.make_aware(datetime(2026, 3, 1, 9, 0))
+        for day in range(5):
+            sale = Sale.objects.create(customer_name=f'Customer {day}', total_amount=Decimal('1.00'))
+            Sale.objects.filter(pk=sale.pk).update(date=start + timedelta(days=day))
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get('/api/sales/')
+
+        self.assertEqual(len(response.data), 5)
+
+    def test_cursor_pages_walk_newest_first(self):
+        response = self.client.get('/api/sales/?page_size=2&count=true')
+        self.assertEqual(response.data['count'], 5)
+        self.assertIsNone(response.data['previous'])
+        names = [sale['customer_name'] for sale in response.data['results']]
+
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            names += [sale['customer_name'] for sale in response.data['results']]
+
+        self.assertEqual(names, [f'Customer {day}' for day in reversed(range(5))])
+
+
+class SaleSearchTests(SaleTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.aspirin = self.make_medicine('Aspirin', quantity=100)
+        for name, total, method, day in [
+            ('Marie Curie', '12.00', 'cash', 1),
+            ('Mario Rossi', '40.00', 'card', 2),
+            ('Anne-Marie Dupont', '8.00', 'cash', 3),
+        ]:
+            response = self.client.post('/api/sales/', self.sale_payload(
+                [(self.aspirin, 1)], customer_name=name, total_amount=total, payment_method=method
+            ), format='json')
+            Sale.objects.filter(pk=response.data['id']).update(
+                date=timezone.make_aware(datetime(2026, 3, day, 12, 0))
+            )
+
+    def search(self, query):
+        response = self.client.get(f'/api/sales/search/?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [sale['customer_name'] for sale in response.data['results']]
+
+    def test_customer_prefix_and_substring(self):
+        self.assertEqual(self.search('customer=mari'), ['Mario Rossi', 'Marie Curie'])
+        self.assertEqual(self.search('customer=marie&match=contains'),
+                         ['Anne-Marie Dupont', 'Marie Curie'])
+
+    def test_combined_filters(self):
+        self.assertEqual(self.search('payment_method=cash&min_amount=10'), ['Marie Curie'])
+        self.assertEqual(self.search('date_from=2026-03-02&date_to=2026-03-03'),
+                         ['Anne-Marie Dupont', 'Mario Rossi'])
+        sale = Sale.objects.get(customer_name='Mario Rossi')
+        self.assertEqual(self.search(f'id={sale.pk}'), ['Mario Rossi'])
+
+    def test_results_are_paginated_with_items(self):
+        response = self.client.get('/api/sales/search/?page_size=2&count=true')
+
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['results'][0]['items'][0]['medicine'], self.aspirin.id)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_invalid_filter(self):
+        for query in ('min_amount=lots', 'min_amount=NaN', 'max_amount=Infinity', 'max_amount=-inf'):
+            response = self.client.get(f'/api/sales/search/?{query}')
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+
+
+class InvoiceRenderTests(SaleTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        aspirin = self.make_medicine('Aspirin', quantity=10)
+        self.sale_id = self.client.post(
+            '/api/sales/', self.sale_payload([(aspirin, 2)]), format='json'
+        ).data['id']
+        self.url = f'/api/sales/{self.sale_id}/invoice/'
+
+    def test_reprint_is_not_modified(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('Aspirin', first.content.decode())
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(1):
+            again = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_cached_rendering_is_reused_until_sale_changes(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached.content, first.content)
+
+        self.client.put(f'/api/sales/{self.sale_id}/', {'customer_name': 'John Roe'}, format='json')
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertIn('John Roe', changed.content.decode())
+
+
+class InvoiceExportTests(SaleTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        aspirin = self.make_medicine('Aspirin', quantity=50)
+        self.sale_ids = []
+        for day in (1, 15, 31, 31, 31):
+            sale_id = self.client.post(
+                '/api/sales/', self.sale_payload([(aspirin, 1)]), format='json'
+            ).data['id']
+            Sale.objects.filter(pk=sale_id).update(
+                date=timezone.make_aware(datetime(2026, 3, day, 12, 0))
+            )
+            self.sale_ids.append(sale_id)
+        Sale.objects.filter(pk=self.sale_ids[-1]).update(
+            date=timezone.make_aware(datetime(2026, 4, 1, 12, 0))
+        )
+
+    def test_export_endpoint_streams_zip(self):
+        response = self.client.get('/api/sales/invoices/export/?start=2026-03-01&end=2026-03-31')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 4)
+        self.assertIn('Aspirin', archive.read(archive.namelist()[0]).decode())
+
+    def test_batches_keep_sale_order(self):
+        sales = sales_between(date(2026, 3, 1), date(2026, 4, 30))
+        content = b''.join(iter_invoice_zip(sales, batch_size=2, workers=2))
+
+        names = zipfile.ZipFile(io.BytesIO(content)).namelist()
+        self.assertEqual([int(name.split('_')[1]) for name in names], self.sale_ids)
+
+    def test_export_requires_range(self):
+        response = self.client.get('/api/sales/invoices/export/?start=2026-03-01')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SalesExportTests(SaleTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        aspirin = self.make_medicine('Aspirin', quantity=50)
+        ibuprofen = self.make_medicine('Ibuprofen', quantity=50, price='4.00')
+        for day, lines in ((2, [(aspirin, 2), (ibuprofen, 1)]), (3, [(ibuprofen, 3)])):
+            sale_id = self.client.post(
+                '/api/sales/', self.sale_payload(lines), format='json'
+            ).data['id']
+            Sale.objects.filter(pk=sale_id).update(
+                date=timezone.make_aware(datetime(2026, 3, day, 12, 0))
+            )
+
+    def test_csv_export_streams_line_items(self):
+        response = self.client.get('/api/sales/export/?start=2026-03-01&end=2026-03-31')
+
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][0], 'Sale')
+        self.assertEqual([(row[7], row[8], row[10]) for row in rows[1:]], [
+            ('Aspirin', '2', '5.00'), ('Ibuprofen', '1', '4.00'), ('Ibuprofen', '3', '12.00'),
+        ])
+
+    def test_xlsx_export(self):
+        from openpyxl import load_workbook
+
+        response = self.client.get('/api/sales/export/?start=2026-03-03&end=2026-03-03&type=xlsx')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][7:9], ('Ibuprofen', 3))
+
+
+class IdempotentCheckoutTests(SaleTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.aspirin = self.make_medicine('Aspirin', quantity=20)
+
+    def post_sale(self, key, quantity=2):
+        return self.client.post(
+            '/api/sales/', self.sale_payload([(self.aspirin, quantity)]),
+            format='json', HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_original_response(self):
+        first = self.post_sale('till-1-0001')
+        retry = self.post_sale('till-1-0001')
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Sale.objects.count(), 1)
+        self.aspirin.refresh_from_db()
+        self.assertEqual(self.aspirin.quantity, 18)
+
+    def test_key_reused_for_different_sale(self):
+        self.post_sale('till-1-0002')
+        response = self.post_sale('till-1-0002', quantity=3)
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_key_stored_concurrently_for_different_sale(self):
+        with mock.patch.object(idempotency, 'store', side_effect=IntegrityError), \
+                mock.patch.object(idempotency, 'lookup',
+                                  side_effect=[None, idempotency.KeyReused('till-1-0005')]):
+            response = self.post_sale('till-1-0005')
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Sale.objects.count(), 0)
+
+    def test_failed_sale_is_not_remembered(self):
+        self.assertEqual(self.post_sale('till-1-0003', quantity=50).status_code,
+                         status.HTTP_409_CONFLICT)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_expired_key_checks_out_again(self):
+        self.post_sale('till-1-0004')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = self.post_sale('till-1-0004')
+
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+
+class SaleBatchTests(SaleTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.aspirin = self.make_medicine('Aspirin', quantity=5)
+        self.ibuprofen = self.make_medicine('Ibuprofen', quantity=500)
+
+    def test_results_per_sale(self):
+        sold_at = timezone.make_aware(datetime(2026, 3, 2, 8, 30))
+        response = self.client.post('/api/sales/batch/', [
+            self.sale_payload([(self.aspirin, 3)], sold_at=sold_at.isoformat()),
+            self.sale_payload([(self.aspirin, 3)]),
+            self.sale_payload([(self.aspirin, 2), (self.ibuprofen, 1)]),
+            {'customer_name': 'No total'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['rejected']), (2, 2))
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 409, 201, 400])
+        self.assertEqual(response.data['results'][1]['items'][0]['available'], 2)
+        self.assertEqual(Sale.objects.get(pk=response.data['results'][0]['sale']['id']).date, sold_at)
+        self.aspirin.refresh_from_db()
+        self.assertEqual(self.aspirin.quantity, 0)
+        self.assertEqual(self.aspirin.inventoryitem.current_stock, 0)
+        self.assertEqual(DailySalesSummary.objects.get(date=date(2026, 3, 2)).sale_count, 1)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        self.client.post('/api/sales/', self.sale_payload([(self.ibuprofen, 1)]), format='json')
+
+        def sync(count):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/sales/batch/?chunk_size=50', [
+                    self.sale_payload([(self.ibuprofen, 1)]) for _ in range(count)
+                ], format='json')
+            self.assertEqual(response.data['created'], count)
+            return len(queries)
+
+        self.assertEqual(sync(5), sync(40))
+
+    def test_resubmitted_batch_is_replayed(self):
+        batch = [
+            dict(self.sale_payload([(self.ibuprofen, 2)]), client_id='till-1:0001'),
+            dict(self.sale_payload([(self.ibuprofen, 3)]), client_id='till-1:0002'),
+            dict(self.sale_payload([(self.ibuprofen, 3)]), client_id='till-1:0002'),
+        ]
+        first = self.client.post('/api/sales/batch/', batch, format='json')
+        retry = self.client.post('/api/sales/batch/', batch, format='json')
+
+        self.assertEqual((first.data['created'], first.data['replayed']), (2, 1))
+        self.assertEqual((retry.data['created'], retry.data['replayed'], retry.data['rejected']), (0, 3, 0))
+        self.assertEqual([result['status'] for result in retry.data['results']], [200, 200, 200])
+        self.assertEqual([result['sale']['id'] for result in retry.data['results']],
+                         [result['sale']['id'] for result in first.data['results']])
+        self.assertEqual(Sale.objects.count(), 2)
+        self.ibuprofen.refresh_from_db()
+        self.assertEqual(self.ibuprofen.quantity, 495)
+
+    def test_sale_stored_by_a_concurrent_sync_is_replayed(self):
+        payload = dict(self.sale_payload([(self.ibuprofen, 2)]), client_id='till-1:0003')
+        stored = self.client.post('/api/sales/batch/', [payload], format='json').data['results'][0]['sale']
+        already_recorded = views.recorded_sales(['till-1:0003'])
+
+        # The first lookup ran before the concurrent sync committed
+        with mock.patch.object(views, 'recorded_sales', side_effect=[{}, already_recorded]):
+            response = self.client.post('/api/sales/batch/', [payload], format='json')
+
+        self.assertEqual(response.data['results'][0]['status'], status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['sale']['id'], stored['id'])
+        self.assertEqual(Sale.objects.count(), 1)
+        self.ibuprofen.refresh_from_db()
+        self.assertEqual(self.ibuprofen.quantity, 498)
+
+    def test_chunks_commit_separately(self):
+        response = self.client.post('/api/sales/batch/?chunk_size=2', [
+            self.sale_payload([(self.ibuprofen, 1)]) for _ in range(5)
+        ], format='json')
+
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual(Sale.objects.count(), 5)
+        self.ibuprofen.refresh_from_db()
+        self.assertEqual(self.ibuprofen.quantity, 495)
+
+
+@override_settings(SALES_ASYNC_CHECKOUT=True)
+class AsyncCheckoutTests(SaleTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.aspirin = self.make_medicine('Aspirin', quantity=3)
+        self.ibuprofen = self.make_medicine('Ibuprofen', quantity=10)
+
+    def post_async(self, lines):
+        return self.client.post('/api/sales/', self.sale_payload(lines), format='json',
+                                HTTP_PREFER='respond-async')
+
+    def test_sale_is_queued_then_checked_out(self):
+        response = self.post_async([(self.aspirin, 2)])
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response['Location'], response.data['status_url'])
+        self.assertFalse(Sale.objects.exists())
+
+        queue.process(QueuedSale.objects.get())
+        status_response = self.client.get(response['Location'])
+
+        self.assertEqual(status_response.data['status'], 'done')
+        self.assertEqual(status_response.data['sale']['items'][0]['quantity'], 2)
+        self.aspirin.refresh_from_db()
+        self.assertEqual(self.aspirin.quantity, 1)
+
+    def test_replayed_queued_sale_keeps_its_location(self):
+        def post():
+            return self.client.post('/api/sales/', self.sale_payload([(self.aspirin, 1)]), format='json',
+                                    HTTP_PREFER='respond-async', HTTP_IDEMPOTENCY_KEY='till-2-0001')
+
+        first = post()
+        retry = post()
+
+        self.assertEqual(retry.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry['Location'], first['Location'])
+        self.assertEqual(QueuedSale.objects.count(), 1)
+
+    def test_shortage_fails_the_job(self):
+        self.post_async([(self.aspirin, 5)])
+
+        job = queue.process(QueuedSale.objects.get())
+
+        self.assertEqual((job.status, job.response_status), ('failed', 409))
+        self.assertEqual(job.error['items'][0]['available'], 3)
+
+    def test_jobs_on_same_medicine_run_in_order(self):
+        first = self.post_async([(self.aspirin, 1)]).data['id']
+        second = self.post_async([(self.aspirin, 1), (self.ibuprofen, 1)]).data['id']
+        third = self.post_async([(self.ibuprofen, 1)]).data['id']
+        other = self.make_medicine('Paracetamol')
+        fourth = self.post_async([(other, 1)]).data['id']
+
+        runnable = [job.pk for job in queue.runnable_jobs(set(), limit=4)]
+        self.assertEqual(runnable, [first, fourth])
+        runnable = [job.pk for job in queue.runnable_jobs({other.pk}, limit=4)]
+        self.assertEqual(runnable, [first])
+
+    @override_settings(SALES_ASYNC_CHECKOUT=False)
+    def test_disabled_async_checks_out_synchronously(self):
+        response = self.post_async([(self.aspirin, 1)])
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(QueuedSale.objects.exists())
+
+
+class SalesAnalyticsTests(SaleTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.aspirin = self.make_medicine('Aspirin', quantity=100, price='2.00')
+        self.insulin = self.make_medicine('Insulin', quantity=100, price='30.00')
+        Medicine.objects.filter(pk=self.insulin.pk).update(category='Diabetes')
+        self.today = timezone.localdate()
+        self.old_sale = self.sell(5, [(self.aspirin, 6), (self.insulin, 1)])
+        self.sell(2, [(self.aspirin, 4)])
+        rollups.rebuild()
+
+    def sell(self, days_ago, lines):
+        response = self.client.post('/api/sales/', self.sale_payload(lines), format='json')
+        when = timezone.now() - timedelta(days=days_ago)
+        Sale.objects.filter(pk=response.data['id']).update(date=when)
+        return response.data['id']
+
+    def top(self, query):
+        response = self.client.get(f'/api/sales/analytics/top-sellers/?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(row['medicine_name'], row['units']) for row in response.data['medicines']]
+
+    def test_top_sellers_by_units_and_revenue(self):
+        self.assertEqual(self.top('days=30'), [('Aspirin', 10), ('Insulin', 1)])
+        self.assertEqual(self.top('days=30&by=revenue'), [('Insulin', 1), ('Aspirin', 10)])
+        self.assertEqual(self.top('days=3'), [('Aspirin', 4)])
+        self.assertEqual(self.top('days=30&category=diabetes'), [('Insulin', 1)])
+
+    def test_closed_period_is_cached_and_today_is_live(self):
+        self.top('days=30')
+        with self.assertNumQueries(3):
+            # Cached closed days: the version, today's rollups and the medicine names
+            self.client.get('/api/sales/analytics/top-sellers/?days=30')
+
+        self.client.post('/api/sales/', self.sale_payload([(self.insulin, 20)]), format='json')
+        self.assertEqual(self.top('days=30'), [('Insulin', 21), ('Aspirin', 10)])
+
+    def test_changing_a_past_day_invalidates_the_cache(self):
+        self.top('days=30')
+        self.client.delete(f'/api/sales/{self.old_sale}/')
+
+        self.assertEqual(self.top('days=30'), [('Aspirin', 4)])
+
+    def test_limit_must_be_positive(self):
+        for limit in ('0', '-3', 'ten'):
+            response = self.client.get(f'/api/sales/analytics/top-sellers/?limit={limit}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, limit)
+        self.assertEqual(self.top('days=30&limit=1'), [('Aspirin', 10)])
+
+    def test_velocity(self):
+        response = self.client.get(f'/api/sales/analytics/velocity/?days=10&medicine={self.aspirin.pk}')
+
+        row, = response.data['medicines']
+        self.assertEqual(row['units_per_day'], 1.0)
+        self.assertEqual(row['current_stock'], 90)
+        self.assertEqual(row['days_of_cover'], 90.0)
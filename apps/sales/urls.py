@@ -4,14 +4,22 @@ from . import views
 urlpatterns = [
     # Sales
     path('', views.SaleListCreateAPIView.as_view(), name='sale_list_create'),
+    path('queue/<int:pk>/', views.QueuedSaleDetailAPIView.as_view(), name='queued_sale_detail'),
+    path('batch/', views.SaleBatchAPIView.as_view(), name='sale_batch'),
+    path('search/', views.SaleSearchAPIView.as_view(), name='sale_search'),
     path('<int:pk>/', views.SaleDetailAPIView.as_view(), name='sale_detail'),
     
     # Invoice PDF
     path('<int:pk>/invoice/', views.InvoicePDFAPIView.as_view(), name='sale_invoice'),
+    path('export/', views.SalesExportAPIView.as_view(), name='sales_export'),
+    path('invoices/export/', views.InvoiceExportAPIView.as_view(), name='invoice_export'),
     
     # Reports
     path('reports/daily/', views.DailySalesReportAPIView.as_view(), name='daily_sales_report'),
     path('reports/monthly/', views.MonthlySalesReportAPIView.as_view(), name='monthly_sales_report'),
+    path('reports/trend/', views.SalesTrendAPIView.as_view(), name='sales_trend_report'),
+    path('analytics/top-sellers/', views.TopSellersAPIView.as_view(), name='top_sellers'),
+    path('analytics/velocity/', views.SalesVelocityAPIView.as_view(), name='sales_velocity'),
     path('reports/expired-medicines/', views.ExpiredMedicinesAPIView.as_view(), name='expired_medicines'),
 ]
 
@@ -1,8 +1,27 @@
 """
 Invoice Generation Utilities for Pharmacy System
 """
+import hashlib
+import json
+import os
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
 from django.http import HttpResponse
-from django.template.loader import render_to_string
+from django.template.loader import get_template, render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+INVOICE_TEMPLATE = 'sales/invoice_template.html'
+
+COMPANY_INFO = {
+    'name': 'Pharmacy Yanje',
+    'address': '123 Pharmacy Street, 75001 Paris, France',
+    'phone': '+33 1 23 45 67 89',
+    'email': 'contact@pharmacy.com',
+    'siret': '123 456 789 00012'
+}
 
 
 def generate_invoice_html(sale, sale_items, company_info=None):
@@ -32,7 +51,7 @@ def generate_invoice_html(sale, sale_items, company_info=None):
         'company': company_info,
     }
     
-    html_string = render_to_string('sales/invoice_template.html', context)
+    html_string = render_to_string(INVOICE_TEMPLATE, context)
     return html_string
 
 
@@ -72,3 +91,61 @@ def get_invoice_html_response(sale, sale_items, company_info=None):
     html_string = generate_invoice_html(sale, sale_items, company_info)
     return HttpResponse(html_string)
 
+
+
+def invoice_template_mtime():
+    """Modification time of the invoice template (seconds since the epoch)"""
+    return os.path.getmtime(get_template(INVOICE_TEMPLATE).origin.name)
+
+
+def invoice_version(sale, company_info, template_mtime):
+    """
+    Content version of a rendered invoice. It changes whenever the sale is
+    saved, the template file is edited or the company details change.
+    """
+    company = json.dumps(company_info, sort_keys=True)
+    raw = f"{sale.pk}:{sale.updated_at.isoformat()}:{template_mtime}:{company}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def cached_invoice_html(sale, company_info, version):
+    """Rendered invoice HTML, rendered at most once per content version"""
+    from .models import SaleItem
+
+    key = f"invoice:{sale.pk}:{version}"
+    html_string = cache.get(key)
+    if html_string is None:
+        sale_items = SaleItem.objects.filter(sale=sale).select_related('medicine')
+        html_string = generate_invoice_html(sale, sale_items, company_info)
+        cache.set(key, html_string, getattr(settings, 'INVOICE_CACHE_TIMEOUT', None))
+    return html_string
+
+
+def conditional_invoice_response(request, sale, company_info=None, as_attachment=True):
+    """
+    Invoice response with ETag/Last-Modified validators.
+
+    Answers If-None-Match/If-Modified-Since with 304 without rendering,
+    otherwise serves the cached rendering of the current version.
+    """
+    company_info = company_info or COMPANY_INFO
+    template_mtime = invoice_template_mtime()
+    version = invoice_version(sale, company_info, template_mtime)
+    etag = f'"{version}"'
+    last_modified = max(
+        sale.updated_at,
+        datetime.fromtimestamp(template_mtime, tz=dt_timezone.utc),
+    ).timestamp()
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+    if response is None:
+        response = HttpResponse(cached_invoice_html(sale, company_info, version),
+                                content_type='text/html')
+        if as_attachment:
+            filename = f"invoice_{sale.id}_{sale.date.strftime('%Y%m%d')}.html"
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Browsers keep the copy but revalidate it on every reprint
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -1,16 +1,25 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from apps.users.permissions import IsAdminOrPharmacist
-from .models import Sale, SaleItem
-from .serializers import SaleSerializer, SaleItemSerializer
-from apps.medicines.models import Medicine
+from pharmacy_system.pagination import list_response
+from .models import Sale, DailySalesSummary, DailyPaymentSummary, DailyMedicineSales
+from . import analytics, idempotency, queue, rollups
+from .models import QueuedSale
+from .serializers import OfflineSaleSerializer, QueuedSaleSerializer, SaleSerializer
+from .checkout import checkout_batch
 from apps.inventory.models import InventoryItem
+from apps.inventory.ledger import InsufficientStock
+from django.conf import settings
 from apps.notifications.models import Notification
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum, prefetch_related_objects
 from django.utils import timezone
 from datetime import timedelta
+from decimal import Decimal, InvalidOperation
 
 
 def check_and_notify_low_stock(medicine, quantity_sold):
@@ -33,23 +42,234 @@ def check_and_notify_low_stock(medicine, quantity_sold):
             Notification.create_low_stock_notification(inventory, inventory.current_stock)
 
 
+def key_reused_response():
+    return Response(
+        {"error": f"{idempotency.HEADER} was already used for a different sale"},
+        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+    )
+
+
 class SaleListCreateAPIView(APIView):
     """GET all sales | POST new sale"""
     permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
 
     def get(self, request):
-        sales = Sale.objects.all().order_by('-date')
-        serializer = SaleSerializer(sales, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        sales = Sale.objects.prefetch_related('items__medicine').order_by('-date')
+        return list_response(request, sales, SaleSerializer, ('-date', 'id'), view=self)
 
     def post(self, request):
+        key = request.headers.get(idempotency.HEADER)
+        if key is not None:
+            if not key or len(key) > idempotency.MAX_KEY_LENGTH:
+                return Response(
+                    {"error": f"{idempotency.HEADER} must be 1 to {idempotency.MAX_KEY_LENGTH} characters"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            fingerprint = idempotency.request_fingerprint(request.data)
+            try:
+                record = idempotency.lookup(request.user, key, fingerprint)
+            except idempotency.KeyReused:
+                return key_reused_response()
+            if record is not None:
+                return idempotency.replay(record)
+
         serializer = SaleSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            run_async = getattr(settings, 'SALES_ASYNC_CHECKOUT', False) and queue.wants_async(request)
+            headers = {}
+            try:
+                with transaction.atomic():
+                    if run_async:
+                        # Checkout runs later on the process_sale_queue workers
+                        job = queue.enqueue(serializer.validated_data, request.user)
+                        data = QueuedSaleSerializer(job, context={'request': request}).data
+                        response_status = status.HTTP_202_ACCEPTED
+                        headers = {'Location': data['status_url'],
+                                   'Preference-Applied': queue.RESPOND_ASYNC}
+                    else:
+                        serializer.save()
+                        data = serializer.data
+                        response_status = status.HTTP_201_CREATED
+                    if key is not None:
+                        idempotency.store(request.user, key, fingerprint, response_status, data, headers)
+            except InsufficientStock as exc:
+                return Response(exc.as_response_data(), status=status.HTTP_409_CONFLICT)
+            except IntegrityError:
+                # A concurrent retry with the same key committed first and
+                # this sale was rolled back: answer with the stored response
+                try:
+                    record = key is not None and idempotency.lookup(request.user, key, fingerprint)
+                except idempotency.KeyReused:
+                    return key_reused_response()
+                if not record:
+                    raise
+                return idempotency.replay(record)
+            return Response(data, status=response_status, headers=headers)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class QueuedSaleDetailAPIView(APIView):
+    """GET the status of an asynchronous checkout"""
+    permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
+
+    def get(self, request, pk):
+        jobs = QueuedSale.objects.select_related('sale')
+        if not request.user.is_admin:
+            jobs = jobs.filter(user=request.user)
+        job = get_object_or_404(jobs, pk=pk)
+        if job.sale is not None:
+            prefetch_related_objects([job.sale], 'items__medicine')
+        serializer = QueuedSaleSerializer(job, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+def recorded_sales(client_ids):
+    """Sales already stored under the given client ids, by client id"""
+    client_ids = list(client_ids)
+    if not client_ids:
+        return {}
+    sales = Sale.objects.filter(client_id__in=client_ids).prefetch_related('items__medicine')
+    return {sale.client_id: sale for sale in sales}
+
+
+class SaleBatchAPIView(APIView):
+    """
+    POST a list of sales (offline terminal sync), with a result per sale.
+
+    A sale carrying a ``client_id`` that is already recorded is not sold
+    again: its result is the stored sale, with status 200 and ``replayed``,
+    so a terminal can safely retry a sync that timed out.
+    """
+    permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
+
+    def post(self, request):
+        sales_data = request.data.get('sales') if isinstance(request.data, dict) else request.data
+        max_size = getattr(settings, 'SALE_BATCH_MAX_SIZE', 1000)
+        if not isinstance(sales_data, list) or not 0 < len(sales_data) <= max_size:
+            return Response({"error": f"Expected a list of 1 to {max_size} sales"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            chunk_size = int(request.query_params.get(
+                'chunk_size', getattr(settings, 'SALE_BATCH_CHUNK_SIZE', 100)
+            ))
+        except ValueError:
+            chunk_size = 0
+        if chunk_size < 1:
+            return Response({"error": "chunk_size must be a positive integer"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(sales_data)
+        baskets, positions = [], []
+        first_index = {}
+        duplicates = {}
+        client_ids = {}
+        for index, sale_data in enumerate(sales_data):
+            serializer = OfflineSaleSerializer(data=sale_data)
+            if serializer.is_valid():
+                validated_data = dict(serializer.validated_data)
+                client_id = validated_data.get('client_id')
+                if client_id in first_index:
+                    # Sent twice in the same batch: answered like the first
+                    duplicates[index] = first_index[client_id]
+                    continue
+                if client_id is not None:
+                    first_index[client_id] = index
+                    client_ids[index] = client_id
+                baskets.append((validated_data, validated_data.pop('items_data', [])))
+                positions.append(index)
+            else:
+                results[index] = {"index": index, "status": status.HTTP_400_BAD_REQUEST,
+                                  "errors": serializer.errors}
+
+        # Sales recorded by an earlier sync of the batch are replayed, not sold again
+        recorded = recorded_sales(first_index)
+        pending = [
+            (index, basket) for index, basket in zip(positions, baskets)
+            if client_ids.get(index) not in recorded
+        ]
+        outcomes = dict(zip([index for index, basket in pending],
+                            checkout_batch([basket for index, basket in pending], chunk_size)))
+        for index, outcome in outcomes.items():
+            if isinstance(outcome, IntegrityError):
+                # A concurrent sync stored the same sale meanwhile
+                recorded.update(recorded_sales([client_ids[index]]))
+                if client_ids[index] not in recorded:
+                    raise outcome
+
+        for index in positions:
+            client_id = client_ids.get(index)
+            outcome = outcomes.get(index)
+            if client_id in recorded and not isinstance(outcome, Sale):
+                results[index] = {"index": index, "status": status.HTTP_200_OK, "replayed": True,
+                                  "sale": SaleSerializer(recorded[client_id]).data}
+            elif isinstance(outcome, InsufficientStock):
+                results[index] = {"index": index, "status": status.HTTP_409_CONFLICT,
+                                  **outcome.as_response_data()}
+            elif isinstance(outcome, Exception):
+                results[index] = {"index": index, "status": status.HTTP_400_BAD_REQUEST,
+                                  "errors": outcome.detail}
+            else:
+                results[index] = {"index": index, "status": status.HTTP_201_CREATED,
+                                  "sale": SaleSerializer(outcome).data}
+        for index, first in duplicates.items():
+            results[index] = dict(results[first], index=index)
+            if results[index]['status'] == status.HTTP_201_CREATED:
+                results[index].update(status=status.HTTP_200_OK, replayed=True)
+
+        created = sum(1 for result in results if result['status'] == status.HTTP_201_CREATED)
+        replayed = sum(1 for result in results if result.get('replayed'))
+        return Response({
+            "created": created,
+            "replayed": replayed,
+            "rejected": len(results) - created - replayed,
+            "results": results,
+        }, status=status.HTTP_200_OK)
+
+
+def finite_decimal(value):
+    """Decimal of ``value``; NaN and infinities raise ValueError"""
+    number = Decimal(value)
+    if not number.is_finite():
+        raise ValueError(value)
+    return number
+
+
+class SaleSearchAPIView(APIView):
+    """GET sales filtered by customer, date range, amount range, payment method or id"""
+    permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
+
+    def get(self, request):
+        from datetime import datetime
+        params = request.query_params
+        sales = Sale.objects.prefetch_related('items__medicine')
+        try:
+            if params.get('id'):
+                sales = sales.filter(pk=int(params['id']))
+            customer = params.get('customer', '').strip()
+            if customer:
+                # Prefix matches can use the UPPER(customer_name) index
+                lookup = 'icontains' if params.get('match') == 'contains' else 'istartswith'
+                sales = sales.filter(**{f'customer_name__{lookup}': customer})
+            if params.get('payment_method'):
+                sales = sales.filter(payment_method=params['payment_method'])
+            if params.get('date_from'):
+                date_from = datetime.strptime(params['date_from'], '%Y-%m-%d').date()
+                sales = sales.filter(date__gte=rollups.day_start(date_from))
+            if params.get('date_to'):
+                date_to = datetime.strptime(params['date_to'], '%Y-%m-%d').date()
+                sales = sales.filter(date__lt=rollups.day_start(date_to + timedelta(days=1)))
+            if params.get('min_amount'):
+                sales = sales.filter(total_amount__gte=finite_decimal(params['min_amount']))
+            if params.get('max_amount'):
+                sales = sales.filter(total_amount__lte=finite_decimal(params['max_amount']))
+        except (ValueError, InvalidOperation):
+            return Response(
+                {"error": "id must be an integer, dates YYYY-MM-DD and amounts decimal numbers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return list_response(request, sales, SaleSerializer, ('-date', 'id'), view=self, opt_in=False)
+
+
 class SaleDetailAPIView(APIView):
     """GET, PUT, DELETE for a single sale"""
     permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
@@ -69,10 +289,31 @@ class SaleDetailAPIView(APIView):
 
     def delete(self, request, pk):
         sale = get_object_or_404(Sale, pk=pk)
-        sale.delete()
+        with transaction.atomic():
+            rollups.remove_sale(sale, list(sale.items.all()))
+            sale.delete()
         return Response({"message": "Sale deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
 
+def sales_totals(rows):
+    """Sum grouped report rows into period totals (exact decimals)"""
+    total_sales = sum(row['count'] for row in rows)
+    total_amount = sum((row['amount'] for row in rows), Decimal('0'))
+    total_discount = sum((row['discount'] for row in rows), Decimal('0'))
+    return total_sales, total_amount, total_discount
+
+
+def rollup_rows(summaries, *fields):
+    """Report rows (count, net amount, discount) read from a rollup table"""
+    return list(
+        summaries.exclude(sale_count=0).values(*fields).annotate(
+            count=F('sale_count'),
+            amount=F('total_amount') - F('total_discount'),
+            discount=F('total_discount'),
+        )
+    )
+
+
 class DailySalesReportAPIView(APIView):
     """GET daily sales report"""
     permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
@@ -85,26 +326,18 @@ class DailySalesReportAPIView(APIView):
         except ValueError:
             report_date = timezone.now().date()
         
-        start_of_day = timezone.make_aware(
-            datetime.combine(report_date, timezone.now().time().min)
-        )
-        end_of_day = timezone.make_aware(
-            datetime.combine(report_date, timezone.now().time().max)
-        )
-        
-        sales = Sale.objects.filter(date__range=[start_of_day, end_of_day])
+        # Read from the daily rollups; period totals are the sum of the rows
+        rows = rollup_rows(DailyPaymentSummary.objects.filter(date=report_date), 'payment_method')
+        total_sales, total_amount, total_discount = sales_totals(rows)
         
-        total_sales = sales.count()
-        total_amount = sum(sale.final_amount for sale in sales)
-        total_discount = sum(sale.discount for sale in sales)
-        
-        payment_methods = {}
-        for sale in sales:
-            method = sale.get_payment_method_display()
-            if method not in payment_methods:
-                payment_methods[method] = {'count': 0, 'amount': 0}
-            payment_methods[method]['count'] += 1
-            payment_methods[method]['amount'] += float(sale.final_amount)
+        method_names = dict(Sale.PAYMENT_METHODS)
+        payment_methods = {
+            method_names.get(row['payment_method'], row['payment_method']): {
+                'count': row['count'],
+                'amount': row['amount'],
+            }
+            for row in rows
+        }
         
         return Response({
             "date": report_date.isoformat(),
@@ -130,19 +363,16 @@ class MonthlySalesReportAPIView(APIView):
         else:
             end_of_month = date(year, month + 1, 1)
         
-        sales = Sale.objects.filter(date__date__gte=start_of_month, date__date__lt=end_of_month)
-        
-        total_sales = sales.count()
-        total_amount = sum(sale.final_amount for sale in sales)
-        total_discount = sum(sale.discount for sale in sales)
+        rows = rollup_rows(
+            DailySalesSummary.objects.filter(date__gte=start_of_month, date__lt=end_of_month),
+            'date',
+        )
+        total_sales, total_amount, total_discount = sales_totals(rows)
         
-        daily_sales = {}
-        for sale in sales:
-            day = sale.date.date().isoformat()
-            if day not in daily_sales:
-                daily_sales[day] = {'count': 0, 'amount': 0}
-            daily_sales[day]['count'] += 1
-            daily_sales[day]['amount'] += float(sale.final_amount)
+        daily_sales = {
+            row['date'].isoformat(): {'count': row['count'], 'amount': row['amount']}
+            for row in rows
+        }
         
         return Response({
             "month": f"{year}-{month:02d}",
@@ -153,32 +383,179 @@ class MonthlySalesReportAPIView(APIView):
         }, status=status.HTTP_200_OK)
 
 
+class SalesTrendAPIView(APIView):
+    """GET daily sales and top medicines over a date range"""
+    permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
+
+    def get(self, request):
+        from datetime import datetime
+        try:
+            end = datetime.strptime(
+                request.query_params.get('end', timezone.localdate().isoformat()), '%Y-%m-%d'
+            ).date()
+            start = datetime.strptime(
+                request.query_params.get('start', (end - timedelta(days=29)).isoformat()), '%Y-%m-%d'
+            ).date()
+            limit = int(request.query_params.get('limit', 10))
+            if limit < 1:
+                raise ValueError(limit)
+        except ValueError:
+            return Response({"error": "Dates must be formatted as YYYY-MM-DD and limit a positive integer"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Rollups keep this O(days) however many sales the range holds
+        days = rollup_rows(DailySalesSummary.objects.filter(date__range=(start, end)), 'date')
+        total_sales, total_amount, total_discount = sales_totals(days)
+        top_medicines = (
+            DailyMedicineSales.objects
+            .filter(date__range=(start, end))
+            .values('medicine', 'medicine__name')
+            .annotate(units=Sum('quantity'), amount=Sum('revenue'))
+            .order_by('-units', 'medicine')[:limit]
+        )
+
+        return Response({
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "total_sales": total_sales,
+            "total_amount": total_amount,
+            "total_discount": total_discount,
+            "days": [
+                {"date": row['date'].isoformat(), "count": row['count'], "amount": row['amount']}
+                for row in days
+            ],
+            "top_medicines": [
+                {
+                    "medicine": row['medicine'],
+                    "medicine_name": row['medicine__name'],
+                    "quantity": row['units'],
+                    "revenue": row['amount'],
+                }
+                for row in top_medicines
+            ],
+        }, status=status.HTTP_200_OK)
+
+
+MAX_ANALYTICS_LIMIT = 500
+
+
+def analytics_params(params):
+    """
+    Period and filters of an analytics request: ``start``/``end`` dates or
+    the last ``days`` days (30 by default), ``category``, ``supplier`` and
+    ``limit`` (capped at MAX_ANALYTICS_LIMIT). Returns a dict, or an error
+    Response.
+    """
+    from datetime import datetime
+    try:
+        if 'start' in params or 'end' in params:
+            end = datetime.strptime(params.get('end', timezone.localdate().isoformat()), '%Y-%m-%d').date()
+            start = datetime.strptime(params['start'], '%Y-%m-%d').date()
+        else:
+            days = int(params.get('days', 30))
+            if days < 1:
+                raise ValueError(days)
+            end = timezone.localdate()
+            start = end - timedelta(days=days - 1)
+        limit = int(params.get('limit', 50))
+        if limit < 1:
+            raise ValueError(limit)
+        supplier = int(params['supplier']) if params.get('supplier') else None
+    except (KeyError, ValueError):
+        return Response({"error": "Use start and end (YYYY-MM-DD) or a positive number of days; "
+                                  "limit must be a positive integer and supplier an integer"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if start > end:
+        return Response({"error": "start must not be after end"}, status=status.HTTP_400_BAD_REQUEST)
+    return {
+        "start": start,
+        "end": end,
+        "limit": min(limit, MAX_ANALYTICS_LIMIT),
+        "category": params.get('category') or None,
+        "supplier": supplier,
+    }
+
+
+class TopSellersAPIView(APIView):
+    """GET best selling medicines over a period, by units or revenue"""
+    permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
+
+    def get(self, request):
+        options = analytics_params(request.query_params)
+        if isinstance(options, Response):
+            return options
+        by = request.query_params.get('by', 'units')
+        if by not in ('units', 'revenue'):
+            return Response({"error": "by must be units or revenue"}, status=status.HTTP_400_BAD_REQUEST)
+
+        medicines = analytics.top_sellers(
+            options['start'], options['end'], by=by, limit=options['limit'],
+            category=options['category'], supplier=options['supplier'],
+        )
+        return Response({
+            "start": options['start'].isoformat(),
+            "end": options['end'].isoformat(),
+            "by": by,
+            "medicines": medicines,
+        }, status=status.HTTP_200_OK)
+
+
+class SalesVelocityAPIView(APIView):
+    """GET units sold per day per medicine over a period, with days of stock left"""
+    permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
+
+    def get(self, request):
+        options = analytics_params(request.query_params)
+        if isinstance(options, Response):
+            return options
+        medicine_ids = None
+        if request.query_params.get('medicine'):
+            try:
+                medicine_ids = [int(value) for value in request.query_params['medicine'].split(',')]
+            except ValueError:
+                return Response({"error": "medicine must be a comma separated list of ids"},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        medicines = analytics.velocity(
+            options['start'], options['end'], limit=options['limit'],
+            category=options['category'], supplier=options['supplier'], medicine_ids=medicine_ids,
+        )
+        return Response({
+            "start": options['start'].isoformat(),
+            "end": options['end'].isoformat(),
+            "days": (options['end'] - options['start']).days + 1,
+            "medicines": medicines,
+        }, status=status.HTTP_200_OK)
+
+
 class ExpiredMedicinesAPIView(APIView):
-    """GET expired medicines list"""
+    """GET expired stock, one entry per expired lot still on the shelf"""
     permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
 
     def get(self, request):
         from django.utils import timezone
-        from apps.medicines.models import Medicine
-        
-        expired_medicines = Medicine.objects.filter(
-            expiration_date__lt=timezone.now().date()
-        )
-        
+        from apps.inventory.models import StockLot
+
+        expired_lots = StockLot.objects.filter(
+            expiration_date__lt=timezone.localdate(), quantity__gt=0
+        ).select_related('medicine__supplier')
+
         expired_list = []
-        for med in expired_medicines:
+        for lot in expired_lots:
+            med = lot.medicine
             expired_list.append({
                 "id": med.id,
+                "lot": lot.id,
                 "name": med.name,
                 "category": med.category,
-                "expiration_date": med.expiration_date,
-                "batch_number": med.batch_number,
-                "quantity": med.quantity,
+                "expiration_date": lot.expiration_date,
+                "batch_number": lot.lot_number,
+                "quantity": lot.quantity,
                 "supplier": med.supplier.name if med.supplier else None
             })
         
         return Response({
-            "count": expired_medicines.count(),
+            "count": len(expired_list),
             "expired_medicines": expired_list
         }, status=status.HTTP_200_OK)
 
@@ -194,23 +571,85 @@ class InvoicePDFAPIView(APIView):
         Query params:
         - format: 'pdf' (default) or 'html' for preview
         """
-        from .utils import render_invoice_to_pdf, get_invoice_html_response
+        from .utils import COMPANY_INFO, conditional_invoice_response
         
         sale = get_object_or_404(Sale, pk=pk)
-        sale_items = SaleItem.objects.filter(sale=sale).select_related('medicine')
         
         format_type = request.query_params.get('format', 'pdf')
         
-        company_info = {
-            'name': 'Pharmacy Yanje',
-            'address': '123 Pharmacy Street, 75001 Paris, France',
-            'phone': '+33 1 23 45 67 89',
-            'email': 'contact@pharmacy.com',
-            'siret': '123 456 789 00012'
-        }
-        
-        if format_type == 'html':
-            return get_invoice_html_response(sale, sale_items, company_info)
-        else:
-            return render_invoice_to_pdf(sale, sale_items, company_info)
+        # Rendered once per sale version; reprints are served from the cache
+        # or answered with 304 Not Modified
+        return conditional_invoice_response(
+            request, sale, COMPANY_INFO, as_attachment=format_type != 'html'
+        )
+
+
+def export_range(params):
+    """Validated (start, end) dates of an export request, or an error Response"""
+    from datetime import datetime
+    try:
+        start = datetime.strptime(params['start'], '%Y-%m-%d').date()
+        end = datetime.strptime(params['end'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return Response({"error": "start and end are required, formatted as YYYY-MM-DD"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if start > end:
+        return Response({"error": "start must not be after end"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    return start, end
+
+
+class InvoiceExportAPIView(APIView):
+    """GET a ZIP archive of the invoices of a date range"""
+    permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
+
+    def get(self, request):
+        from .exports import iter_invoice_zip, sales_between
+
+        date_range = export_range(request.query_params)
+        if isinstance(date_range, Response):
+            return date_range
+        start, end = date_range
+
+        # The archive is compressed and sent while the invoices are rendered
+        response = StreamingHttpResponse(
+            iter_invoice_zip(sales_between(start, end)), content_type='application/zip'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="invoices_{start.isoformat()}_{end.isoformat()}.zip"'
+        )
+        return response
+
+
+class SalesExportAPIView(APIView):
+    """GET the line items of a date range as CSV (default) or XLSX"""
+    permission_classes = [IsAuthenticated, IsAdminOrPharmacist]
+
+    def get(self, request):
+        import tempfile
+        from .exports import iter_sales_csv, sales_export_rows, write_sales_xlsx
+
+        date_range = export_range(request.query_params)
+        if isinstance(date_range, Response):
+            return date_range
+        start, end = date_range
+        file_type = request.query_params.get('type', 'csv')
+        filename = f"sales_{start.isoformat()}_{end.isoformat()}.{file_type}"
+        rows = sales_export_rows(start, end)
 
+        if file_type == 'csv':
+            response = StreamingHttpResponse(iter_sales_csv(rows), content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            return response
+        if file_type == 'xlsx':
+            # The workbook is spooled to a temporary file and streamed from there
+            workbook = tempfile.TemporaryFile()
+            write_sales_xlsx(rows, workbook)
+            workbook.seek(0)
+            return FileResponse(
+                workbook,
+                as_attachment=True,
+                filename=filename,
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            )
+        return Response({"error": "type must be csv or xlsx"}, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.suppliers import purchasing
+
+
+class Command(BaseCommand):
+    help = (
+        "Create one pending purchase order per supplier for every medicine at or "
+        "below its reorder level that is not already on an open order"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--supplier', type=int, help="Only order from this supplier id")
+        parser.add_argument('--order-up-to', type=int, default=purchasing.DEFAULT_ORDER_UP_TO,
+                            help="Restock to this multiple of the reorder level")
+        parser.add_argument('--dry-run', action='store_true', help="Show the orders without creating them")
+
+    def handle(self, *args, **options):
+        if options['order_up_to'] < 1:
+            raise CommandError("--order-up-to must be at least 1")
+
+        if options['dry_run']:
+            plan, unassigned = purchasing.plan_purchase_orders(options['supplier'], options['order_up_to'])
+            for supplier_id, lines in plan.items():
+                self.stdout.write(f"Supplier {supplier_id}: " + ", ".join(
+                    f"{line['medicine_name']} x {line['quantity']}" for line in lines
+                ))
+            created = len(plan)
+        else:
+            orders, unassigned = purchasing.generate_purchase_orders(options['supplier'], options['order_up_to'])
+            for order in orders:
+                self.stdout.write(f"Purchase order #{order.pk} for supplier {order.supplier_id}: "
+                                  f"{len(order.items.all())} lines, {order.total_amount}")
+            created = len(orders)
+
+        for line in unassigned:
+            self.stdout.write(self.style.WARNING(
+                f"{line['medicine_name']} is low on stock but has no active supplier"
+            ))
+        verb = "Would create" if options['dry_run'] else "Created"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {created} purchase orders"))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "suppliers",
+            "0003_alter_supplier_address_alter_supplier_contact_info_and_more",
+        ),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(
+                fields=["-order_date", "id"], name="suppliers_p_order_d_13948b_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 11:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Trim, Upper
+
+
+def link_medicines(apps, schema_editor):
+    """Resolve the free-text names of existing lines, case-insensitively"""
+    Medicine = apps.get_model("medicines", "Medicine")
+    PurchaseOrderItem = apps.get_model("suppliers", "PurchaseOrderItem")
+    matches = (
+        Medicine.objects.annotate(upper_name=Upper("name"))
+        .filter(upper_name=Upper(Trim(OuterRef("medicine_name"))))
+        .order_by("id")
+        .values("id")[:1]
+    )
+    PurchaseOrderItem.objects.filter(medicine__isnull=True).update(medicine=Subquery(matches))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("medicines", "0003_medicine_medicine_name_upper_idx"),
+        ("suppliers", "0004_purchaseorder_suppliers_p_order_d_13948b_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="purchaseorderitem",
+            name="medicine",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="purchase_order_items",
+                to="medicines.medicine",
+            ),
+        ),
+        migrations.RunPython(link_medicines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("suppliers", "0005_purchaseorderitem_medicine"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(
+                fields=["status", "-order_date", "id"],
+                name="suppliers_p_status_bc7f0b_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="purchaseorder",
+            index=models.Index(
+                fields=["supplier", "-order_date", "id"],
+                name="suppliers_p_supplie_d9156d_idx",
+            ),
+        ),
+    ]
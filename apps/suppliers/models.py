@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Coalesce
 
 # Create your models here.
 class Supplier(models.Model):
@@ -14,6 +15,45 @@ class Supplier(models.Model):
         return self.name
 
 
+def line_total():
+    """quantity x unit_price of a purchase order line, computed by the database"""
+    return models.ExpressionWrapper(
+        models.F('quantity') * models.F('unit_price'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+class PurchaseOrderQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Annotate the sum and count of each order's lines, plus its supplier
+        and lines annotated with their subtotal, so listings need no
+        per-order queries.
+        """
+        lines = PurchaseOrderItem.objects.filter(purchase_order=models.OuterRef('pk')).order_by()
+        return self.select_related('supplier').annotate(
+            lines_total=Coalesce(
+                models.Subquery(
+                    lines.values('purchase_order').annotate(total=models.Sum(line_total())).values('total'),
+                    output_field=models.DecimalField(max_digits=12, decimal_places=2),
+                ),
+                models.Value(0, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+            ),
+            lines_count=Coalesce(
+                models.Subquery(
+                    lines.values('purchase_order').annotate(count=models.Count('id')).values('count'),
+                    output_field=models.IntegerField(),
+                ),
+                models.Value(0),
+            ),
+        ).prefetch_related(
+            models.Prefetch(
+                'items',
+                queryset=PurchaseOrderItem.objects.annotate(line_total=line_total()).order_by('id'),
+            )
+        )
+
+
 class PurchaseOrder(models.Model):
     STATUS_CHOICES = [
         ('pending', 'En attente'),
@@ -30,12 +70,38 @@ class PurchaseOrder(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     notes = models.TextField(blank=True, null=True)
 
+    objects = PurchaseOrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-order_date', 'id']),
+            models.Index(fields=['status', '-order_date', 'id']),
+            models.Index(fields=['supplier', '-order_date', 'id']),
+        ]
+
     def __str__(self):
         return f"Commande #{self.id} - {self.supplier.name}"
 
+    @property
+    def items_total(self):
+        """Sum of the line subtotals (annotated by with_totals() when listed)"""
+        if hasattr(self, 'lines_total'):
+            return self.lines_total
+        return sum((item.subtotal for item in self.items.all()), 0)
+
+    @property
+    def item_count(self):
+        if hasattr(self, 'lines_count'):
+            return self.lines_count
+        return len(self.items.all())
+
 
 class PurchaseOrderItem(models.Model):
     purchase_order = models.ForeignKey(PurchaseOrder, related_name='items', on_delete=models.CASCADE)
+    medicine = models.ForeignKey(
+        'medicines.Medicine', related_name='purchase_order_items', on_delete=models.SET_NULL,
+        null=True, blank=True,
+    )
     medicine_name = models.CharField(max_length=255)
     quantity = models.PositiveIntegerField()
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
@@ -43,3 +109,9 @@ class PurchaseOrderItem(models.Model):
     def __str__(self):
         return f"{self.medicine_name} x {self.quantity}"
 
+    @property
+    def subtotal(self):
+        if hasattr(self, 'line_total'):
+            return self.line_total
+        return self.quantity * self.unit_price
+
@@ -0,0 +1,207 @@
+"""
+Purchase order generation from low stock.
+
+generate_purchase_orders() finds every inventory item at or below its
+reorder level with one query, groups the lines by the medicine's supplier,
+drops medicines already on an open order of that supplier, and writes one
+pending (draft) purchase order per supplier with two bulk inserts.
+
+Each line orders enough to bring the stock back up to ``order_up_to``
+times the reorder level.
+
+receive_purchase_order() books a delivery: every line becomes a receipt in
+the stock movement ledger, applied with one set-based UPDATE per balance
+table, in the same transaction as the status change.
+"""
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Trim, Upper
+from django.utils import timezone
+
+from apps.inventory.ledger import record_movements
+from apps.inventory.models import InventoryItem, StockMovement
+from apps.medicines.models import Medicine
+from .models import PurchaseOrder, PurchaseOrderItem, Supplier
+
+OPEN_STATUSES = ('pending', 'approved', 'ordered')
+
+RECEIVABLE_STATUSES = OPEN_STATUSES
+
+DEFAULT_ORDER_UP_TO = 2
+
+
+class NotReceivable(Exception):
+    """Raised when a purchase order is not open (already received or cancelled)"""
+
+
+class UnresolvedLines(Exception):
+    """Raised when purchase order lines do not match any medicine"""
+
+    def __init__(self, names):
+        self.names = names
+        super().__init__(f"Unknown medicines: {', '.join(names)}")
+
+
+def order_quantity(current_stock, reorder_level, order_up_to=DEFAULT_ORDER_UP_TO):
+    """Units to order to bring stock back to ``order_up_to`` x the reorder level"""
+    return max(reorder_level * order_up_to - current_stock, 1)
+
+
+def low_stock_lines(supplier_id=None):
+    """Inventory rows at or below their reorder level, with medicine and supplier"""
+    rows = InventoryItem.objects.filter(current_stock__lte=F('reorder_level'))
+    if supplier_id is not None:
+        rows = rows.filter(medicine__supplier_id=supplier_id)
+    return rows.order_by('medicine__supplier_id', 'medicine__name').values(
+        'current_stock', 'reorder_level', 'medicine_id', 'medicine__name', 'medicine__price',
+        'medicine__supplier_id', 'medicine__supplier__is_active',
+    )
+
+
+def open_order_lines(supplier_ids):
+    """
+    (supplier id, medicine id) and (supplier id, medicine name) pairs already
+    on an open purchase order; lines entered by name may not be linked yet.
+    """
+    pairs = set()
+    rows = (
+        PurchaseOrderItem.objects
+        .filter(purchase_order__status__in=OPEN_STATUSES,
+                purchase_order__supplier_id__in=list(supplier_ids))
+        .values_list('purchase_order__supplier_id', 'medicine_id', 'medicine_name')
+    )
+    for supplier_id, medicine_id, medicine_name in rows:
+        pairs.add((supplier_id, medicine_id))
+        pairs.add((supplier_id, medicine_name))
+    return pairs
+
+
+def plan_purchase_orders(supplier_id=None, order_up_to=DEFAULT_ORDER_UP_TO):
+    """
+    Lines to order per supplier.
+
+    Returns:
+        (dict of supplier id -> list of line dicts, list of medicines skipped
+        because they have no active supplier)
+    """
+    lines = list(low_stock_lines(supplier_id))
+    already_ordered = open_order_lines({line['medicine__supplier_id'] for line in lines
+                                        if line['medicine__supplier_id']})
+    plan, unassigned = {}, []
+    for line in lines:
+        supplier = line['medicine__supplier_id']
+        if supplier is None or not line['medicine__supplier__is_active']:
+            unassigned.append({"medicine": line['medicine_id'], "medicine_name": line['medicine__name']})
+            continue
+        if ((supplier, line['medicine_id']) in already_ordered
+                or (supplier, line['medicine__name']) in already_ordered):
+            continue
+        plan.setdefault(supplier, []).append({
+            "medicine": line['medicine_id'],
+            "medicine_name": line['medicine__name'],
+            "quantity": order_quantity(line['current_stock'], line['reorder_level'], order_up_to),
+            "unit_price": line['medicine__price'],
+        })
+    return plan, unassigned
+
+
+def generate_purchase_orders(supplier_id=None, order_up_to=DEFAULT_ORDER_UP_TO):
+    """
+    Create one pending purchase order per supplier for its low stock.
+
+    Returns:
+        (list of created PurchaseOrder with their items prefetched, list of
+        medicines skipped because they have no active supplier)
+    """
+    with transaction.atomic():
+        plan, unassigned = plan_purchase_orders(supplier_id, order_up_to)
+        suppliers = Supplier.objects.in_bulk(list(plan))
+        note = f"Generated from low stock on {timezone.localdate().isoformat()}"
+        orders = [
+            PurchaseOrder(
+                supplier=suppliers[supplier],
+                status='pending',
+                total_amount=sum(line['quantity'] * line['unit_price'] for line in lines),
+                notes=note,
+            )
+            for supplier, lines in plan.items()
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            PurchaseOrder.objects.bulk_create(orders)
+        else:
+            for order in orders:
+                order.save()
+
+        items_by_order = {
+            order.pk: [
+                PurchaseOrderItem(
+                    purchase_order=order,
+                    medicine_id=line['medicine'],
+                    medicine_name=line['medicine_name'],
+                    quantity=line['quantity'],
+                    unit_price=line['unit_price'],
+                )
+                for line in lines
+            ]
+            for order, lines in zip(orders, plan.values())
+        }
+        PurchaseOrderItem.objects.bulk_create(
+            [item for items in items_by_order.values() for item in items]
+        )
+
+    for order in orders:
+        # Cache the items for the response without querying them back
+        order._prefetched_objects_cache = {'items': items_by_order[order.pk]}
+    return orders, unassigned
+
+
+def link_medicines(items):
+    """
+    Link lines entered by name only to the medicine of the same name
+    (case-insensitive, served by the Upper(name) index), in one UPDATE.
+    """
+    matches = (
+        Medicine.objects.annotate(upper_name=Upper('name'))
+        .filter(upper_name=Upper(Trim(OuterRef('medicine_name'))))
+        .order_by('id')
+        .values('id')[:1]
+    )
+    return items.filter(medicine__isnull=True).update(medicine=Subquery(matches))
+
+
+def receive_purchase_order(purchase_order, user=None):
+    """
+    Mark an open purchase order as received and add every line to stock,
+    atomically.
+
+    Raises:
+        NotReceivable: if the order was already received or cancelled
+        UnresolvedLines: if a line matches no medicine; nothing is written
+    """
+    with transaction.atomic():
+        # Conditional update: a second receipt of the same order matches nothing
+        received = PurchaseOrder.objects.filter(
+            pk=purchase_order.pk, status__in=RECEIVABLE_STATUSES
+        ).update(status='received')
+        if not received:
+            raise NotReceivable(f"Purchase order #{purchase_order.pk} is not open.")
+
+        items = PurchaseOrderItem.objects.filter(purchase_order=purchase_order)
+        link_medicines(items)
+        lines = list(items.values_list('medicine_id', 'medicine_name', 'quantity'))
+        unresolved = [name for medicine_id, name, quantity in lines if medicine_id is None]
+        if unresolved:
+            raise UnresolvedLines(unresolved)
+
+        record_movements(
+            StockMovement(
+                medicine_id=medicine_id,
+                movement_type='receipt',
+                quantity=quantity,
+                reference=f'purchase_order:{purchase_order.pk}',
+                user=user,
+            )
+            for medicine_id, medicine_name, quantity in lines if quantity
+        )
+    purchase_order.status = 'received'
+    return purchase_order
@@ -11,15 +11,26 @@ class PurchaseOrderItemSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = PurchaseOrderItem
-        fields = ['id', 'medicine_name', 'quantity', 'unit_price', 'subtotal']
+        fields = ['id', 'medicine', 'medicine_name', 'quantity', 'unit_price', 'subtotal']
 
 class PurchaseOrderSerializer(serializers.ModelSerializer):
     items = PurchaseOrderItemSerializer(many=True, read_only=True)
     supplier_name = serializers.CharField(source='supplier.name', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
-    
+    items_total = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
+    item_count = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = PurchaseOrder
         fields = ['id', 'supplier', 'supplier_name', 'order_date', 'expected_delivery', 
-                  'status', 'status_display', 'total_amount', 'notes', 'items']
+                  'status', 'status_display', 'total_amount', 'items_total', 'item_count', 'notes', 'items']
+
 
+    def validate_status(self, value):
+        """Orders are only received (and stocked) through the receive action"""
+        current = self.instance.status if self.instance is not None else None
+        if value == 'received' and current != 'received':
+            raise serializers.ValidationError("Use the receive action to book the delivery of an order.")
+        if current == 'received' and value != 'received':
+            raise serializers.ValidationError("A received order cannot change status.")
+        return value
@@ -1,3 +1,198 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.inventory.models import InventoryItem, StockMovement
+from apps.medicines.models import Medicine
+from apps.users.models import CustomUser
+from .models import PurchaseOrder, PurchaseOrderItem, Supplier
+
+
+class PurchaseOrderGenerationTests(APITestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='secret-pass', role='admin')
+        self.client.force_authenticate(self.admin)
+        self.acme = Supplier.objects.create(name='Acme')
+        self.globex = Supplier.objects.create(name='Globex')
+
+    def add_medicine(self, name, supplier, stock, reorder_level, price='2.00'):
+        medicine = Medicine.objects.create(
+            name=name, category='General', price=Decimal(price), quantity=stock,
+            expiration_date=date.today() + timedelta(days=365), supplier=supplier,
+        )
+        InventoryItem.objects.create(medicine=medicine, current_stock=stock, reorder_level=reorder_level)
+        return medicine
+
+    def test_one_order_per_supplier_for_low_stock(self):
+        self.add_medicine('Aspirin', self.acme, stock=3, reorder_level=10)
+        self.add_medicine('Ibuprofen', self.acme, stock=10, reorder_level=10, price='1.50')
+        self.add_medicine('Paracetamol', self.acme, stock=50, reorder_level=10)
+        self.add_medicine('Insulin', self.globex, stock=0, reorder_level=5)
+        self.add_medicine('Orphan', None, stock=1, reorder_level=5)
+
+        with self.assertNumQueries(7):
+            response = self.client.post('/api/suppliers/purchase-orders/generate/', {}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([line['medicine_name'] for line in response.data['without_supplier']], ['Orphan'])
+        acme = PurchaseOrder.objects.get(supplier=self.acme)
+        self.assertEqual(acme.status, 'pending')
+        self.assertEqual(
+            sorted(acme.items.values_list('medicine_name', 'quantity')),
+            [('Aspirin', 17), ('Ibuprofen', 10)],
+        )
+        self.assertEqual(acme.total_amount, Decimal('49.00'))
+        self.assertEqual(PurchaseOrder.objects.get(supplier=self.globex).items.get().quantity, 10)
+        self.assertEqual(response.data['purchase_orders'][1]['items'][0]['medicine'],
+                         Medicine.objects.get(name='Insulin').pk)
+
+    def test_skips_medicines_already_on_open_orders(self):
+        self.add_medicine('Aspirin', self.acme, stock=3, reorder_level=10)
+        self.client.post('/api/suppliers/purchase-orders/generate/', {}, format='json')
+
+        response = self.client.post('/api/suppliers/purchase-orders/generate/', {}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 0)
+        PurchaseOrder.objects.update(status='received')
+        response = self.client.post('/api/suppliers/purchase-orders/generate/', {}, format='json')
+        self.assertEqual(response.data['created'], 1)
+
+    def test_dry_run_writes_nothing(self):
+        self.add_medicine('Aspirin', self.acme, stock=3, reorder_level=10)
+
+        response = self.client.post('/api/suppliers/purchase-orders/generate/',
+                                    {'dry_run': True, 'order_up_to': 3}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['purchase_orders'][0]['items'][0]['quantity'], 27)
+        self.assertFalse(PurchaseOrderItem.objects.exists())
+
+
+class PurchaseOrderReceiptTests(APITestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='secret-pass', role='admin')
+        self.client.force_authenticate(self.admin)
+        self.supplier = Supplier.objects.create(name='Acme')
+        self.medicines = []
+        for name in ('Aspirin', 'Ibuprofen'):
+            medicine = Medicine.objects.create(
+                name=name, category='General', price=Decimal('2.00'), quantity=5,
+                expiration_date=date.today() + timedelta(days=365), supplier=self.supplier,
+            )
+            InventoryItem.objects.create(medicine=medicine, current_stock=5, reorder_level=10)
+            self.medicines.append(medicine)
+        self.order = PurchaseOrder.objects.create(supplier=self.supplier, status='ordered')
+        PurchaseOrderItem.objects.create(purchase_order=self.order, medicine=self.medicines[0],
+                                         medicine_name='Aspirin', quantity=20, unit_price=Decimal('1.00'))
+        # Legacy line entered by name only
+        PurchaseOrderItem.objects.create(purchase_order=self.order, medicine_name=' ibuprofen',
+                                         quantity=30, unit_price=Decimal('1.00'))
+
+    def receive(self):
+        return self.client.post(f'/api/suppliers/purchase-orders/{self.order.pk}/receive/')
+
+    def test_receipt_adds_every_line_to_stock(self):
+        response = self.receive()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'received')
+        self.assertEqual(response.data['items'][1]['medicine'], self.medicines[1].pk)
+        for medicine, stock in zip(self.medicines, (25, 35)):
+            medicine.refresh_from_db()
+            self.assertEqual(medicine.quantity, stock)
+            self.assertEqual(medicine.inventoryitem.current_stock, stock)
+        self.assertEqual(
+            StockMovement.objects.filter(reference=f'purchase_order:{self.order.pk}',
+                                         movement_type='receipt').count(),
+            2,
+        )
+
+    def test_order_is_received_once(self):
+        self.receive()
+
+        response = self.receive()
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.medicines[0].refresh_from_db()
+        self.assertEqual(self.medicines[0].quantity, 25)
+
+    def test_status_cannot_be_set_to_received(self):
+        response = self.client.put(f'/api/suppliers/purchase-orders/{self.order.pk}/',
+                                   {'status': 'received'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.data)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'ordered')
+        self.assertEqual(self.receive().status_code, status.HTTP_200_OK)
+
+    def test_unknown_medicine_rolls_back(self):
+        PurchaseOrderItem.objects.create(purchase_order=self.order, medicine_name='Unobtainium',
+                                         quantity=1, unit_price=Decimal('1.00'))
+
+        response = self.receive()
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['medicine_names'], ['Unobtainium'])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'ordered')
+        self.assertFalse(StockMovement.objects.filter(movement_type='receipt').exists())
+
+
+class PurchaseOrderListTests(APITestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='secret-pass', role='admin')
+        self.client.force_authenticate(self.admin)
+        self.acme = Supplier.objects.create(name='Acme')
+        self.globex = Supplier.objects.create(name='Globex')
+        for index in range(6):
+            order = PurchaseOrder.objects.create(
+                supplier=self.acme if index % 2 else self.globex,
+                status='received' if index < 2 else 'pending',
+            )
+            PurchaseOrderItem.objects.bulk_create([
+                PurchaseOrderItem(purchase_order=order, medicine_name=f'Medicine {line}',
+                                  quantity=line + 1, unit_price=Decimal('2.50'))
+                for line in range(3)
+            ])
+
+    def test_list_computes_totals_in_few_queries(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/suppliers/purchase-orders/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 6)
+        order = response.data['results'][0]
+        self.assertEqual(order['supplier_name'], 'Acme')
+        self.assertEqual(order['item_count'], 3)
+        self.assertEqual(Decimal(order['items_total']), Decimal('15.00'))
+        self.assertEqual([Decimal(item['subtotal']) for item in order['items']],
+                         [Decimal('2.50'), Decimal('5.00'), Decimal('7.50')])
+
+    def test_filters_and_pages(self):
+        response = self.client.get('/api/suppliers/purchase-orders/',
+                                   {'status': 'pending', 'supplier': self.acme.pk})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertTrue(all(order['status'] == 'pending' and order['supplier'] == self.acme.pk
+                            for order in response.data['results']))
+
+        response = self.client.get('/api/suppliers/purchase-orders/', {'page_size': 4})
+        self.assertEqual(len(response.data['results']), 4)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get('/api/suppliers/purchase-orders/', {'status': 'lost'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_detail_has_totals(self):
+        order = PurchaseOrder.objects.first()
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/suppliers/purchase-orders/{order.pk}/')
+
+        self.assertEqual(Decimal(response.data['items_total']), Decimal('15.00'))
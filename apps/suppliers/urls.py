@@ -8,6 +8,8 @@ urlpatterns = [
     
     # Purchase Orders
     path('purchase-orders/', views.PurchaseOrderListCreateAPIView.as_view(), name='purchase_order_list_create'),
+    path('purchase-orders/generate/', views.PurchaseOrderGenerateAPIView.as_view(), name='purchase_order_generate'),
     path('purchase-orders/<int:pk>/', views.PurchaseOrderDetailAPIView.as_view(), name='purchase_order_detail'),
+    path('purchase-orders/<int:pk>/receive/', views.PurchaseOrderReceiveAPIView.as_view(), name='purchase_order_receive'),
 ]
 
@@ -4,7 +4,12 @@ from rest_framework import status
 from django.shortcuts import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from apps.users.permissions import IsAdmin
+from pharmacy_system.pagination import list_response
 from .models import Supplier, PurchaseOrder, PurchaseOrderItem
+from .purchasing import (
+    DEFAULT_ORDER_UP_TO, NotReceivable, UnresolvedLines, generate_purchase_orders,
+    plan_purchase_orders, receive_purchase_order,
+)
 from .serializers import SupplierSerializer, PurchaseOrderSerializer, PurchaseOrderItemSerializer
 
 
@@ -14,8 +19,7 @@ class SupplierListCreateAPIView(APIView):
 
     def get(self, request):
         suppliers = Supplier.objects.filter(is_active=True)
-        serializer = SupplierSerializer(suppliers, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return list_response(request, suppliers, SupplierSerializer, ('id',), view=self)
 
     def post(self, request):
         serializer = SupplierSerializer(data=request.data)
@@ -54,9 +58,25 @@ class PurchaseOrderListCreateAPIView(APIView):
     permission_classes = [IsAuthenticated, IsAdmin]
 
     def get(self, request):
-        purchase_orders = PurchaseOrder.objects.all()
-        serializer = PurchaseOrderSerializer(purchase_orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        """Newest first, one page at a time; optional ?status= and ?supplier= filters"""
+        purchase_orders = PurchaseOrder.objects.with_totals()
+        order_status = request.query_params.get('status')
+        if order_status:
+            statuses = order_status.split(',')
+            if not set(statuses) <= dict(PurchaseOrder.STATUS_CHOICES).keys():
+                return Response({"error": f"Unknown status: {order_status}."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            purchase_orders = purchase_orders.filter(status__in=statuses)
+        supplier_id = request.query_params.get('supplier')
+        if supplier_id:
+            if not supplier_id.isdigit():
+                return Response({"error": "supplier must be an integer."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            purchase_orders = purchase_orders.filter(supplier_id=int(supplier_id))
+        return list_response(
+            request, purchase_orders, PurchaseOrderSerializer, ('-order_date', 'id'),
+            view=self, opt_in=False,
+        )
 
     def post(self, request):
         serializer = PurchaseOrderSerializer(data=request.data)
@@ -71,7 +91,7 @@ class PurchaseOrderDetailAPIView(APIView):
     permission_classes = [IsAuthenticated, IsAdmin]
 
     def get(self, request, pk):
-        purchase_order = get_object_or_404(PurchaseOrder, pk=pk)
+        purchase_order = get_object_or_404(PurchaseOrder.objects.with_totals(), pk=pk)
         serializer = PurchaseOrderSerializer(purchase_order)
         return Response(serializer.data)
 
@@ -88,3 +108,58 @@ class PurchaseOrderDetailAPIView(APIView):
         purchase_order.delete()
         return Response({"message": "Purchase order deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
+
+
+class PurchaseOrderReceiveAPIView(APIView):
+    """POST: book the delivery of a purchase order, adding every line to stock"""
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request, pk):
+        purchase_order = get_object_or_404(PurchaseOrder.objects.select_related('supplier'), pk=pk)
+        try:
+            receive_purchase_order(purchase_order, user=request.user)
+        except NotReceivable as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_409_CONFLICT)
+        except UnresolvedLines as exc:
+            return Response({"error": "Some lines match no medicine.", "medicine_names": exc.names},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(PurchaseOrderSerializer(purchase_order).data)
+
+
+class PurchaseOrderGenerateAPIView(APIView):
+    """
+    POST: create pending purchase orders, one per supplier, for everything
+    at or below its reorder level. Optional body: supplier (id), order_up_to
+    (multiple of the reorder level to restock to) and dry_run.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        supplier_id = request.data.get('supplier')
+        order_up_to = request.data.get('order_up_to', DEFAULT_ORDER_UP_TO)
+        try:
+            supplier_id = int(supplier_id) if supplier_id not in (None, '') else None
+            order_up_to = int(order_up_to)
+        except (TypeError, ValueError):
+            return Response({"error": "supplier and order_up_to must be integers."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if order_up_to < 1:
+            return Response({"error": "order_up_to must be at least 1."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes'):
+            plan, unassigned = plan_purchase_orders(supplier_id, order_up_to)
+            return Response({
+                "created": 0,
+                "purchase_orders": [
+                    {"supplier": supplier, "items": lines} for supplier, lines in plan.items()
+                ],
+                "without_supplier": unassigned,
+            })
+
+        orders, unassigned = generate_purchase_orders(supplier_id, order_up_to)
+        return Response({
+            "created": len(orders),
+            "purchase_orders": PurchaseOrderSerializer(orders, many=True).data,
+            "without_supplier": unassigned,
+        }, status=status.HTTP_201_CREATED if orders else status.HTTP_200_OK)
@@ -9,6 +9,7 @@ from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from .models import CustomUser
 from .serializers import CustomUserSerializer, LoginSerializer
 from .permissions import IsAdmin
+from pharmacy_system.pagination import list_response
 
 
 class UserListCreateAPIView(APIView):
@@ -28,8 +29,7 @@ class UserListCreateAPIView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         users = CustomUser.objects.all()
-        serializer = CustomUserSerializer(users, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return list_response(request, users, CustomUserSerializer, ('id',), view=self)
 
     def post(self, request):
         """Registration - allow anyone to create user, but validate role"""
@@ -109,4 +109,14 @@ const BarChart = ({ data, labels, colors, title }) => {
   );
 };
 
-export { ProgressBar, PieChart, BarChart };
\ No newline at end of file
+// Daily sales from the /sales/reports/trend/ rollups
+const SalesTrendChart = ({ days, title }) => (
+  <BarChart
+    title={title}
+    data={days.map(day => parseFloat(day.amount))}
+    labels={days.map(day => day.date.slice(5))}
+    colors={['#3498db']}
+  />
+);
+
+export { ProgressBar, PieChart, BarChart, SalesTrendChart };
\ No newline at end of file
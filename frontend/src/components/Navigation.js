@@ -3,6 +3,7 @@ import { Link } from 'react-router-dom';
 import { useTranslation } from '../utils/TranslationContext';
 import UserProfile from './UserProfile';
 import { notificationsAPI } from '../services/api';
+import { connectNotifications } from '../services/notificationSocket';
 
 const Navigation = ({ navLinks, user, userRole, onLogout, onUserUpdate, darkMode, setDarkMode, language, setLanguage }) => {
   const { t } = useTranslation();
@@ -31,9 +32,30 @@ const Navigation = ({ navLinks, user, userRole, onLogout, onUserUpdate, darkMode
   };
 
   useEffect(() => {
-    fetchNotifications();
-    const interval = setInterval(fetchNotifications, 30000);
-    return () => clearInterval(interval);
+    const mergeNotifications = (incoming) => {
+      setNotifications((current) => {
+        const known = new Set(incoming.map((notification) => notification.id));
+        return [...incoming, ...current.filter((notification) => !known.has(notification.id))].slice(0, 10);
+      });
+    };
+
+    // Pushed over WebSocket; falls back to slow polling while disconnected
+    return connectNotifications({
+      onCatchUp: (incoming, count, isReconnect) => {
+        if (isReconnect) {
+          mergeNotifications(incoming);
+        } else {
+          setNotifications(incoming);
+        }
+        setUnreadCount(count);
+      },
+      onNotification: (notification, count) => {
+        mergeNotifications([notification]);
+        setUnreadCount(count);
+      },
+      onUnreadCount: setUnreadCount,
+      onPoll: fetchNotifications,
+    });
   }, []);
 
   const handleDropdownToggle = (index) => {
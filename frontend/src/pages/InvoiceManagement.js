@@ -97,7 +97,18 @@ const InvoiceManagement = () => {
         }))
       };
 
-      await salesAPI.create(saleData);
+      // One key per invoice: retries after a dropped connection replay the
+      // original sale instead of recording it (and taking the stock) twice
+      const idempotencyKey = window.crypto.randomUUID();
+      for (let attempt = 1; ; attempt++) {
+        try {
+          await salesAPI.create(saleData, idempotencyKey);
+          break;
+        } catch (error) {
+          if (error.response || attempt >= 3) throw error;
+          await new Promise(resolve => setTimeout(resolve, 500 * attempt));
+        }
+      }
       alert('Invoice created successfully!');
       
       // Reset form
@@ -113,7 +124,14 @@ const InvoiceManagement = () => {
       setActiveTab('manage');
     } catch (error) {
       console.error('Error creating invoice:', error);
-      alert('Error creating invoice. Please try again.');
+      if (error.response?.status === 409) {
+        const lines = error.response.data.items
+          .map(item => `${item.medicine_name}: requested ${item.requested}, available ${item.available}`)
+          .join('\n');
+        alert(`Insufficient stock:\n${lines}`);
+      } else {
+        alert('Error creating invoice. Please try again.');
+      }
     } finally {
       setLoading(false);
     }
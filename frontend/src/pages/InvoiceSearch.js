@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { salesAPI } from '../services/api';
 import BackButton from '../components/BackButton';
 
@@ -6,48 +6,75 @@ const InvoiceSearch = () => {
   const [searchTerm, setSearchTerm] = useState('');
   const [searchType, setSearchType] = useState('customer');
   const [sales, setSales] = useState([]);
-  const [filteredSales, setFilteredSales] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [totalCount, setTotalCount] = useState(0);
   const [loading, setLoading] = useState(true);
+  // Bumped by every new search: replies to older searches (and pages of
+  // their results) are ignored when they arrive late
+  const searchId = useRef(0);
 
   useEffect(() => {
-    fetchSales();
-  }, []);
+    // Wait for the user to stop typing before querying the server
+    const timer = setTimeout(() => searchSales(), 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm, searchType]);
 
-  useEffect(() => {
-    filterSales();
-  }, [searchTerm, searchType, sales]);
+  const buildParams = () => {
+    const params = { page_size: 25, count: true };
+    const term = searchTerm.trim();
+    if (!term) return params;
+
+    switch (searchType) {
+      case 'customer':
+        return { ...params, customer: term, match: 'contains' };
+      case 'id':
+        return /^\d+$/.test(term) ? { ...params, id: term } : null;
+      case 'date':
+        return /^\d{4}-\d{2}-\d{2}$/.test(term) ? { ...params, date_from: term, date_to: term } : null;
+      default:
+        return params;
+    }
+  };
 
-  const fetchSales = async () => {
+  const searchSales = async () => {
+    const id = ++searchId.current;
+    const params = buildParams();
+    if (!params) {
+      setSales([]);
+      setNextPage(null);
+      setTotalCount(0);
+      setLoading(false);
+      return;
+    }
+    setLoading(true);
     try {
-      const response = await salesAPI.getAll();
-      setSales(response.data);
-      setFilteredSales(response.data);
+      const response = await salesAPI.search(params);
+      if (id !== searchId.current) return;
+      setSales(response.data.results);
+      setNextPage(response.data.next);
+      setTotalCount(response.data.count);
     } catch (error) {
-      console.error('Error fetching sales:', error);
+      console.error('Error searching sales:', error);
     } finally {
-      setLoading(false);
+      if (id === searchId.current) setLoading(false);
     }
   };
 
-  const filterSales = () => {
-    if (!searchTerm) {
-      setFilteredSales(sales);
-      return;
+  const loadMore = async () => {
+    if (!nextPage) return;
+    const id = searchId.current;
+    setLoading(true);
+    try {
+      const cursor = new URL(nextPage).searchParams.get('cursor');
+      const response = await salesAPI.search({ ...buildParams(), cursor });
+      if (id !== searchId.current) return;
+      setSales(prev => [...prev, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      console.error('Error loading more sales:', error);
+    } finally {
+      if (id === searchId.current) setLoading(false);
     }
-
-    const filtered = sales.filter(sale => {
-      switch (searchType) {
-        case 'customer':
-          return sale.customer_name.toLowerCase().includes(searchTerm.toLowerCase());
-        case 'id':
-          return sale.id.toString().includes(searchTerm);
-        case 'date':
-          return sale.date.includes(searchTerm);
-        default:
-          return true;
-      }
-    });
-    setFilteredSales(filtered);
   };
 
   const downloadInvoice = async (saleId) => {
@@ -81,7 +108,7 @@ const InvoiceSearch = () => {
     }
   };
 
-  if (loading) return <div>Loading...</div>;
+  if (loading && sales.length === 0 && !searchTerm) return <div>Loading...</div>;
 
   return (
     <div className="invoice-search">
@@ -104,7 +131,7 @@ const InvoiceSearch = () => {
           
           <input
             type="text"
-            placeholder={`Search by ${searchType}...`}
+            placeholder={searchType === 'date' ? 'YYYY-MM-DD' : `Search by ${searchType}...`}
             value={searchTerm}
             onChange={(e) => setSearchTerm(e.target.value)}
             className="search-input"
@@ -120,7 +147,7 @@ const InvoiceSearch = () => {
       </div>
 
       <div className="search-results">
-        <p>{filteredSales.length} invoice(s) found</p>
+        <p>{totalCount} invoice(s) found</p>
         
         <div className="table-container">
           <table>
@@ -136,7 +163,7 @@ const InvoiceSearch = () => {
               </tr>
             </thead>
             <tbody>
-              {filteredSales.map(sale => (
+              {sales.map(sale => (
                 <tr key={sale.id}>
                   <td>#{sale.id}</td>
                   <td>{sale.customer_name}</td>
@@ -158,6 +185,12 @@ const InvoiceSearch = () => {
             </tbody>
           </table>
         </div>
+
+        {nextPage && (
+          <button onClick={loadMore} disabled={loading} className="btn btn-secondary">
+            {loading ? 'Loading...' : 'Load more'}
+          </button>
+        )}
       </div>
     </div>
   );
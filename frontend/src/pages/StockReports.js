@@ -1,11 +1,13 @@
 import React, { useState, useEffect } from 'react';
-import { inventoryAPI, medicinesAPI } from '../services/api';
+import { inventoryAPI, medicinesAPI, salesAPI } from '../services/api';
 import BackButton from '../components/BackButton';
+import { SalesTrendChart } from '../components/Charts';
 
 const StockReports = () => {
   const [inventory, setInventory] = useState([]);
   const [medicines, setMedicines] = useState([]);
   const [stats, setStats] = useState({});
+  const [trend, setTrend] = useState({ days: [], top_medicines: [] });
   const [loading, setLoading] = useState(true);
   const [filter, setFilter] = useState('all'); // all, low-stock, expired
 
@@ -15,15 +17,17 @@ const StockReports = () => {
 
   const fetchStockData = async () => {
     try {
-      const [inventoryRes, medicinesRes, statsRes] = await Promise.all([
+      const [inventoryRes, medicinesRes, statsRes, trendRes] = await Promise.all([
         inventoryAPI.getAll(),
         medicinesAPI.getAll(),
-        inventoryAPI.getStats()
+        inventoryAPI.getStats(),
+        salesAPI.getTrend()
       ]);
 
       setInventory(inventoryRes.data);
       setMedicines(medicinesRes.data);
       setStats(statsRes.data);
+      setTrend(trendRes.data);
     } catch (error) {
       console.error('Error fetching stock data:', error);
     } finally {
@@ -127,6 +131,30 @@ const StockReports = () => {
         </div>
       </div>
 
+      {/* Sales Trend (daily rollups, last 30 days) */}
+      <div className="stock-visualization">
+        <h3>Sales Trend</h3>
+        {trend.days.length > 0 ? (
+          <SalesTrendChart days={trend.days} title="Daily sales (last 30 days)" />
+        ) : (
+          <p>No sales in the last 30 days</p>
+        )}
+        {trend.top_medicines.length > 0 && (
+          <div className="stock-bars">
+            <h4>Top sellers</h4>
+            {trend.top_medicines.map(item => (
+              <div key={item.medicine} className="stock-bar-item">
+                <div className="stock-bar-label">{item.medicine_name}</div>
+                <div className="stock-bar-values">
+                  <span>Units: {item.quantity}</span>
+                  <span>Revenue: ${parseFloat(item.revenue).toFixed(2)}</span>
+                </div>
+              </div>
+            ))}
+          </div>
+        )}
+      </div>
+
       {/* Filter Controls */}
       <div className="stock-filters">
         <h3>Stock Analysis</h3>
@@ -1,6 +1,6 @@
 import axios from 'axios';
 
-const API_BASE_URL = 'http://localhost:8000/api';
+export const API_BASE_URL = 'http://localhost:8000/api';
 
 const api = axios.create({
   baseURL: API_BASE_URL,
@@ -84,15 +84,26 @@ export const inventoryAPI = {
   update: (id, data) => api.put(`/inventory/${id}/`, data),
   getLowStock: () => api.get('/inventory/alerts/low-stock/'),
   getStats: () => api.get('/inventory/stats/'),
+  getLots: (params) => api.get('/inventory/lots/', { params }),
+  getLotSales: (id) => api.get(`/inventory/lots/${id}/sales/`),
 };
 
 export const salesAPI = {
   getAll: () => api.get('/sales/'),
+  getPage: (params) => api.get('/sales/', { params }),
+  search: (params) => api.get('/sales/search/', { params }),
   getById: (id) => api.get(`/sales/${id}/`),
-  create: (data) => api.post('/sales/', data),
+  create: (data, idempotencyKey) => api.post('/sales/', data, {
+    headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {},
+  }),
   getDailyReport: (date) => api.get(`/sales/reports/daily/?date=${date}`),
   getMonthlyReport: (month, year) => api.get(`/sales/reports/monthly/?month=${month}&year=${year}`),
+  getTrend: (start, end) => api.get('/sales/reports/trend/', { params: { start, end } }),
+  getTopSellers: (params) => api.get('/sales/analytics/top-sellers/', { params }),
+  getVelocity: (params) => api.get('/sales/analytics/velocity/', { params }),
   getInvoice: (id) => api.get(`/sales/${id}/invoice/`, { responseType: 'text' }),
+  exportInvoices: (start, end) => api.get('/sales/invoices/export/', { params: { start, end }, responseType: 'blob' }),
+  exportSales: (start, end, type = 'csv') => api.get('/sales/export/', { params: { start, end, type }, responseType: 'blob' }),
 };
 
 export const suppliersAPI = {
@@ -100,12 +111,16 @@ export const suppliersAPI = {
   getById: (id) => api.get(`/suppliers/${id}/`),
   create: (data) => api.post('/suppliers/', data),
   update: (id, data) => api.put(`/suppliers/${id}/`, data),
+  getPurchaseOrders: (params) => api.get('/suppliers/purchase-orders/', { params }),
+  generatePurchaseOrders: (options = {}) => api.post('/suppliers/purchase-orders/generate/', options),
+  receivePurchaseOrder: (id) => api.post(`/suppliers/purchase-orders/${id}/receive/`),
 };
 
 export const notificationsAPI = {
   getAll: () => api.get('/notifications/'),
   getUnreadCount: () => api.get('/notifications/unread/'),
   getRecent: () => api.get('/notifications/recent/'),
+  getLowStockAlerts: () => api.get('/notifications/low_stock/'),
   markAsRead: (id) => api.post(`/notifications/${id}/mark_read/`),
   markAllAsRead: () => api.post('/notifications/mark_all_read/'),
   clearRead: () => api.delete('/notifications/clear_read/'),
@@ -0,0 +1,93 @@
+// Live notifications over WebSocket, with reconnect and catch-up.
+//
+// The server sends the notifications newer than `since` on every (re)connect,
+// then each new one as it is created. While the socket is down, `onPoll` is
+// called right away and then on a slow timer so the badge still refreshes.
+
+import { API_BASE_URL } from './api';
+
+// Same host as the REST API: http(s)://host/api -> ws(s)://host/ws
+const WS_BASE_URL = (() => {
+  const url = new URL(API_BASE_URL, window.location.href);
+  url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+  url.pathname = url.pathname.replace(/\/api\/?$/, '/ws');
+  return url.toString().replace(/\/$/, '');
+})();
+
+const MAX_RETRY_DELAY = 30000;
+const FALLBACK_POLL_INTERVAL = 60000;
+
+export const connectNotifications = ({ onCatchUp, onNotification, onUnreadCount, onPoll }) => {
+  let socket = null;
+  let lastId = null;
+  let retries = 0;
+  let retryTimer = null;
+  let pollTimer = null;
+  let closed = false;
+
+  const remember = (notifications) => {
+    notifications.forEach((notification) => {
+      if (lastId === null || notification.id > lastId) lastId = notification.id;
+    });
+  };
+
+  const startPolling = () => {
+    if (pollTimer || !onPoll) return;
+    onPoll();
+    pollTimer = setInterval(onPoll, FALLBACK_POLL_INTERVAL);
+  };
+
+  const stopPolling = () => {
+    clearInterval(pollTimer);
+    pollTimer = null;
+  };
+
+  const open = () => {
+    const token = localStorage.getItem('token');
+    if (closed || !token || typeof WebSocket === 'undefined') {
+      startPolling();
+      return;
+    }
+    const params = new URLSearchParams({ token });
+    if (lastId !== null) params.set('since', lastId);
+    socket = new WebSocket(`${WS_BASE_URL}/notifications/?${params}`);
+
+    socket.onopen = () => {
+      retries = 0;
+      stopPolling();
+    };
+
+    socket.onmessage = (message) => {
+      const event = JSON.parse(message.data);
+      if (event.type === 'catch_up') {
+        const isReconnect = lastId !== null;
+        remember(event.notifications);
+        onCatchUp(event.notifications, event.unread_count, isReconnect);
+      } else if (event.type === 'notification') {
+        remember([event.notification]);
+        onNotification(event.notification, event.unread_count);
+      } else if (event.type === 'unread_count') {
+        onUnreadCount(event.unread_count);
+      }
+    };
+
+    socket.onclose = () => {
+      socket = null;
+      if (closed) return;
+      startPolling();
+      // Exponential backoff with jitter, so tabs do not reconnect in lockstep
+      const delay = Math.min(MAX_RETRY_DELAY, 1000 * 2 ** retries) * (0.5 + Math.random() / 2);
+      retries += 1;
+      retryTimer = setTimeout(open, delay);
+    };
+  };
+
+  open();
+
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    stopPolling();
+    if (socket) socket.close();
+  };
+};
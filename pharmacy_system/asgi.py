@@ -1,7 +1,8 @@
 """
 ASGI config for pharmacy_system project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+It exposes the ASGI callable as a module-level variable named ``application``:
+HTTP goes to Django, WebSocket connections to the Channels consumers.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -13,4 +14,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "pharmacy_system.settings")
 
-application = get_asgi_application()
+# Django must be set up before the consumers import models
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+from apps.notifications.middleware import JWTAuthMiddleware  # noqa: E402
+from apps.notifications.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    "http": django_asgi_app,
+    "websocket": JWTAuthMiddleware(URLRouter(websocket_urlpatterns)),
+})
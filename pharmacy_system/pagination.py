@@ -0,0 +1,66 @@
+"""
+Opt-in keyset (cursor) pagination for the list endpoints.
+
+Pages are fetched with ``WHERE <ordering column> < <cursor position>`` on an
+indexed column instead of OFFSET, so every page costs the same however deep
+the client scrolls. Pagination only applies when the client asks for it with
+``?page_size=`` or ``?cursor=``; other clients keep receiving the full list
+(endpoints created with ``opt_in=False`` always paginate).
+"""
+from rest_framework import status
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination ordered by ``ordering`` (indexed columns, most
+    significant first). ``?count=true`` adds the total number of rows.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    count_query_param = 'count'
+    ordering = ('-id',)
+    opt_in = True
+
+    def __init__(self, ordering=None, opt_in=None):
+        if ordering is not None:
+            self.ordering = ordering
+        if opt_in is not None:
+            self.opt_in = opt_in
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        requested = self.cursor_query_param in params or self.page_size_query_param in params
+        if self.opt_in and not requested:
+            return None
+        self.count = None
+        if params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes'):
+            self.count = queryset.count()
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload, status=status.HTTP_200_OK)
+
+
+def list_response(request, queryset, serializer_class, ordering, view=None, opt_in=True):
+    """
+    Serialize a list for an APIView, one keyset page at a time when the
+    client opts in (or always, with ``opt_in=False``) and the whole
+    queryset otherwise.
+    """
+    paginator = KeysetPagination(ordering, opt_in)
+    page = paginator.paginate_queryset(queryset, request, view=view)
+    if page is None:
+        serializer = serializer_class(queryset, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+    serializer = serializer_class(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
@@ -13,6 +13,8 @@ import dj_database_url
 import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,6 +40,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "channels",
     "rest_framework",
     "corsheaders",
     "apps.users",
@@ -83,6 +86,13 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "pharmacy_system.wsgi.application"
+ASGI_APPLICATION = "pharmacy_system.asgi.application"
+
+# Push notifications (apps/notifications/push.py). The in-memory layer only
+# serves sockets of one process; use channels_redis when running several.
+CHANNEL_LAYERS = {
+    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"},
+}
 
 
 # Database
@@ -145,3 +155,57 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
+
+# Cache (rendered invoices are stored here, keyed by sale and content version)
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+INVOICE_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Seconds a sale Idempotency-Key is remembered (see purge_idempotency_keys)
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+
+# Offline sale sync (/api/sales/batch/): sales per request and per transaction
+SALE_BATCH_MAX_SIZE = 1000
+SALE_BATCH_CHUNK_SIZE = 100
+
+# Honour "Prefer: respond-async" on POST /api/sales/: queue the sale and
+# answer 202; run the process_sale_queue command to check queued sales out
+SALES_ASYNC_CHECKOUT = False
+
+# Seconds the analytics totals of closed days stay cached (the cache keys
+# carry a version kept in the database, so any backend stays consistent)
+SALES_ANALYTICS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Cache alias holding unread notification counts, or None to read the
+# counter row every time. Only name a cache shared by every worker (e.g.
+# Redis): counts are dropped from it when they change, which a per-process
+# cache would only do for the worker that made the change.
+NOTIFICATION_COUNT_CACHE = None
+
+# Seconds an unread notification count stays in NOTIFICATION_COUNT_CACHE
+NOTIFICATION_COUNT_CACHE_TIMEOUT = 60
+
+# Days notifications are kept, by (notification_type, priority); None matches
+# any value and the most specific rule wins; None days keeps them forever.
+# Enforced by the purge_notifications command.
+NOTIFICATION_RETENTION = {
+    ("low_stock", None): 30,
+    ("low_stock", "critical"): 90,
+    ("sale", None): 14,
+    ("low_stock_digest", None): 90,
+    ("system", None): 180,
+}
+
+# Where purge_notifications archives removed notifications (gzip JSON lines)
+NOTIFICATION_ARCHIVE_DIR = BASE_DIR / "archive" / "notifications"
+
+# "immediate": checkout alerts every admin about each medicine that runs low.
+# "digest": checkout only buffers the events and the send_low_stock_digests
+# command sends one summary per admin.
+LOW_STOCK_ALERT_MODE = "immediate"